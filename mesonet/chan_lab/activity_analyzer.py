@@ -3,8 +3,11 @@ import pathlib
 sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
 
 import argparse
+import concurrent.futures
+import hashlib
+import json
 import os
-import pickle
+import tempfile
 from typing import Dict, List, Tuple, Union
 
 import cv2
@@ -13,14 +16,44 @@ import matplotlib.patches as patches
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy
-
+import scipy.sparse
+
+from mesonet.chan_lab.helpers.correlation import CorrelationAccumulator
+from mesonet.chan_lab.helpers.dynamic_connectivity import sliding_window_correlations
+from mesonet.chan_lab.helpers.dynamic_connectivity import window_starts
+from mesonet.chan_lab.helpers.filtering import DEFAULT_FILTER_ORDER
+from mesonet.chan_lab.helpers.filtering import bandpass_timecourse
+from mesonet.chan_lab.helpers.filtering import write_bandpassed_series
+from mesonet.chan_lab.helpers.image_series import ImageSeries
 from mesonet.chan_lab.helpers.image_series import ImageSeriesCreator
+from mesonet.chan_lab.helpers.image_series import LowRankImageSeries
+from mesonet.chan_lab.helpers.low_rank import DEFAULT_OVERSAMPLES
+from mesonet.chan_lab.helpers.low_rank import DEFAULT_POWER_ITERATIONS
+from mesonet.chan_lab.helpers.low_rank import DEFAULT_RANK
+from mesonet.chan_lab.helpers.low_rank import LowRankRecording
+from mesonet.chan_lab.helpers.masked_sums import MaskedSums
+from mesonet.chan_lab.helpers.results_store import RESULTS_FILENAME
+from mesonet.chan_lab.helpers.results_store import ResultsStore
+from mesonet.chan_lab.helpers.seed_maps import SEED_MAP_CHUNK_FRAMES
+from mesonet.chan_lab.helpers.seed_maps import region_correlation_maps
+from mesonet.chan_lab.helpers.seed_maps import seed_correlation_maps
+from mesonet.chan_lab.helpers.seed_maps import write_pixel_correlation_matrix
+from mesonet.chan_lab.helpers.spectra import region_spectra
 from mesonet.chan_lab.helpers.utils import config_to_namespace
 from mesonet.chan_lab.helpers.utils import reorder_matrix
+from mesonet.region_labels import NO_REGION
+from mesonet.region_labels import RegionLabels
+from mesonet.region_labels import table_filename
 
 REGION_POINTS_WIDTH_MAX = 512
 REGION_POINTS_HEIGHT_MAX = 512
 
+# Number of frames projected onto the region masks at a time.
+TIMECOURSE_CHUNK_FRAMES = 1024
+# Version of the masks in the masks cache. Increase it when the way the masks
+# are built changes, so that masks cached by earlier versions are not loaded.
+MASKS_CACHE_VERSION = 1
+
 REGION_POINTS_AWAKE1 = {
     # Left hemisphere.
     (240, 300): 22,
@@ -251,52 +284,54 @@ class HalvesRegionPoints(RegionPointsWrapper):
 
 
 def transform_region_points(
-    region_points: Dict[Tuple[int, int], int]
+    region_labels: RegionLabels
 ) -> Dict[Tuple[int, int], int]:
     new_region_points: Dict[Tuple[int, int], int] = {}
 
     regions_of_interest = [22, 38, 18, 2]
-    regions_of_interest_points = [
-        [
-            point for point, region in region_points.items()
-            if region == region_of_interest
-        ]
-        for region_of_interest in regions_of_interest
-    ]
 
-    for region, region_of_interest_points in zip(regions_of_interest, regions_of_interest_points):
-        min_height = min(region_of_interest_points, key=lambda point: point[1])[1]
-        max_height = max(region_of_interest_points, key=lambda point: point[1])[1]
+    for region in regions_of_interest:
+        ys, xs = np.nonzero(region_labels.image == region)
+        min_height = ys.min()
+        max_height = ys.max()
         middle_height = (max_height + min_height) // 2
 
         y = (max_height + middle_height) // 2
-        points = [point for point in region_of_interest_points
-                  if point[1] == y]
-        left = min(points, key=lambda point: point[0])[0]
-        right = max(points, key=lambda point: point[0])[0]
-        x = (left + right) // 2
-        point = (x, y)
-        new_region_points[point] = region
+        row_xs = xs[ys == y]
+        x = (row_xs.min() + row_xs.max()) // 2
+        new_region_points[(int(x), int(y))] = region
 
         y = (min_height + middle_height) // 2
-        points = [point for point in region_of_interest_points
-                  if point[1] == y]
-        left = min(points, key=lambda point: point[0])[0]
-        right = max(points, key=lambda point: point[0])[0]
-        x = (left + right) // 2
-        point = (x, y)
-        new_region_points[point] = region + 1
+        row_xs = xs[ys == y]
+        x = (row_xs.min() + row_xs.max()) // 2
+        new_region_points[(int(x), int(y))] = region + 1
 
     return new_region_points
 
 
 class MasksManager:
     def __init__(self,
-                 region_points: Union[str, Dict[Tuple[int, int], int]],
+                 region_points: Union[str,
+                                      Dict[Tuple[int, int], int],
+                                      RegionLabels],
                  image_width: int,
                  image_height: int,
                  use_center_of_mass: bool = False,
-                 square_center_of_mass_points: bool = False):
+                 square_center_of_mass_points: bool = False,
+                 cache_dir: str = None):
+        """Create the masks of the regions, for images of the given size.
+
+        The masks are held in a compact form: the sorted flat indices of the
+        pixels of each region (see `region_pixels`), and a single label image
+        for display (see `label_image`). Dense (height, width) planes are only
+        built on demand, by `mask` and `masks`.
+
+        If a cache directory is given and the region points are given as a
+        file, the masks are saved in the cache directory, keyed by the contents
+        and type of the file, the image size, the center of mass options and
+        `MASKS_CACHE_VERSION`, so that later runs load them instead of building
+        them again.
+        """
         self.image_width = image_width
         self.image_height = image_height
         self.use_center_of_mass = use_center_of_mass
@@ -311,33 +346,127 @@ class MasksManager:
         self.scale_up_factor_x = REGION_POINTS_WIDTH_MAX // self.image_width
         self.scale_up_factor_y = REGION_POINTS_HEIGHT_MAX // self.image_height
 
+        self._projection_matrix = None
+        self._masked_sums = None
+        self._region_points = None
+        self._label_image = None
+
+        cache_filename = None
+        if cache_dir is not None and isinstance(region_points, str):
+            cache_filename = self._cache_filename(cache_dir, region_points)
+            if os.path.exists(cache_filename):
+                self._load_masks(cache_filename)
+                return
+
         if isinstance(region_points, str):
-            if region_points.endswith(".pkl"):
-                with open(region_points, "rb") as f:
-                    self.region_points: Dict[Tuple[int, int], int] = pickle.load(f)
-            elif region_points.endswith(".mat"):
+            if region_points.endswith(".mat"):
                 # assert "bilatregionalcorr" in region_points.lower()
-                self.region_points = self._region_points_from_mat(region_points)
+                self.region_labels = self._region_labels_from_mat(region_points)
             else:
-                raise ValueError(
-                        f"Unrecognized region points file {region_points}")
+                self.region_labels = RegionLabels.load(region_points)
         elif isinstance(region_points, dict):
-            self.region_points = region_points
+            self.region_labels = RegionLabels.from_dict(region_points)
+        elif isinstance(region_points, RegionLabels):
+            self.region_labels = region_points
         else:
             raise ValueError(f"Invalid region_points parameter.")
 
         self.n_regions = self._determine_n_regions()
-        self.masks = np.zeros((self.n_regions,
-                               self.image_height,
-                               self.image_width), dtype=np.uint8)
 
         self._populate_masks()
 
+        if cache_filename is not None:
+            self._save_masks(cache_filename)
+
+    @property
+    def region_points(self) -> Dict[Tuple[int, int], int]:
+        """The regions in the `{(x, y): region}` region points format. Prefer
+        `region_labels`, which holds the same regions as a label image.
+        """
+        if self._region_points is None:
+            self._region_points = self.region_labels.to_dict()
+        return self._region_points
+
+    @property
+    def label_image(self) -> np.ndarray:
+        """A (height, width) image holding the region of each pixel, or
+        `NO_REGION`. Where the masks of several regions overlap, the pixel
+        holds the highest of those regions.
+        """
+        if self._label_image is None:
+            self._label_image = np.full((self.image_height, self.image_width),
+                                        NO_REGION,
+                                        dtype=np.int16)
+            self._label_image.ravel()[self._pixels] = self._pixel_regions(
+                    self._offsets)
+        return self._label_image
+
+    @property
+    def masks(self) -> np.ndarray:
+        """The dense (regions, height, width) masks. These are built on each
+        access, so prefer `region_pixels`, `mask` or `label_image`.
+        """
+        return self._dense_masks(self._pixels, self._offsets)
+
+    @property
+    def region_points_mask(self) -> np.ndarray:
+        """The dense masks of the region points, before the center of mass is
+        applied. These are built on each access.
+        """
+        return self._dense_masks(self._point_pixels, self._point_offsets)
+
+    def region_pixels(self, region: int) -> np.ndarray:
+        """Get the sorted flat indices of the pixels in the mask of a region."""
+        return self._pixels[self._offsets[region]:self._offsets[region + 1]]
+
+    def mask(self, region: int) -> np.ndarray:
+        """Get the dense (height, width) mask of a region."""
+        mask = np.zeros((self.image_height, self.image_width), dtype=np.uint8)
+        mask.ravel()[self.region_pixels(region)] = 1
+        return mask
+
+    @property
+    def projection_matrix(self) -> scipy.sparse.csr_matrix:
+        """A sparse (regions, pixels) matrix whose rows average the pixels of
+        each region mask. The rows of empty masks are all zero.
+        """
+        if self._projection_matrix is None:
+            counts = np.diff(self._offsets)
+            weights = np.repeat(1.0 / np.maximum(counts, 1), counts)
+            self._projection_matrix = scipy.sparse.csr_matrix(
+                    (weights, self._pixels, self._offsets),
+                    shape=(self.n_regions,
+                           self.image_height * self.image_width))
+        return self._projection_matrix
+
+    def project(self, images: np.ndarray) -> np.ndarray:
+        """Get the average value of each region in each of the given images.
+
+        The images have shape (frames, height, width) and the result has shape
+        (regions, frames). Each average is the sum of the region's pixels in
+        the precision of the images, divided by the size of the mask, as
+        `(image * masks).sum(axis=(1, 2)) / masks.sum(axis=(1, 2))` would give
+        it, bit for bit (see `MaskedSums`). Only the pixels that are in a mask
+        are read, so the images are never copied as a whole.
+        """
+        pixels = np.reshape(images, (len(images), -1))
+        # Set at once, as chunks may be projected in parallel threads.
+        if self._masked_sums is None:
+            self._masked_sums = MaskedSums(
+                    self._pixels, self._offsets,
+                    self.image_height * self.image_width)
+        sums = self._masked_sums.sums(pixels)
+        counts = np.diff(self._offsets)[:, np.newaxis]
+        return np.divide(sums, counts, out=np.zeros(sums.shape),
+                         where=(counts != 0))
+
     def _populate_masks(self):
-        for point, region in self.region_points.items():
-            x_resized, y_resized = self._resize_point(point)
-            self.masks[region][y_resized][x_resized] = 1
-        self.region_points_mask = self.masks.copy()
+        xs, ys, regions = self.region_labels.points()
+        xs_resized = (xs * self.scale_down_factor_x).astype(int)
+        ys_resized = (ys * self.scale_down_factor_y).astype(int)
+        self._pixels, self._offsets = self._group_pixels(
+                regions, ys_resized * self.image_width + xs_resized)
+        self._point_pixels, self._point_offsets = self._pixels, self._offsets
 
         # # TODO: Remove
         # self.region_points = transform_region_points(self.region_points)
@@ -357,25 +486,72 @@ class MasksManager:
         return int(x * self.scale_down_factor_x), int(y * self.scale_down_factor_y)
 
     def _determine_n_regions(self) -> int:
-        return max(self.region_points.values()) + 1
+        return self.region_labels.n_regions
 
     def _calculate_center_of_mass(self, square: bool):
-        new_masks = np.zeros_like(self.masks)
-        for i in range(len(self.masks)):
-            ys, xs = np.where(self.masks[i] == 1)
-            if len(xs) > 0 and len(ys) > 0:
-                centroid_x = int(np.average(xs))
-                centroid_y = int(np.average(ys))
-                new_masks[i][centroid_y][centroid_x] = 1
-                if square:
-                    for column in range(centroid_x - 5, centroid_x + 5):
-                        for row in range(centroid_y - 5, centroid_y + 5):
-                            new_masks[i][row][column] = 1
-        self.masks = new_masks
-
-    def _region_points_from_mat(self, mat_file: str) -> Dict[Tuple[int, int], int]:
-        region_points: Dict[Tuple[int, int], int] = {}
-
+        regions = self._pixel_regions(self._offsets)
+        ys, xs = np.divmod(self._pixels, self.image_width)
+        counts = np.bincount(regions, minlength=self.n_regions)
+        present = np.flatnonzero(counts)
+        centroid_xs = (np.bincount(regions, weights=xs,
+                                   minlength=self.n_regions)[present] /
+                       counts[present]).astype(int)
+        centroid_ys = (np.bincount(regions, weights=ys,
+                                   minlength=self.n_regions)[present] /
+                       counts[present]).astype(int)
+
+        if square:
+            # The 10x10 square of pixels starting 5 pixels above and to the
+            # left of each centroid, clipped to the image.
+            offsets = np.arange(-5, 5)
+            rows = np.broadcast_to(
+                    centroid_ys[:, np.newaxis, np.newaxis] +
+                    offsets[np.newaxis, :, np.newaxis],
+                    (len(present), len(offsets), len(offsets)))
+            columns = np.broadcast_to(
+                    centroid_xs[:, np.newaxis, np.newaxis] +
+                    offsets[np.newaxis, np.newaxis, :],
+                    rows.shape)
+            regions = np.broadcast_to(present[:, np.newaxis, np.newaxis],
+                                      rows.shape)
+            inside = ((rows >= 0) & (rows < self.image_height) &
+                      (columns >= 0) & (columns < self.image_width))
+            self._pixels, self._offsets = self._group_pixels(
+                    regions[inside],
+                    rows[inside] * self.image_width + columns[inside])
+        else:
+            self._pixels, self._offsets = self._group_pixels(
+                    present, centroid_ys * self.image_width + centroid_xs)
+
+    def _group_pixels(self,
+                      regions: np.ndarray,
+                      pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Group the flat pixel indices by region, as the sorted and unique
+        pixels of all regions in region order, and the offsets of each region
+        in them.
+        """
+        n_pixels = self.image_height * self.image_width
+        keys = np.unique(np.asarray(regions, dtype=np.int64) * n_pixels +
+                         pixels)
+        offsets = np.searchsorted(keys // n_pixels,
+                                  np.arange(self.n_regions + 1))
+        return keys % n_pixels, offsets
+
+    def _pixel_regions(self, offsets: np.ndarray) -> np.ndarray:
+        return np.repeat(np.arange(self.n_regions), np.diff(offsets))
+
+    def _dense_masks(self,
+                     pixels: np.ndarray,
+                     offsets: np.ndarray) -> np.ndarray:
+        masks = np.zeros((self.n_regions,
+                          self.image_height * self.image_width),
+                         dtype=np.uint8)
+        masks[self._pixel_regions(offsets), pixels] = 1
+        return np.reshape(masks, (self.n_regions,
+                                  self.image_height,
+                                  self.image_width))
+
+    def _region_labels_from_mat(self, mat_file: str) -> RegionLabels:
         try:
             mat = scipy.io.loadmat(mat_file)
             roi_points = mat["RHR"]
@@ -402,47 +578,371 @@ class MasksManager:
 
         assert len(roi_points) == len(roi_labels)
 
+        # Each ROI is an 11x11 square of image points around the ROI point,
+        # stamped into the region points at the image point spacing.
+        image = np.full((REGION_POINTS_HEIGHT_MAX, REGION_POINTS_WIDTH_MAX),
+                        NO_REGION,
+                        dtype=np.int16)
         for label, (x, y) in zip(roi_labels, roi_points):
             if label not in MATLAB_INVERSE:
                 continue
 
-            region_number = MATLAB_INVERSE[label]
-            x, y = x - 1, y - 1
-            for row in range(y - 5, y + 5 + 1):
-                for column in range(x - 5, x + 5 + 1):
-                    new_y = self.scale_up_factor_x * row
-                    new_x = self.scale_up_factor_x * column
-                    region_points[(new_x, new_y)] = region_number
-
-        return region_points
+            x, y = int(x) - 1, int(y) - 1
+            rows = slice(max(y - 5, 0) * self.scale_up_factor_y,
+                         min((y + 5) * self.scale_up_factor_y + 1,
+                             REGION_POINTS_HEIGHT_MAX),
+                         self.scale_up_factor_y)
+            columns = slice(max(x - 5, 0) * self.scale_up_factor_x,
+                            min((x + 5) * self.scale_up_factor_x + 1,
+                                REGION_POINTS_WIDTH_MAX),
+                            self.scale_up_factor_x)
+            image[rows, columns] = MATLAB_INVERSE[label]
+
+        return RegionLabels(image)
+
+    def _cache_filename(self, cache_dir: str, region_points_file: str) -> str:
+        filenames = [region_points_file]
+        if region_points_file.endswith(".npy"):
+            # The label table of a label image is saved next to it.
+            filenames.append(table_filename(region_points_file))
+        file_hash = hashlib.sha1()
+        for filename in filenames:
+            if os.path.exists(filename):
+                with open(filename, "rb") as f:
+                    file_hash.update(f.read())
+        parameters = {
+            "version": MASKS_CACHE_VERSION,
+            "region_points": file_hash.hexdigest(),
+            # .mat files are read as MATLAB ROIs, other files as region labels.
+            "region_points_type": os.path.splitext(region_points_file)[1],
+            "region_points_width": REGION_POINTS_WIDTH_MAX,
+            "region_points_height": REGION_POINTS_HEIGHT_MAX,
+            "image_width": self.image_width,
+            "image_height": self.image_height,
+            "use_center_of_mass": self.use_center_of_mass,
+            "square_center_of_mass_points": self.square_center_of_mass_points,
+        }
+        key = hashlib.sha1(json.dumps(parameters,
+                                      sort_keys=True).encode()).hexdigest()
+        return os.path.join(cache_dir, f"masks_{key}.npz")
+
+    def _save_masks(self, filename: str):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        # The masks are written to a unique file and then moved into place, as
+        # the cache may be shared by sessions running at the same time.
+        fd, partial_filename = tempfile.mkstemp(
+                suffix=".partial",
+                prefix=os.path.basename(filename) + ".",
+                dir=os.path.dirname(filename))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f,
+                         pixels=self._pixels,
+                         offsets=self._offsets,
+                         point_pixels=self._point_pixels,
+                         point_offsets=self._point_offsets,
+                         region_labels=self.region_labels.image,
+                         table_regions=list(self.region_labels.table.keys()),
+                         table_labels=list(self.region_labels.table.values()))
+            os.replace(partial_filename, filename)
+        finally:
+            if os.path.exists(partial_filename):
+                os.remove(partial_filename)
+
+    def _load_masks(self, filename: str):
+        with np.load(filename) as data:
+            self._pixels = data["pixels"]
+            self._offsets = data["offsets"]
+            self._point_pixels = data["point_pixels"]
+            self._point_offsets = data["point_offsets"]
+            self.region_labels = RegionLabels(
+                    data["region_labels"],
+                    dict(zip(data["table_regions"].tolist(),
+                             data["table_labels"].tolist())))
+        self.n_regions = len(self._offsets) - 1
+
+
+def extract_timecourse(
+    image_series: ImageSeries,
+    masks_manager: MasksManager,
+    chunk_frames: int = TIMECOURSE_CHUNK_FRAMES,
+    workers: int = 1,
+    accumulator: CorrelationAccumulator = None,
+) -> np.ndarray:
+    """Get the (regions, frames) timecourse of the average activity in each
+    region mask.
+
+    The frames are read and projected onto the masks `chunk_frames` at a time,
+    so at most one chunk per worker is held in memory besides the timecourse.
+    With a single worker, the next chunk is read in the background while the
+    current one is projected; with more workers, the chunks are read and
+    projected in parallel threads. Each frame is projected independently, so
+    the timecourse does not depend on the chunk size or number of workers.
+
+    The region averages are those of `MasksManager.project`: the masked
+    pixels are summed in the precision of the frames and then divided by the
+    mask sizes, so the timecourse is bit-identical to the one computed frame by
+    frame on the dense masks.
+
+    If an accumulator is given, the timecourse is also fed to it chunk by
+    chunk, in frame order.
+    """
+    timecourse = np.zeros((masks_manager.n_regions,
+                           int(image_series.n_frames)))
+
+    def store_chunk(start: int, stop: int, projected_chunk: np.ndarray):
+        timecourse[:, start:stop] = projected_chunk
+        if accumulator is not None:
+            return CorrelationAccumulator(masks_manager.n_regions).update(
+                    projected_chunk)
+
+    chunk_accumulators = _map_projected_chunks(
+            image_series, masks_manager, chunk_frames, workers, store_chunk)
+    if accumulator is not None:
+        for chunk_accumulator in chunk_accumulators:
+            accumulator.merge(chunk_accumulator)
+
+    return timecourse
+
+
+def correlate_timecourse(
+    image_series: ImageSeries,
+    masks_manager: MasksManager,
+    chunk_frames: int = TIMECOURSE_CHUNK_FRAMES,
+    workers: int = 1,
+) -> CorrelationAccumulator:
+    """Accumulate the correlations between the region timecourses without
+    retaining the timecourses themselves. See `extract_timecourse`.
+    """
+    accumulator = CorrelationAccumulator(masks_manager.n_regions)
+
+    def accumulate_chunk(start: int, stop: int, projected_chunk: np.ndarray):
+        return CorrelationAccumulator(masks_manager.n_regions).update(
+                projected_chunk)
+
+    for chunk_accumulator in _map_projected_chunks(
+            image_series, masks_manager, chunk_frames, workers,
+            accumulate_chunk):
+        accumulator.merge(chunk_accumulator)
+
+    return accumulator
+
+
+def _map_projected_chunks(image_series: ImageSeries,
+                          masks_manager: MasksManager,
+                          chunk_frames: int,
+                          workers: int,
+                          function) -> List:
+    # Call function(start, stop, projected_chunk) for every chunk of frames and
+    # return the results in frame order.
+    n_frames = int(image_series.n_frames)
+
+    if isinstance(image_series, LowRankImageSeries):
+        # The regions are projected from the components, without
+        # reconstructing the frames.
+        projection_matrix = masks_manager.projection_matrix
+        return [function(start,
+                         min(start + chunk_frames, n_frames),
+                         image_series.low_rank.project(
+                                 projection_matrix,
+                                 slice(start, start + chunk_frames)))
+                for start in range(0, n_frames, chunk_frames)]
+
+    if workers <= 1:
+        results = []
+        start = 0
+        for chunk in image_series.iter_chunks(chunk_frames):
+            stop = start + len(chunk)
+            results.append(function(start, stop, masks_manager.project(chunk)))
+            start = stop
+        return results
+
+    def project_chunk(start: int):
+        stop = min(start + chunk_frames, n_frames)
+        chunk = image_series.get_frames(slice(start, stop))
+        return function(start, stop, masks_manager.project(chunk))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(project_chunk, start)
+                   for start in range(0, n_frames, chunk_frames)]
+        return [future.result() for future in futures]
 
 
 def fft(args):
+    """
+    Uses:
+    - save_dir
+    - region_points_file
+    - image_width
+    - image_height
+    - image_file
+    - n_frames
+    - mat_property
+    - mat_transpose_axes
+    - spatial_bin
+    - memmap
+    - cache_dir
+    - chunk_frames
+    - workers
+    - fps
+    - spectrum
+    - spectrum_window
+    - welch_segment_frames
+    - plot_spectra
+    - bandpass
+    - bandpass_order
+    """
     if not os.path.exists(args.save_dir):
         os.makedirs(args.save_dir)
 
+    fps = _frame_rate(args, "compute the spectrum frequencies")
+    image_width, image_height = _binned_image_size(args)
+
     masks_manager = MasksManager(args.region_points_file,
-                                 args.image_width,
-                                 args.image_height)
-    image_series = ImageSeriesCreator.create_cached_image_series(
-            args.image_file, args.image_width, args.image_height, args.n_frames)
+                                 image_width,
+                                 image_height,
+                                 cache_dir=getattr(args, "cache_dir", None))
+    with ImageSeriesCreator.create_cached_image_series(
+            args.image_file, args.image_width, args.image_height, args.n_frames,
+            memmap=getattr(args, "memmap", False),
+            cache_dir=getattr(args, "cache_dir", None),
+            spatial_bin=getattr(args, "spatial_bin", 1),
+            property=args.mat_property,
+            transpose_axes=args.mat_transpose_axes) as image_series:
+        timecourse = extract_timecourse(
+                image_series,
+                masks_manager,
+                chunk_frames=getattr(args, "chunk_frames",
+                                     TIMECOURSE_CHUNK_FRAMES),
+                workers=getattr(args, "workers", 1))
+    timecourse = _bandpass_timecourse(args, timecourse)
+    frequencies, spectra = region_spectra(
+            timecourse,
+            fps=fps,
+            method=getattr(args, "spectrum", "power"),
+            window=getattr(args, "spectrum_window", "boxcar"),
+            nperseg=getattr(args, "welch_segment_frames", None))
+
+    np.save(os.path.join(args.save_dir, "spectra.npy"), spectra)
+    np.save(os.path.join(args.save_dir, "frequencies.npy"), frequencies)
+    scipy.io.savemat(os.path.join(args.save_dir, "spectra.mat"),
+                     {"data": spectra, "frequencies": frequencies})
+
+    if getattr(args, "plot_spectra", False):
+        for i, spectrum in enumerate(np.abs(spectra)):
+            plt.plot(frequencies, spectrum)
+            plt.xlabel("Frequency (Hz)")
+            plt.savefig(os.path.join(args.save_dir, f"fft_{i}.png"))
+            plt.clf()
+
+
+def dynamic_connectivity(args):
+    """
+    Uses:
+    - save_dir
+    - region_points_file
+    - image_width
+    - image_height
+    - image_file
+    - n_frames
+    - mat_property
+    - mat_transpose_axes
+    - spatial_bin
+    - memmap
+    - cache_dir
+    - chunk_frames
+    - workers
+    - fps
+    - dfc_window
+    - dfc_step
+    - dfc_units
+    - bandpass
+    - bandpass_order
+    """
+    if not os.path.exists(args.save_dir):
+        os.makedirs(args.save_dir)
 
-    fft_values = [[] for _ in range(masks_manager.n_regions)]
+    image_width, image_height = _binned_image_size(args)
 
-    for i, image in enumerate(image_series):
-        masked_image = image * masks_manager.masks
-        masked_image_average = masked_image.mean(axis=(1, 2))
+    masks_manager = MasksManager(args.region_points_file,
+                                 image_width,
+                                 image_height,
+                                 cache_dir=getattr(args, "cache_dir", None))
+    with ImageSeriesCreator.create_cached_image_series(
+            args.image_file, args.image_width, args.image_height, args.n_frames,
+            memmap=getattr(args, "memmap", False),
+            cache_dir=getattr(args, "cache_dir", None),
+            spatial_bin=getattr(args, "spatial_bin", 1),
+            property=args.mat_property,
+            transpose_axes=args.mat_transpose_axes) as image_series:
+        timecourse = extract_timecourse(
+                image_series,
+                masks_manager,
+                chunk_frames=getattr(args, "chunk_frames",
+                                     TIMECOURSE_CHUNK_FRAMES),
+                workers=getattr(args, "workers", 1))
+    timecourse = _bandpass_timecourse(args, timecourse)
+
+    units = getattr(args, "dfc_units", "frames")
+    if units == "frames":
+        window_frames, step_frames = int(args.dfc_window), int(args.dfc_step)
+    elif units == "seconds":
+        fps = _frame_rate(args, "convert dfc_window and dfc_step to frames")
+        window_frames = int(round(args.dfc_window * fps))
+        step_frames = int(round(args.dfc_step * fps))
+    else:
+        raise ValueError(f"Unsupported dfc_units: `{units}`")
 
-        for j in range(len(fft_values)):
-            fft_values[j].append(masked_image_average[j])
+    sliding_window_correlations(
+            timecourse,
+            window_frames,
+            step_frames,
+            os.path.join(args.save_dir, "dynamic_corrmat.npy"))
+    np.save(os.path.join(args.save_dir, "dynamic_corrmat_starts.npy"),
+            window_starts(timecourse.shape[1], window_frames, step_frames))
 
-    for i, values in enumerate(fft_values):
-        fft_values_array = np.array(values)
-        fft = np.fft.fft(fft_values_array)
-        power = fft * np.conjugate(fft)  # Compute power spectrum.
-        plt.plot(power)
-        plt.savefig(os.path.join(args.save_dir, f"fft_{i}.png"))
-        plt.clf()
+
+def compress(args):
+    """
+    Uses:
+    - save_dir
+    - image_width
+    - image_height
+    - image_file
+    - n_frames
+    - mat_property
+    - mat_transpose_axes
+    - spatial_bin
+    - memmap
+    - cache_dir
+    - chunk_frames
+    - low_rank_rank
+    - low_rank_oversamples
+    - low_rank_power_iterations
+    - low_rank_seed
+    """
+    if not os.path.exists(args.save_dir):
+        os.makedirs(args.save_dir)
+
+    with ImageSeriesCreator.create_cached_image_series(
+            args.image_file, args.image_width, args.image_height, args.n_frames,
+            memmap=getattr(args, "memmap", False),
+            cache_dir=getattr(args, "cache_dir", None),
+            spatial_bin=getattr(args, "spatial_bin", 1),
+            property=args.mat_property,
+            transpose_axes=args.mat_transpose_axes) as image_series:
+        low_rank = LowRankRecording.compute(
+                image_series,
+                rank=getattr(args, "low_rank_rank", DEFAULT_RANK),
+                oversamples=getattr(args, "low_rank_oversamples",
+                                    DEFAULT_OVERSAMPLES),
+                power_iterations=getattr(args, "low_rank_power_iterations",
+                                         DEFAULT_POWER_ITERATIONS),
+                chunk_frames=getattr(args, "chunk_frames",
+                                     TIMECOURSE_CHUNK_FRAMES),
+                seed=getattr(args, "low_rank_seed", None))
+    low_rank.save(os.path.join(args.save_dir, "low_rank.npz"))
 
 
 def activity_complements(args):
@@ -459,44 +959,53 @@ def activity_complements(args):
     - highlights
     - mat_property
     - mat_transpose_axes
+    - spatial_bin
     - still_image_file
+    - memmap
+    - cache_dir
+    - chunk_frames
+    - workers
+    - reorder_seed
+    - reorder_restarts
+    - fps
+    - bandpass
+    - bandpass_order
     """
     if not os.path.exists(args.save_dir):
         os.makedirs(args.save_dir)
 
+    image_width, image_height = _binned_image_size(args)
+
     masks_manager = MasksManager(args.region_points_file,
-                                 args.image_width,
-                                 args.image_height,
+                                 image_width,
+                                 image_height,
                                  use_center_of_mass=args.use_com,
-                                 square_center_of_mass_points=args.square_com)
-    image_series = ImageSeriesCreator.create_cached_image_series(
-            args.image_file, args.image_width, args.image_height, args.n_frames,
-            property=args.mat_property, transpose_axes=args.mat_transpose_axes)
+                                 square_center_of_mass_points=args.square_com,
+                                 cache_dir=getattr(args, "cache_dir", None))
 
     # Save masks on images if a still image is provided.
     if args.still_image_file:
         # Plot the mesoscale image of the brain.
         still_image = cv2.imread(args.still_image_file, cv2.IMREAD_UNCHANGED)
-        still_image = cv2.resize(still_image, (args.image_height, args.image_width))
+        still_image = cv2.resize(still_image, (image_height, image_width))
         plt.imshow(still_image)        
 
         # Plot the predicted ROIs from MesoNet.
-        region_points = np.zeros((args.image_height, args.image_width))
-        for x, y in masks_manager.region_points:
-            new_x = int(x * masks_manager.scale_down_factor_x)
-            new_y = int(y * masks_manager.scale_down_factor_y)
-            region_points[new_y][new_x] = 1
+        region_points = np.zeros((image_height, image_width))
+        xs, ys, _ = masks_manager.region_labels.points()
+        region_points[(ys * masks_manager.scale_down_factor_y).astype(int),
+                      (xs * masks_manager.scale_down_factor_x).astype(int)] = 1
         transparent_region_points = np.ma.masked_where(region_points == 0, region_points)
         plt.imshow(transparent_region_points, alpha=0.6)
 
         # Plot the current masks that we use.
-        for i, mask in enumerate(masks_manager.masks):
-            transparent_mask = np.ma.masked_where(mask == 0, mask)
-            plt.imshow(transparent_mask, alpha=0.1, cmap="autumn")
-
-            ys, xs = np.where(mask == 1)
-            if len(xs) > 0 and len(ys) > 0:
-                x, y = xs[0], ys[0]
+        in_region = masks_manager.label_image != NO_REGION
+        transparent_masks = np.ma.masked_where(~in_region, in_region)
+        plt.imshow(transparent_masks, alpha=0.1, cmap="autumn")
+        for i in range(masks_manager.n_regions):
+            pixels = masks_manager.region_pixels(i)
+            if len(pixels) > 0:
+                y, x = np.divmod(pixels[0], image_width)
                 plt.annotate(f"{i}",
                              xy=(x, y),
                              xytext=(x, y),
@@ -505,33 +1014,52 @@ def activity_complements(args):
         plt.savefig(os.path.join(args.save_dir, "masks.png"), dpi=200)
     plt.clf()
 
-    data = np.zeros((len(masks_manager.masks), image_series.n_frames))
-
     # Record the time series activity data for each region that has a
-    # complement.
-    for i, image in enumerate(image_series):
-        masked_image = image * masks_manager.masks
-        numerator = masked_image.sum(axis=(1, 2))
-        denominator = masks_manager.masks.sum(axis=(1, 2))
-        masked_sums = np.divide(numerator,
-                                denominator,
-                                out=np.zeros((len(masks_manager.masks),)),
-                                where=(denominator != 0))
-
-        for label in range(len(masks_manager.masks)):
-            data[label][i] = masked_sums[label]
-
-    all_correlations = np.corrcoef(data)
-    all_correlations_masked = all_correlations * np.tri(len(masks_manager.masks)) * (1 - np.eye(len(masks_manager.masks)))
+    # complement, accumulating the correlations between regions as it goes.
+    accumulator = CorrelationAccumulator(masks_manager.n_regions)
+    with ImageSeriesCreator.create_cached_image_series(
+            args.image_file, args.image_width, args.image_height, args.n_frames,
+            memmap=getattr(args, "memmap", False),
+            cache_dir=getattr(args, "cache_dir", None),
+            spatial_bin=getattr(args, "spatial_bin", 1),
+            property=args.mat_property,
+            transpose_axes=args.mat_transpose_axes) as image_series:
+        data = extract_timecourse(
+                image_series,
+                masks_manager,
+                chunk_frames=getattr(args, "chunk_frames",
+                                     TIMECOURSE_CHUNK_FRAMES),
+                workers=getattr(args, "workers", 1),
+                accumulator=accumulator)
+    if getattr(args, "bandpass", None):
+        # The correlations are those of the filtered timecourse.
+        data = _bandpass_timecourse(args, data)
+        accumulator = CorrelationAccumulator(masks_manager.n_regions)
+        accumulator.update(data)
+
+    all_correlations = accumulator.correlation()
+    all_correlations_masked = all_correlations * np.tri(masks_manager.n_regions) * (1 - np.eye(masks_manager.n_regions))
 
     np.save(os.path.join(args.save_dir, "timecourse.npy"), data)
     scipy.io.savemat(os.path.join(args.save_dir, "timecourse.mat"),
                      {"data": data})
 
+    # Keep all of the results of the session in a single file as well.
+    with ResultsStore(os.path.join(args.save_dir, RESULTS_FILENAME),
+                      "w") as results:
+        results.write_config(args)
+        results.write_timecourse(data)
+        results.write_correlation(all_correlations)
+        results.write_region_labels(masks_manager.region_labels)
+        results.write_masks([masks_manager.region_pixels(i)
+                             for i in range(masks_manager.n_regions)],
+                            masks_manager.image_width,
+                            masks_manager.image_height)
+
     # Plot the complement regions.
-    for i in range(len(masks_manager.masks) // 2):
+    for i in range(masks_manager.n_regions // 2):
         label = i
-        complement_label = len(masks_manager.masks) - label - 1
+        complement_label = masks_manager.n_regions - label - 1
 
         # Obtain the correlation (r) value of the two activity plots.
         correlation = all_correlations[label][complement_label]
@@ -602,8 +1130,13 @@ def activity_complements(args):
         plt.clf()
 
     _plot_correlation_matrix(all_correlations,
-                             masks_manager.region_points,
-                             args.save_dir)
+                             masks_manager.region_labels,
+                             args.save_dir,
+                             reorder_seed=getattr(args, "reorder_seed", None),
+                             reorder_restarts=getattr(args,
+                                                      "reorder_restarts",
+                                                      1),
+                             workers=getattr(args, "workers", 1))
 
 
 def activity(args):
@@ -613,20 +1146,13 @@ def activity(args):
     masks_manager = MasksManager(args.region_points_file,
                                  args.image_width,
                                  args.image_height)
-    image_series = ImageSeriesCreator.create_cached_image_series(
-            args.image_file, args.image_width, args.image_height, args.n_frames)
-
-    plt.imshow(masks_manager.masks[0])
+    plt.imshow(masks_manager.mask(0))
     plt.show()
 
-    data = [[] for _ in range(len(masks_manager.masks))]
-
-    for _, image in enumerate(image_series):
-        masked_image = image * masks_manager.masks
-        masked_sums = masked_image.sum(axis=(1, 2)) / masks_manager.masks.sum(axis=(1, 2))
-
-        for j in range(len(masks_manager.masks)):
-            data[j].append(masked_sums[j])
+    with ImageSeriesCreator.create_cached_image_series(
+            args.image_file, args.image_width, args.image_height,
+            args.n_frames) as image_series:
+        data = extract_timecourse(image_series, masks_manager)
 
     for _, values in enumerate(data):
         plt.plot(values)
@@ -645,44 +1171,93 @@ def seed_pixel_map(args):
     - n_frames
     - mat_property
     - mat_transpose_axes
+    - spatial_bin
+    - memmap
+    - cache_dir
+    - chunk_frames
+    - workers
+    - full_corrmat
+    - fps
+    - bandpass
+    - bandpass_order
+    - seed_map_mode
+    - use_com
+    - square_com
     """
     if not os.path.exists(args.save_dir):
         os.makedirs(args.save_dir)
 
-    # Load the region points file.
-    with open(args.region_points_file, "rb") as f:
-        region_points = pickle.load(f)
-    region_points = transform_region_points(region_points)
+    image_width, image_height = _binned_image_size(args)
 
     background_image = cv2.imread(args.still_image_file, cv2.IMREAD_GRAYSCALE)
 
     image_series = ImageSeriesCreator.create_cached_image_series(
             args.image_file, args.image_width, args.image_height, args.n_frames,
-            property=args.mat_property, transpose_axes=args.mat_transpose_axes)
-
-    data = np.zeros((image_series.n_frames,
-                     args.image_height,
-                     args.image_width), dtype=np.float64)
+            memmap=getattr(args, "memmap", False),
+            cache_dir=getattr(args, "cache_dir", None),
+            spatial_bin=getattr(args, "spatial_bin", 1),
+            property=args.mat_property,
+            transpose_axes=args.mat_transpose_axes)
+
+    if getattr(args, "bandpass", None):
+        low, high = args.bandpass
+        bandpassed_series = write_bandpassed_series(
+                image_series,
+                os.path.join(args.save_dir, "bandpassed.npy"),
+                _frame_rate(args, "band-pass filter the image series"),
+                low,
+                high,
+                order=getattr(args, "bandpass_order", DEFAULT_FILTER_ORDER),
+                chunk_frames=getattr(args, "chunk_frames",
+                                     SEED_MAP_CHUNK_FRAMES),
+                workers=getattr(args, "workers", 1))
+        image_series.close()
+        image_series = bandpassed_series
+
+    seed_map_mode = getattr(args, "seed_map_mode", "points")
+    if seed_map_mode == "regions":
+        with image_series:
+            _region_pixel_maps(args, image_series, background_image)
+        return
+    elif seed_map_mode != "points":
+        raise ValueError(f"Unsupported seed_map_mode: `{seed_map_mode}`")
 
-    for i, image in enumerate(image_series):
-        data[i] = image
-
-    data = np.transpose(np.reshape(data, (image_series.n_frames, -1)))
-    correlation = np.corrcoef(data)
+    # Load the region points file.
+    region_points = transform_region_points(
+            RegionLabels.load(args.region_points_file))
+
+    x_scale = image_width / 512
+    y_scale = image_height / 512
+    seeds = [(int(x * x_scale), int(y * y_scale)) for x, y in region_points]
+    seed_indices = [y * image_width + x for x, y in seeds]
+
+    # Only the correlation rows of the seed pixels are needed for the maps. The
+    # full pixel correlation matrix is only computed (in tiles, straight to
+    # disk) if requested.
+    chunk_frames = getattr(args, "chunk_frames", SEED_MAP_CHUNK_FRAMES)
+    with image_series:
+        if getattr(args, "full_corrmat", False):
+            correlation = write_pixel_correlation_matrix(
+                    image_series,
+                    os.path.join(args.save_dir, "corrmat.npy"),
+                    chunk_frames=chunk_frames)
+            seed_maps = np.array(correlation[seed_indices])
+        else:
+            seed_maps = seed_correlation_maps(image_series,
+                                              seed_indices,
+                                              chunk_frames=chunk_frames)
+    seed_maps = np.reshape(seed_maps,
+                           (len(seeds), image_height, image_width))
 
-    np.save(os.path.join(args.save_dir, "corrmat.npy"), correlation)
-    scipy.io.savemat(os.path.join(args.save_dir, "corrmat.mat"),
-                     {"data": correlation})
-    x_scale = args.image_width / 512
-    y_scale = args.image_height / 512
+    np.save(os.path.join(args.save_dir, "seed_maps.npy"), seed_maps)
+    scipy.io.savemat(os.path.join(args.save_dir, "seed_maps.mat"),
+                     {"data": seed_maps, "seeds": np.array(seeds)})
 
     figure, axes = plt.subplots(nrows=1, ncols=len(region_points))
     figure.set_size_inches(2 * len(region_points), 4)
     figure.subplots_adjust(wspace=0.5)
-    for i, (x, y) in enumerate(region_points):
-        new_x, new_y = int(x * x_scale), int(y * y_scale)
-        map = correlation[new_y * args.image_width + new_x, :]
-        map = np.reshape(map, (args.image_height, args.image_width))
+    for i, (new_x, new_y) in enumerate(seeds):
+        map = seed_maps[i]
         dot = patches.Circle((new_x, new_y), 1, edgecolor="black")
         axes[i].imshow(background_image)
         axes[i].imshow(map, alpha=0.7)
@@ -692,107 +1267,66 @@ def seed_pixel_map(args):
     plt.show()
 
 
-def correlation_matrix_comparison():
-    # NOTE: To add more regions, modify the MATLAB dictionary above.
-
-    DATASET = "awake2"  # TODO
-    SAVE_DIR = f"./data/corrmatcomp_{DATASET}_test"
-
-    if not os.path.exists(SAVE_DIR):
-        os.makedirs(SAVE_DIR)
-
-    MESONET_FILES = [
-        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_com_0.1-1Hz_35000/correlation.npy",
-        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_regions_0.1-1Hz_35000/correlation.npy",
-        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_comsquare_0.1-1Hz_35000/correlation.npy",
-        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_sopbilat_0.1-1Hz_35000/correlation.npy"
-    ]
-    MESONET_TAGS = [
-        f"MesoNet_{DATASET}_com_35000",
-        f"MesoNet_{DATASET}_regions_35000",
-        f"MesoNet_{DATASET}_comsquare_35000",
-        f"MesoNet_{DATASET}_sopbilat_35000",
-    ]
-    MATLAB_FILES = [
-        f"/Users/christian/Documents/summer2023/matlab/my_data/{DATASET}/SOP_BilatRegionalCorr_35000.mat",
-    ]
-    MATLAB_TAGS = [
-        f"SOP_BilatRegionalCorr_{DATASET}_35000",
-    ]
-
-    assert len(MESONET_FILES) == len(MESONET_TAGS)
-    assert len(MATLAB_FILES) == len(MATLAB_TAGS)
-    assert len(MATLAB_FILES) > 0
-
-    n_regions = len(MATLAB)
-
-    # Determine which regions appear in the MesoNet segmentation as well as the
-    # MATLAB RHR regions.
-    matlab_data = scipy.io.loadmat(MATLAB_FILES[0])
-    matlab_labels = [label[0] for label in matlab_data["ROIlabels"][0]]
-    matlab_region_numbers = []
-    mesonet_region_numbers = []
-    region_names = []
-    for label in matlab_labels:
-        if label in MATLAB_INVERSE:
-            matlab_region_numbers.append(matlab_labels.index(label))
-            mesonet_region_numbers.append(MATLAB_INVERSE[label])
-            region_names.append(label)
-
-    # Create the new correlation matrices containing only those regions that are
-    # in both the MATLAB and MesoNet figures.
-    mesonet_correlation_matrices = []
-    for file in MESONET_FILES:
-        matrix = np.load(file)
-        matrix = matrix[mesonet_region_numbers, :][:, mesonet_region_numbers]
-        mesonet_correlation_matrices.append(matrix)
-
-    matlab_correlation_matrices = []
-    for file in MATLAB_FILES:
-        matrix = scipy.io.loadmat(file)
-        matrix = matrix["corrmatrix1"].copy()
-        matrix = matrix[matlab_region_numbers, :][:, matlab_region_numbers]
-        matlab_correlation_matrices.append(matrix)
-
-    correlation_matrices = (
-        mesonet_correlation_matrices + matlab_correlation_matrices
-    )
-    correlation_tags = MESONET_TAGS + MATLAB_TAGS
-    plot_labels = [f"{region_number} ({region_name})"
-                   for region_number, region_name
-                   in zip(mesonet_region_numbers, region_names)]
-    n_datasets = len(correlation_matrices)
-
-    # Plot and save.
-    for minuend in range(0, n_datasets - 1):
-        for subtrahend in range(minuend + 1, n_datasets):
-            minuend_matrix = correlation_matrices[minuend]
-            subtrahend_matrix = correlation_matrices[subtrahend]
-            difference_matrix = minuend_matrix - subtrahend_matrix
-
-            plt.rcParams.update({"font.size": 6})
-            plot_title = f"{correlation_tags[minuend]} - {correlation_tags[subtrahend]}"
-            plt.matshow(difference_matrix, vmin=-1.0, vmax=1.0)
-            plt.title(plot_title)
-            plt.xlabel("Region number")
-            plt.xticks(range(n_regions), labels=plot_labels, rotation=45)
-            plt.yticks(range(n_regions), labels=plot_labels)
-            plt.tick_params(axis="x", labelbottom=True)
-            plt.colorbar()
-            plt.rcParams.update({"font.size": 3})
-            for (i, j), difference in np.ndenumerate(difference_matrix):
-                plt.text(j, i, f"{difference:0.3f}", ha="center", va="center")
-            plt.savefig(os.path.join(SAVE_DIR, f"{plot_title}.png"), dpi=200)
-            plt.clf()
+def _binned_image_size(args) -> Tuple[int, int]:
+    # The (width, height) of the frames analyzed, after spatial binning.
+    spatial_bin = getattr(args, "spatial_bin", 1)
+    return args.image_width // spatial_bin, args.image_height // spatial_bin
+
+
+def _region_pixel_maps(args,
+                       image_series: ImageSeries,
+                       background_image: np.ndarray):
+    image_width, image_height = _binned_image_size(args)
+
+    # Correlate the timecourse of every region with every pixel, and save the
+    # maps along with a montage of the maps of the non-empty regions.
+    masks_manager = MasksManager(
+            args.region_points_file,
+            image_width,
+            image_height,
+            use_center_of_mass=getattr(args, "use_com", False),
+            square_center_of_mass_points=getattr(args, "square_com", False),
+            cache_dir=getattr(args, "cache_dir", None))
+    chunk_frames = getattr(args, "chunk_frames", SEED_MAP_CHUNK_FRAMES)
+    timecourse = extract_timecourse(image_series,
+                                    masks_manager,
+                                    chunk_frames=chunk_frames,
+                                    workers=getattr(args, "workers", 1))
+    region_maps = region_correlation_maps(image_series,
+                                          timecourse,
+                                          chunk_frames=chunk_frames)
+    region_maps = np.reshape(region_maps, (masks_manager.n_regions,
+                                           image_height,
+                                           image_width))
+
+    np.save(os.path.join(args.save_dir, "region_maps.npy"), region_maps)
+    scipy.io.savemat(os.path.join(args.save_dir, "region_maps.mat"),
+                     {"data": region_maps,
+                      "regions": np.arange(masks_manager.n_regions)})
+
+    regions = [region for region in range(masks_manager.n_regions)
+               if len(masks_manager.region_pixels(region)) > 0]
+    ncols = max(int(np.ceil(np.sqrt(len(regions)))), 1)
+    nrows = max(int(np.ceil(len(regions) / ncols)), 1)
+    figure, axes = plt.subplots(nrows=nrows, ncols=ncols, squeeze=False)
+    figure.set_size_inches(2 * ncols, 2 * nrows)
+    for ax in axes.flat:
+        ax.axis("off")
+    for ax, region in zip(axes.flat, regions):
+        ax.imshow(background_image)
+        ax.imshow(region_maps[region], alpha=0.7, vmin=-1, vmax=1)
+        ax.set_title(f"Region {region}", fontsize=8)
+    plt.savefig(os.path.join(args.save_dir, "region_maps.png"))
+    plt.show()
 
 
 def region_stds():
     DATASET = "awake1"
     MESONET_TIMECOURSE_FILES = [
-        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_com_0.1-1Hz_35000/timecourse.npy",
-        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_regions_0.1-1Hz_35000/timecourse.npy",
-        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_comsquare_0.1-1Hz_35000/timecourse.npy",
-        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_sopbilat_0.1-1Hz_35000/timecourse.npy",
+        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_com_0.1-1Hz_35000/{RESULTS_FILENAME}",
+        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_regions_0.1-1Hz_35000/{RESULTS_FILENAME}",
+        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_comsquare_0.1-1Hz_35000/{RESULTS_FILENAME}",
+        f"/Users/christian/Documents/summer2023/MesoNet/data/{DATASET}_sopbilat_0.1-1Hz_35000/{RESULTS_FILENAME}",
     ]
     MESONET_TITLES = [
         "com",
@@ -824,9 +1358,10 @@ def region_stds():
 
     mesonet_timecourses = []
     for timecourse_file in MESONET_TIMECOURSE_FILES:
-        timecourse = np.load(timecourse_file)
-        timecourse = timecourse[mesonet_region_numbers, :]
-        mesonet_timecourses.append(timecourse)
+        # Only the timecourses of the regions compared are read.
+        with ResultsStore(timecourse_file) as results:
+            mesonet_timecourses.append(
+                    results.timecourse(regions=mesonet_region_numbers))
 
     matlab_timecourses = []
     for timecourse_file in MATLAB_TIMECOURSE_FILES:
@@ -854,10 +1389,52 @@ def region_stds():
     plt.show()
 
 
+def _frame_rate(args, purpose: str) -> float:
+    """Get the configured frame rate, which is needed to `purpose`."""
+    fps = getattr(args, "fps", None)
+    if fps is None:
+        raise ValueError(f"fps must be set to {purpose}")
+    return float(fps)
+
+
+def _bandpass_timecourse(args, timecourse: np.ndarray) -> np.ndarray:
+    """Band-pass filter the timecourse if a `bandpass` is configured."""
+    if not getattr(args, "bandpass", None):
+        return timecourse
+    low, high = args.bandpass
+    return bandpass_timecourse(timecourse,
+                               _frame_rate(args,
+                                           "band-pass filter the timecourse"),
+                               low,
+                               high,
+                               order=getattr(args,
+                                             "bandpass_order",
+                                             DEFAULT_FILTER_ORDER))
+
+
+def run(args):
+    """Run the analysis selected by the `function` argument."""
+    if args.function == "activity":
+        activity_complements(args)
+    elif args.function == "seed_pixel_map":
+        seed_pixel_map(args)
+    elif args.function == "fft":
+        fft(args)
+    elif args.function == "dynamic_connectivity":
+        dynamic_connectivity(args)
+    elif args.function == "compress":
+        compress(args)
+    else:
+        raise ValueError(f"Unsupported function: `{args.function}`")
+
+
 def _plot_correlation_matrix(
     correlation_matrix: np.array,
-    region_points: Dict[Tuple[int, int], int],
+    region_labels: RegionLabels,
     save_dir: str,
+    reorder_seed: int = None,
+    reorder_restarts: int = 1,
+    workers: int = 1,
 ) -> np.array:
     # Save the original correlation matrix.
     np.save(os.path.join(save_dir, "corrmat.npy"), correlation_matrix)
@@ -865,7 +1442,7 @@ def _plot_correlation_matrix(
                      {"data": correlation_matrix})
 
     # Obtain all possible regions in sorted order.
-    sorted_regions = sorted(set(region_points.values()))
+    sorted_regions = region_labels.regions()
 
     # Initialize an array to hold the correlation matrix without invalid values.
     full_correlation_matrix = np.zeros((len(sorted_regions),
@@ -907,7 +1484,10 @@ def _plot_correlation_matrix(
     plt.clf()
 
     # Save the full correlation matrix with higher values near the diagonal.
-    reordered_matrix, new_order = reorder_matrix(full_correlation_matrix)
+    reordered_matrix, new_order = reorder_matrix(full_correlation_matrix,
+                                                 seed=reorder_seed,
+                                                 restarts=reorder_restarts,
+                                                 workers=workers)
     plt.rcParams.update({"font.size": 6})
     plt.matshow(reordered_matrix)
     plt.xlabel("Region number")
@@ -941,7 +1521,6 @@ if __name__ == "__main__":
     # activity_complements(args)
     # # activity(args)
     # # seed_pixel_map(args)
-    # # correlation_matrix_comparison()
     # # region_stds()
 
     parser = argparse.ArgumentParser()
@@ -950,9 +1529,4 @@ if __name__ == "__main__":
 
     config_args = config_to_namespace(args.config)
 
-    if config_args.function == "activity":
-        activity_complements(config_args)
-    elif config_args.function == "seed_pixel_map":
-        seed_pixel_map(config_args)
-    else:
-        raise ValueError(f"Unsupported function: `{config_args.function}`")
+    run(config_args)
@@ -0,0 +1,255 @@
+import sys
+import pathlib
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+import argparse
+import concurrent.futures
+import contextlib
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+import matplotlib
+# Sessions are run in worker processes, so never open plot windows.
+matplotlib.use("Agg")
+
+from mesonet.chan_lab import activity_analyzer
+from mesonet.chan_lab.helpers.utils import config_to_namespace
+from mesonet.chan_lab.helpers.utils import load_config
+
+# The files written by each function of the activity analyzer, used to decide
+# whether the outputs of a session are current.
+FUNCTION_OUTPUTS = {
+    "activity": ["timecourse.npy", "corrmat.npy", "results.h5"],
+    "seed_pixel_map": ["seed_maps.npy"],
+    "fft": ["spectra.npy"],
+    "dynamic_connectivity": ["dynamic_corrmat.npy"],
+    "compress": ["low_rank.npz"],
+}
+# The outputs of the "seed_pixel_map" function with seed_map_mode "regions".
+REGION_MAP_OUTPUTS = ["region_maps.npy"]
+# The arguments of a session that name its input files.
+INPUT_FILE_ARGS = ["image_file", "region_points_file", "still_image_file"]
+# Written to the save directory of a session once it has run successfully.
+STAMP_FILENAME = "batch_analyzer.json"
+SUMMARY_FIELDS = ["session", "function", "status", "wall_time_s",
+                  "peak_memory_mb", "log_file"]
+
+
+def collect_sessions(args) -> List[Dict[str, Any]]:
+    """Get the activity analyzer config of every session in the batch.
+
+    Sessions come from the config files matched by the `configs` globs, and
+    from the entries of the `sessions` table, which override the arguments of
+    the `base_config` file (if any).
+    """
+    sessions = []
+    for pattern in getattr(args, "configs", None) or []:
+        filenames = sorted(glob.glob(os.path.expanduser(pattern)))
+        if not filenames:
+            raise ValueError(f"No config files match `{pattern}`")
+        for filename in filenames:
+            session = load_config(filename)
+            session.setdefault(
+                    "name", os.path.splitext(os.path.basename(filename))[0])
+            sessions.append(session)
+
+    base_config = getattr(args, "base_config", None)
+    base = load_config(base_config) if base_config else {}
+    for entry in getattr(args, "sessions", None) or []:
+        session = dict(base)
+        session.update(entry)
+        sessions.append(session)
+
+    for session in sessions:
+        session.setdefault("name", os.path.basename(
+                os.path.normpath(session["save_dir"])))
+
+    names = [session["name"] for session in sessions]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate session names: {duplicates}")
+
+    return sessions
+
+
+def is_current(session: Dict[str, Any]) -> bool:
+    """Whether the session has already been run with the same arguments, and
+    its outputs are newer than its input files.
+    """
+    stamp_filename = os.path.join(session["save_dir"], STAMP_FILENAME)
+    if not os.path.exists(stamp_filename):
+        return False
+    with open(stamp_filename, "r") as f:
+        if json.load(f) != json.loads(json.dumps(session)):
+            return False
+
+    outputs = [os.path.join(session["save_dir"], output)
+               for output in _function_outputs(session)]
+    if not all(os.path.exists(output) for output in outputs):
+        return False
+
+    inputs = [session[arg] for arg in INPUT_FILE_ARGS if session.get(arg)]
+    if not all(os.path.exists(filename) for filename in inputs):
+        return False
+    newest_input = max([os.path.getmtime(filename) for filename in inputs],
+                       default=0)
+    oldest_output = min([os.path.getmtime(output) for output in outputs] +
+                        [os.path.getmtime(stamp_filename)])
+    return oldest_output >= newest_input
+
+
+def run_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one session, writing its output and any error to its log file."""
+    if not os.path.exists(session["save_dir"]):
+        os.makedirs(session["save_dir"])
+    log_filename = _log_filename(session)
+
+    start = time.perf_counter()
+    with open(log_filename, "w") as log, \
+            contextlib.redirect_stdout(log), \
+            contextlib.redirect_stderr(log):
+        try:
+            activity_analyzer.run(argparse.Namespace(**session))
+            status = "done"
+        except Exception:
+            traceback.print_exc()
+            status = "failed"
+    wall_time = time.perf_counter() - start
+
+    if status == "done":
+        with open(os.path.join(session["save_dir"], STAMP_FILENAME), "w") as f:
+            json.dump(session, f, indent=2)
+
+    return {
+        "session": session["name"],
+        "function": session["function"],
+        "status": status,
+        "wall_time_s": round(wall_time, 1),
+        "peak_memory_mb": _peak_memory_mb(),
+        "log_file": log_filename,
+    }
+
+
+def run_session_in_process(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one session in a new worker process.
+
+    Each session has a process of its own, so that the peak memory reported
+    for a session is its own, and a session that leaks memory or leaves state
+    behind cannot affect the next one. If the worker process dies (e.g. it is
+    killed for using too much memory), the session is reported as failed.
+    """
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1,
+                                                mp_context=context) as executor:
+        future = executor.submit(run_session, session)
+        try:
+            return future.result()
+        except concurrent.futures.process.BrokenProcessPool:
+            pass
+    wall_time = time.perf_counter() - start
+
+    os.makedirs(session["save_dir"], exist_ok=True)
+    log_filename = _log_filename(session)
+    with open(log_filename, "a") as log:
+        log.write("The worker process running the session exited "
+                  "unexpectedly.\n")
+    return {
+        "session": session["name"],
+        "function": session["function"],
+        "status": "failed",
+        "wall_time_s": round(wall_time, 1),
+        "peak_memory_mb": None,
+        "log_file": log_filename,
+    }
+
+
+def main(args: argparse.Namespace):
+    sessions = collect_sessions(args)
+
+    results = {}
+    pending = []
+    for session in sessions:
+        if not getattr(args, "force", False) and is_current(session):
+            results[session["name"]] = {
+                "session": session["name"],
+                "function": session["function"],
+                "status": "skipped",
+                "wall_time_s": None,
+                "peak_memory_mb": None,
+                "log_file": None,
+            }
+        else:
+            pending.append(session)
+
+    with concurrent.futures.ThreadPoolExecutor(
+            getattr(args, "workers", 1)) as executor:
+        for result in executor.map(run_session_in_process, pending):
+            print(f"{result['session']}: {result['status']} "
+                  f"({result['wall_time_s']} s)")
+            results[result["session"]] = result
+
+    results = [results[session["name"]] for session in sessions]
+    _print_summary(results)
+
+    summary_file = getattr(args, "summary_file", None)
+    if summary_file:
+        with open(summary_file, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+
+    if any(result["status"] == "failed" for result in results):
+        sys.exit(1)
+
+
+def _log_filename(session: Dict[str, Any]) -> str:
+    return os.path.join(session["save_dir"], f"{session['function']}.log")
+
+
+def _function_outputs(session: Dict[str, Any]) -> List[str]:
+    if session["function"] == "seed_pixel_map" and \
+            session.get("seed_map_mode") == "regions":
+        return REGION_MAP_OUTPUTS
+    return FUNCTION_OUTPUTS.get(session["function"], [])
+
+
+def _peak_memory_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows.
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, and in kilobytes elsewhere.
+    peak_bytes = peak if sys.platform == "darwin" else peak * 1024
+    return round(peak_bytes / 1024 ** 2, 1)
+
+
+def _print_summary(results: List[Dict[str, Any]]):
+    rows = [SUMMARY_FIELDS] + [
+        ["" if result[field] is None else str(result[field])
+         for field in SUMMARY_FIELDS]
+        for result in results
+    ]
+    widths = [max(len(row[i]) for row in rows)
+              for i in range(len(SUMMARY_FIELDS))]
+    for row in rows:
+        print("  ".join(value.ljust(width)
+                        for value, width in zip(row, widths)).rstrip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", type=str, required=True)
+    args = parser.parse_args()
+
+    config_args = config_to_namespace(args.config)
+
+    main(config_args)
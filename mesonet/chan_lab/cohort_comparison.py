@@ -0,0 +1,162 @@
+import sys
+import pathlib
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+import argparse
+import csv
+import multiprocessing
+import os
+from typing import Any, Dict, List
+
+import matplotlib
+# Heatmaps are rendered in worker processes, so never open plot windows.
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import scipy.io
+
+from mesonet.chan_lab.activity_analyzer import MATLAB
+from mesonet.chan_lab.activity_analyzer import MATLAB_INVERSE
+from mesonet.chan_lab.helpers.matrix_comparison import align_matrix
+from mesonet.chan_lab.helpers.matrix_comparison import compare_matrices
+from mesonet.chan_lab.helpers.results_store import ResultsStore
+from mesonet.chan_lab.helpers.utils import config_to_namespace
+
+SUMMARY_FIELDS = ["minuend", "subtrahend", "rmse", "pearson",
+                  "max_abs_difference"]
+
+
+def matlab_labels(filename: str) -> List[str]:
+    """Get the region labels of a MATLAB correlation matrix file."""
+    data = scipy.io.loadmat(filename, variable_names=["ROIlabels"])
+    return [str(label[0]) for label in data["ROIlabels"][0]]
+
+
+def compared_labels(args) -> List[str]:
+    """Get the labels of the regions to compare: the configured `regions`, or
+    by default the regions of the first MATLAB file that are in the MesoNet
+    segmentation (or all of those regions if there are no MATLAB files).
+    """
+    if getattr(args, "regions", None):
+        unknown = [label for label in args.regions
+                   if label not in MATLAB_INVERSE]
+        if unknown:
+            raise ValueError(f"Unknown regions: {unknown}")
+        return list(args.regions)
+
+    for matrix in args.matrices:
+        if matrix["file"].endswith(".mat"):
+            return [label for label in matlab_labels(matrix["file"])
+                    if label in MATLAB_INVERSE]
+    return [MATLAB[region] for region in sorted(MATLAB)]
+
+
+def load_matrix(matrix: Dict[str, Any], labels: List[str]) -> np.ndarray:
+    """Load a correlation matrix, with its rows and columns in the order of the
+    labels. Only the compared regions are read from MesoNet results.
+    """
+    filename = matrix["file"]
+    if filename.endswith(".mat"):
+        data = scipy.io.loadmat(filename,
+                                variable_names=["ROIlabels", "corrmatrix1"])
+        file_labels = [str(label[0]) for label in data["ROIlabels"][0]]
+        indices = [file_labels.index(label) if label in file_labels else -1
+                   for label in labels]
+        return align_matrix(data["corrmatrix1"], indices)
+
+    regions = [MATLAB_INVERSE[label] for label in labels]
+    if filename.endswith(".h5"):
+        with ResultsStore(filename) as results:
+            return results.correlation(matrix.get("correlation", "corrmat"),
+                                       regions)
+    elif filename.endswith(".npy"):
+        return align_matrix(np.load(filename, mmap_mode="r"), regions)
+    else:
+        raise ValueError(f"Unsupported correlation matrix file '{filename}'")
+
+
+def plot_difference(difference: np.ndarray,
+                    title: str,
+                    plot_labels: List[str],
+                    filename: str,
+                    annotate: bool = False):
+    n_regions = len(plot_labels)
+    figure, ax = plt.subplots()
+    image = ax.matshow(difference, vmin=-1.0, vmax=1.0)
+    ax.set_title(title, fontsize=6)
+    ax.set_xlabel("Region number", fontsize=6)
+    ax.set_xticks(range(n_regions))
+    ax.set_xticklabels(plot_labels, rotation=45, fontsize=6)
+    ax.set_yticks(range(n_regions))
+    ax.set_yticklabels(plot_labels, fontsize=6)
+    ax.tick_params(axis="x", labelbottom=True)
+    figure.colorbar(image)
+    if annotate:
+        for (i, j), value in np.ndenumerate(difference):
+            ax.text(j, i, f"{value:0.3f}", ha="center", va="center",
+                    fontsize=3)
+    figure.savefig(filename, dpi=200)
+    plt.close(figure)
+
+
+def main(args: argparse.Namespace):
+    if not os.path.exists(args.save_dir):
+        os.makedirs(args.save_dir)
+
+    tags = [matrix["tag"] for matrix in args.matrices]
+    if len(set(tags)) != len(tags):
+        raise ValueError("The tags of the matrices must be unique")
+
+    labels = compared_labels(args)
+    matrices = np.stack([load_matrix(matrix, labels)
+                         for matrix in args.matrices])
+    pairs, differences, statistics = compare_matrices(matrices)
+
+    pair_tags = [(tags[minuend], tags[subtrahend])
+                 for minuend, subtrahend in pairs]
+    np.save(os.path.join(args.save_dir, "differences.npy"), differences)
+    scipy.io.savemat(os.path.join(args.save_dir, "differences.mat"),
+                     {"data": differences,
+                      "pairs": np.array(pair_tags, dtype=object),
+                      "regions": np.array(labels, dtype=object)})
+
+    with open(os.path.join(args.save_dir, "summary.csv"), "w",
+              newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_FIELDS)
+        for i, (minuend, subtrahend) in enumerate(pair_tags):
+            writer.writerow([minuend, subtrahend] +
+                            [f"{statistics[field][i]:.6f}"
+                             for field in SUMMARY_FIELDS[2:]])
+            print(f"{minuend} - {subtrahend}: "
+                  f"rmse = {statistics['rmse'][i]:.3f}, "
+                  f"r = {statistics['pearson'][i]:.3f}")
+
+    if getattr(args, "plot_heatmaps", False):
+        plot_labels = [f"{MATLAB_INVERSE[label]} ({label})"
+                       for label in labels]
+        jobs = [(difference,
+                 f"{minuend} - {subtrahend}",
+                 plot_labels,
+                 os.path.join(args.save_dir, f"{minuend} - {subtrahend}.png"),
+                 getattr(args, "annotate_heatmaps", False))
+                for difference, (minuend, subtrahend)
+                in zip(differences, pair_tags)]
+        workers = getattr(args, "workers", 1)
+        if workers <= 1:
+            for job in jobs:
+                plot_difference(*job)
+        else:
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(workers) as pool:
+                pool.starmap(plot_difference, jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", type=str, required=True)
+    args = parser.parse_args()
+
+    config_args = config_to_namespace(args.config)
+
+    main(config_args)
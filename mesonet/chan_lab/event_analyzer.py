@@ -6,7 +6,6 @@ import argparse
 import os
 from typing import List
 
-import cv2
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 import numpy as np
@@ -38,19 +37,19 @@ def main(args: argparse.Namespace):
         os.makedirs(args.save_dir)
 
     image_series = ImageSeriesCreator.create_cached_image_series(
-            args.mesoscale_file, 128, 128, "all")
+            args.mesoscale_file, 128, 128, "all",
+            cache_dir=getattr(args, "cache_dir", None))
     video_series = ImageSeriesCreator.create_uncached_image_series(
-            args.pupil_file)
+            args.pupil_file,
+            build_index=getattr(args, "build_video_index", False))
     pdata: np.ndarray = np.genfromtxt(args.pupillometry_file, delimiter=";")
     pdata_interval = int(pdata[1][0] - pdata[0][0])
     pdata = {int(frame): pupil_size for frame, pupil_size in pdata}
-    p_fps = cv2.VideoCapture(args.pupil_file).get(cv2.CAP_PROP_FPS)
+    p_fps = video_series.fps
     m_fps = float(os.path.basename(args.mesoscale_file).split("_")[5][2:-2])
     frames_total = args.frames_after - args.frames_before
 
     pupil_sizes: List[List[float]] = []
-    video_frames: List[List[np.ndarray]] = []
-    images: List[List[np.ndarray]] = []
     for i, pupil_event_frame in enumerate(args.pupil_event_frames):
         # Collect pupil size data.
         pupil_sizes.append([])
@@ -59,30 +58,46 @@ def main(args: argparse.Namespace):
             if pupil_event_frame - 1 + j in pdata:
                 pupil_sizes[i].append(pdata[pupil_event_frame - 1 + j])
 
-        # Collect video data.
-        video_frames.append([])
-        for j in range(args.frames_before, args.frames_after):
-            video_frame = video_series.get_frame(pupil_event_frame - 1 + j)
-            video_frame = np.mean(video_frame, axis=-1)
-            video_frame = video_frame.astype(np.uint8)
-            video_frame = 255 - video_frame
-            video_frames[i].append(video_frame)
-
-        # Collect mesoscale brain data.
-        images.append([])
-        mframe = pframe_to_mframe(pupil_event_frame,
-                                  p_fps,
-                                  m_fps,
-                                  args.pupil_event_frames[0],
-                                  args.mesoscale_event_start_frame)
-        for j in range(args.frames_before, args.frames_after):
-            images[i].append(image_series.get_frame(mframe - 1 + j))
+    # Collect the video and mesoscale brain data around every event at once.
+    window = np.arange(args.frames_before, args.frames_after)
+    pframes = np.array(args.pupil_event_frames)
+    mframes = np.array([
+        pframe_to_mframe(pupil_event_frame,
+                         p_fps,
+                         m_fps,
+                         args.pupil_event_frames[0],
+                         args.mesoscale_event_start_frame)
+        for pupil_event_frame in args.pupil_event_frames
+    ])
+    pframe_indices = (pframes[:, np.newaxis] - 1 + window).ravel()
+    mframe_indices = (mframes[:, np.newaxis] - 1 + window).ravel()
+
+    # Convert the video frames to inverted grey levels one at a time, so that
+    # only one colour frame is held in memory besides the grey frames. The
+    # frames are decoded in sorted order so that the decoder only moves
+    # forward between seeks.
+    video_frames = None
+    for i in np.argsort(pframe_indices, kind="stable"):
+        frame = video_series.get_frame(int(pframe_indices[i]))
+        grey_frame = frame.mean(axis=-1, dtype=np.float32).astype(np.uint8)
+        if video_frames is None:
+            video_frames = np.empty((len(pframe_indices),) + grey_frame.shape,
+                                    dtype=np.uint8)
+        video_frames[i] = 255 - grey_frame
+    video_frames = np.reshape(video_frames,
+                              (len(pframes), len(window)) +
+                              video_frames.shape[1:])
+    video_series.close()
+
+    images = image_series.get_frames(mframe_indices)
+    images = np.reshape(images, (len(mframes), len(window)) + images.shape[1:])
+    image_series.close()
 
     # Take the average over the collected data.
     average_pupil_sizes = np.mean(np.array(pupil_sizes), axis=0)
     std_pupil_sizes = np.std(np.array(pupil_sizes), axis=0)
-    average_video_frames = np.mean(np.array(video_frames), axis=0)
-    average_images = np.mean(np.array(images), axis=0)
+    average_video_frames = np.mean(video_frames, axis=0)
+    average_images = np.mean(images, axis=0)
 
     # Plot the data.
     plt.rcParams.update({'font.size': 5})
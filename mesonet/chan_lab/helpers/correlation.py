@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+class CorrelationAccumulator:
+    """Accumulates the correlation matrix of a set of timecourses in one pass.
+
+    Blocks of samples with shape (variables, samples) are fed to `update` as
+    they arrive, and only the sample count, the means and the co-moment matrix
+    of the variables are kept. The correlation matrix is available at any
+    point, and accumulators of different parts of the same timecourses can be
+    combined with `merge`, so that workers can each process a slice of a
+    recording.
+    """
+
+    def __init__(self, n_variables: int):
+        self._count = 0
+        self._mean = np.zeros((n_variables,))
+        self._comoment = np.zeros((n_variables, n_variables))
+
+    @property
+    def n_variables(self) -> int:
+        return len(self._mean)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._mean
+
+    def update(self, block: np.ndarray) -> CorrelationAccumulator:
+        block = np.asarray(block, dtype=np.float64)
+        assert block.ndim == 2 and block.shape[0] == self.n_variables
+
+        count = block.shape[1]
+        if count == 0:
+            return self
+
+        mean = block.mean(axis=1)
+        centered = block - mean[:, np.newaxis]
+        return self._merge_moments(count, mean, centered @ centered.T)
+
+    def merge(self, other: CorrelationAccumulator) -> CorrelationAccumulator:
+        assert other.n_variables == self.n_variables
+        return self._merge_moments(other._count, other._mean, other._comoment)
+
+    def covariance(self) -> np.ndarray:
+        return self._comoment / (self._count - 1)
+
+    def correlation(self) -> np.ndarray:
+        """Get the correlation matrix, as would be given by `np.corrcoef` on
+        the accumulated timecourses. Constant timecourses have NaN
+        correlations.
+        """
+        stddev = np.sqrt(np.diag(self._comoment))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = self._comoment / np.outer(stddev, stddev)
+        return np.clip(correlation, -1, 1)
+
+    def save(self, filename: str):
+        np.savez(filename,
+                 count=self._count,
+                 mean=self._mean,
+                 comoment=self._comoment)
+
+    @staticmethod
+    def load(filename: str) -> CorrelationAccumulator:
+        with np.load(filename) as data:
+            accumulator = CorrelationAccumulator(len(data["mean"]))
+            accumulator._count = int(data["count"])
+            accumulator._mean = data["mean"]
+            accumulator._comoment = data["comoment"]
+        return accumulator
+
+    def _merge_moments(self,
+                       count: int,
+                       mean: np.ndarray,
+                       comoment: np.ndarray) -> CorrelationAccumulator:
+        # Pairwise combination of the moments of two sets of samples (Chan et
+        # al., 1979).
+        if count == 0:
+            return self
+
+        total = self._count + count
+        delta = mean - self._mean
+        self._comoment = (self._comoment + comoment +
+                          np.outer(delta, delta) * self._count * count / total)
+        self._mean = self._mean + delta * count / total
+        self._count = total
+        return self
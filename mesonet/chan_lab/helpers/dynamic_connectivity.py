@@ -0,0 +1,85 @@
+import collections
+
+import numpy as np
+
+
+def window_starts(n_frames: int,
+                  window_frames: int,
+                  step_frames: int) -> np.ndarray:
+    """Get the first frame of each full window of the timecourse."""
+    if window_frames < 2 or step_frames < 1:
+        raise ValueError(f"Invalid window ({window_frames} frames) or step "
+                         f"({step_frames} frames)")
+    return np.arange(0, n_frames - window_frames + 1, step_frames)
+
+
+def sliding_window_correlations(timecourse: np.ndarray,
+                                window_frames: int,
+                                step_frames: int,
+                                filename: str) -> np.ndarray:
+    """Write the correlation matrix of the regions over each sliding window of
+    the timecourse to a .npy file, and return it as a read-only memory-mapped
+    array with shape (windows, regions, regions).
+
+    The timecourse has shape (regions, frames), and the windows are the
+    `window_frames` long windows starting every `step_frames` frames (see
+    `window_starts`). The sums and cross-products of the timecourse are
+    accumulated once, in order, and each window is the difference of the
+    running sums at its end and at its start, so each window costs
+    O(regions^2) whatever its length. Only the running sums at the starts of
+    the windows not yet ended are held in memory. Constant timecourses have NaN
+    correlations, and the matrices are stored as float32.
+    """
+    # Center on the mean of the whole timecourse, so that the running sums of
+    # cross-products do not lose precision to large means.
+    timecourse = np.asarray(timecourse, dtype=np.float64)
+    timecourse = timecourse - timecourse.mean(axis=1, keepdims=True)
+    n_regions, n_frames = timecourse.shape
+
+    starts = window_starts(n_frames, window_frames, step_frames)
+    correlations = np.lib.format.open_memmap(filename,
+                                             mode="w+",
+                                             dtype=np.float32,
+                                             shape=(len(starts),
+                                                    n_regions,
+                                                    n_regions))
+
+    sums = np.zeros((n_regions,))
+    cross_products = np.zeros((n_regions, n_regions))
+    position = 0
+    # The running sums at the start of each window that has not yet ended, in
+    # window order.
+    open_windows = collections.deque()
+    next_window = 0
+    for boundary in np.union1d(starts, starts + window_frames):
+        block = timecourse[:, position:boundary]
+        sums += block.sum(axis=1)
+        cross_products += block @ block.T
+        position = boundary
+
+        if open_windows and \
+                starts[open_windows[0][0]] + window_frames == boundary:
+            window, start_sums, start_cross_products = open_windows.popleft()
+            correlations[window] = _correlation(
+                    sums - start_sums,
+                    cross_products - start_cross_products,
+                    window_frames)
+        if next_window < len(starts) and starts[next_window] == boundary:
+            open_windows.append((next_window,
+                                 sums.copy(),
+                                 cross_products.copy()))
+            next_window += 1
+
+    correlations.flush()
+    del correlations
+    return np.load(filename, mmap_mode="r")
+
+
+def _correlation(sums: np.ndarray,
+                 cross_products: np.ndarray,
+                 count: int) -> np.ndarray:
+    comoment = cross_products - np.outer(sums, sums) / count
+    stddev = np.sqrt(np.maximum(np.diag(comoment), 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = comoment / np.outer(stddev, stddev)
+    return np.clip(correlation, -1, 1)
@@ -0,0 +1,123 @@
+import concurrent.futures
+import os
+from typing import Optional
+
+import numpy as np
+import scipy.signal
+
+from mesonet.chan_lab.helpers.image_series import ImageSeries
+from mesonet.chan_lab.helpers.image_series import NpyImageSeries
+
+DEFAULT_FILTER_ORDER = 4
+FILTER_CHUNK_FRAMES = 1024
+# Number of pixel timecourses filtered at a time by each worker.
+FILTER_BLOCK_PIXELS = 1024
+
+
+def bandpass_sos(fps: float,
+                 low: Optional[float],
+                 high: Optional[float],
+                 order: int = DEFAULT_FILTER_ORDER) -> np.ndarray:
+    """Get the second-order sections of a Butterworth filter passing the
+    frequencies (in Hz) between `low` and `high`. A `low` of None (or 0) gives
+    a low-pass filter and a `high` of None gives a high-pass filter.
+    """
+    if low and high:
+        return scipy.signal.butter(order, [low, high], btype="bandpass",
+                                   fs=fps, output="sos")
+    elif high:
+        return scipy.signal.butter(order, high, btype="lowpass",
+                                   fs=fps, output="sos")
+    elif low:
+        return scipy.signal.butter(order, low, btype="highpass",
+                                   fs=fps, output="sos")
+    else:
+        raise ValueError("At least one of the low and high cutoffs is needed")
+
+
+def bandpass_timecourse(timecourse: np.ndarray,
+                        fps: float,
+                        low: Optional[float],
+                        high: Optional[float],
+                        order: int = DEFAULT_FILTER_ORDER) -> np.ndarray:
+    """Band-pass filter a (regions, frames) timecourse along time, forwards
+    and backwards so that the filtered timecourse has no phase shift.
+
+    Since the filter is linear, filtering the region timecourse gives the same
+    result as averaging the regions of the filtered pixels.
+    """
+    sos = bandpass_sos(fps, low, high, order)
+    return scipy.signal.sosfiltfilt(sos,
+                                    np.asarray(timecourse, dtype=np.float64),
+                                    axis=-1)
+
+
+def write_bandpassed_series(image_series: ImageSeries,
+                            filename: str,
+                            fps: float,
+                            low: Optional[float],
+                            high: Optional[float],
+                            order: int = DEFAULT_FILTER_ORDER,
+                            chunk_frames: int = FILTER_CHUNK_FRAMES,
+                            block_pixels: int = FILTER_BLOCK_PIXELS,
+                            workers: int = 1) -> NpyImageSeries:
+    """Band-pass filter every pixel of the series (as `bandpass_timecourse`),
+    write the filtered (frames, height, width) series to a .npy file, and get
+    it as a memory-mapped image series.
+
+    The series is read in chunks of `chunk_frames` frames into a temporary
+    memory-mapped file next to the output that holds each pixel timecourse
+    contiguously. The pixels are then filtered in place, in blocks of
+    `block_pixels` pixels spread over `workers` threads, and written to the
+    output in chunks of frames. Only a few chunks and blocks are held in memory
+    at a time.
+    """
+    sos = bandpass_sos(fps, low, high, order)
+    n_frames = int(image_series.n_frames)
+    frame_shape = image_series.get_frame(0).shape
+    n_pixels = int(np.prod(frame_shape))
+
+    pixels_filename = f"{filename}.pixels.npy"
+    pixels = np.lib.format.open_memmap(pixels_filename,
+                                       mode="w+",
+                                       dtype=np.float32,
+                                       shape=(n_pixels, n_frames))
+    try:
+        start = 0
+        for chunk in image_series.iter_chunks(chunk_frames):
+            pixels[:, start:start + len(chunk)] = \
+                    np.reshape(chunk, (len(chunk), -1)).T
+            start += len(chunk)
+
+        def filter_block(block_start: int):
+            block = slice(block_start, min(block_start + block_pixels,
+                                           n_pixels))
+            pixels[block] = scipy.signal.sosfiltfilt(
+                    sos, np.asarray(pixels[block], dtype=np.float64), axis=-1)
+
+        block_starts = range(0, n_pixels, block_pixels)
+        if workers <= 1:
+            for block_start in block_starts:
+                filter_block(block_start)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=workers) as executor:
+                # Consume the results so that errors are raised.
+                list(executor.map(filter_block, block_starts))
+
+        filtered = np.lib.format.open_memmap(filename,
+                                             mode="w+",
+                                             dtype=np.float32,
+                                             shape=(n_frames,) + frame_shape)
+        for start in range(0, n_frames, chunk_frames):
+            stop = min(start + chunk_frames, n_frames)
+            filtered[start:stop] = np.reshape(pixels[:, start:stop].T,
+                                              (stop - start,) + frame_shape)
+        filtered.flush()
+        del filtered
+    finally:
+        del pixels
+        os.remove(pixels_filename)
+
+    height, width = frame_shape[:2]
+    return NpyImageSeries(filename, width, height, "all", memmap=True)
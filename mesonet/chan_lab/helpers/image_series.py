@@ -1,14 +1,43 @@
-from typing import List, Union
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import os
+from collections import OrderedDict
+from typing import Iterator, List, Sequence, Union
 
 import cv2
+import h5py
 import numpy as np
-import PIL.Image
 import scipy
 
+from mesonet.chan_lab.helpers.low_rank import LowRankRecording
+from mesonet.chan_lab.helpers.recording_cache import (
+    DEFAULT_CACHE_SIZE_GB, RecordingCache
+)
+from mesonet.chan_lab.helpers.tiff_pages import TiffPageIndex
+from mesonet.chan_lab.helpers.video_index import (
+    build_keyframe_index, load_keyframe_index
+)
+
 BIG_ENDIAN_F32 = ">f4"
+NATIVE_F32 = "=f4"
+
+# Number of frames converted to native byte order at a time when iterating over
+# a memory-mapped image series.
+MEMMAP_CHUNK_FRAMES = 256
+
+# Default number of frames in each chunk yielded by ImageSeries.iter_chunks.
+DEFAULT_CHUNK_FRAMES = 256
 
 
 class ImageSeries:
+    """A series of frames read from a file.
+
+    Series are context managers that release the files they hold open (see
+    `close`).
+    """
+
     def __init__(self, filename: str):
         self._filename = filename
 
@@ -16,6 +45,18 @@ class ImageSeries:
     def filename(self) -> str:
         return self._filename
 
+    def __enter__(self) -> ImageSeries:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the files held open by the series. Frames can no longer be
+        read from a lazily loaded series once it is closed.
+        """
+        pass
+
     @property
     def n_frames(self) -> int:
         raise NotImplementedError
@@ -23,6 +64,59 @@ class ImageSeries:
     def get_frame(self, frame_index: int) -> np.ndarray:
         raise NotImplementedError
 
+    def get_frames(self, frames: Union[slice, Sequence[int]]) -> np.ndarray:
+        """Get the frames at the given indices (or in the given slice) as a
+        single array with the frames along the first axis.
+        """
+        frame_indices = self._frame_indices(frames)
+        first_frame = self.get_frame(
+                int(frame_indices[0]) if len(frame_indices) > 0 else 0)
+        frames_array = np.empty((len(frame_indices),) + first_frame.shape,
+                                dtype=first_frame.dtype)
+
+        for i, frame_index in enumerate(frame_indices):
+            frames_array[i] = self.get_frame(int(frame_index))
+
+        return frames_array
+
+    def iter_chunks(self,
+                    chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                    prefetch: int = 1) -> Iterator[np.ndarray]:
+        """Iterate over consecutive chunks of at most `chunk_frames` frames.
+
+        Up to `prefetch` upcoming chunks are read on a background thread while
+        the current chunk is being processed, so reading the series overlaps
+        with the work done on it. Setting `prefetch` to 0 reads each chunk
+        only when it is needed. Each call returns an independent iterator.
+        """
+        n_frames = int(self.n_frames)
+        chunk_slices = (slice(start, min(start + chunk_frames, n_frames))
+                        for start in range(0, n_frames, chunk_frames))
+
+        if prefetch <= 0:
+            for chunk_slice in chunk_slices:
+                yield self.get_frames(chunk_slice)
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        pending = collections.deque()
+        try:
+            for chunk_slice in chunk_slices:
+                pending.append(executor.submit(self.get_frames, chunk_slice))
+                if len(pending) > prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _frame_indices(self, frames: Union[slice, Sequence[int]]) -> np.ndarray:
+        if isinstance(frames, slice):
+            return np.arange(*frames.indices(int(self.n_frames)))
+        return np.asarray(frames, dtype=np.int64)
+
 
 class CachedImageSeries(ImageSeries):
     def __init__(self,
@@ -38,7 +132,6 @@ class CachedImageSeries(ImageSeries):
                                                     self._image_width,
                                                     self._image_height,
                                                     self._n_frames)
-        self._current_image_index = 0
         self._max_image_index = len(self._image_array)
 
     @property
@@ -49,21 +142,20 @@ class CachedImageSeries(ImageSeries):
     def image_array(self) -> np.ndarray:
         return self._image_array
 
-    def __iter__(self):
-        self._current_image_index = 0
-        return self
-
-    def __next__(self) -> np.ndarray:
-        if self._current_image_index < self._max_image_index:
-            current_image = self._image_array[self._current_image_index]
-            self._current_image_index += 1
-            return current_image
-        else:
-            raise StopIteration
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for frame_index in range(self._max_image_index):
+            yield self.get_frame(frame_index)
 
     def get_frame(self, frame_index: int) -> np.ndarray:
         return self._image_array[frame_index]
 
+    def get_frames(self, frames: Union[slice, Sequence[int]]) -> np.ndarray:
+        """Get the frames at the given indices (or in the given slice). A slice,
+        or a range that lies within the series, selects the frames with a
+        single slicing operation and may return a view of the image array.
+        """
+        return self._image_array[_as_slice(frames, self.n_frames)]
+
     def _load_image_series(self,
                            filename: str,
                            image_width: int,
@@ -85,79 +177,255 @@ class UncachedImageSeries(ImageSeries):
 
 
 class RawImageSeries(CachedImageSeries):
+    """An image series stored as a headerless file of big-endian 32-bit floats.
+    The frames are returned as native-endian 32-bit floats.
+
+    When `memmap` is set, the file is opened lazily with `np.memmap` instead of
+    being read into memory. Only the requested frames are mapped, and frames are
+    converted to native byte order `MEMMAP_CHUNK_FRAMES` at a time as they are
+    accessed, so the resident memory stays bounded regardless of the recording
+    length.
+    """
+
     def __init__(self,
                  filename: str,
                  image_width: int,
                  image_height: int,
-                 n_frames: Union[int, str] = "all"):
+                 n_frames: Union[int, str] = "all",
+                 memmap: bool = False):
+        self._memmap = memmap
+        self._chunk_start = 0
+        self._chunk = None
         super().__init__(filename, image_width, image_height, n_frames)
 
+    @property
+    def memmap(self) -> bool:
+        return self._memmap
+
+    def get_frame(self, frame_index: int) -> np.ndarray:
+        if not self._memmap:
+            return super().get_frame(frame_index)
+
+        if frame_index < 0:
+            frame_index += self._max_image_index
+        if frame_index < 0 or frame_index >= self._max_image_index:
+            raise IndexError(f"Frame index {frame_index} is out of range")
+
+        if (self._chunk is None
+                or frame_index < self._chunk_start
+                or frame_index >= self._chunk_start + len(self._chunk)):
+            self._chunk_start = \
+                    frame_index - frame_index % MEMMAP_CHUNK_FRAMES
+            chunk_end = self._chunk_start + MEMMAP_CHUNK_FRAMES
+            self._chunk = self._image_array[self._chunk_start:chunk_end] \
+                    .astype(NATIVE_F32)
+
+        return self._chunk[frame_index - self._chunk_start]
+
+    def get_frames(self, frames: Union[slice, Sequence[int]]) -> np.ndarray:
+        if not self._memmap:
+            return super().get_frames(frames)
+        frames = _as_slice(frames, self.n_frames)
+        return self._image_array[frames].astype(NATIVE_F32)
+
     def _load_image_series(self,
                            filename: str,
                            image_width: int,
                            image_height: int,
                            n_frames: Union[int, str]) -> np.ndarray:
-        image_array = np.fromfile(filename, dtype=BIG_ENDIAN_F32)
+        frame_size = image_height * image_width
+        file_frames = os.path.getsize(filename) // (
+                frame_size * np.dtype(BIG_ENDIAN_F32).itemsize)
+        if isinstance(n_frames, int):
+            file_frames = min(file_frames, n_frames)
+
+        if self._memmap:
+            return np.memmap(filename,
+                             dtype=BIG_ENDIAN_F32,
+                             mode="r",
+                             shape=(file_frames, image_height, image_width))
+
+        image_array = np.fromfile(filename,
+                                  dtype=BIG_ENDIAN_F32,
+                                  count=file_frames * frame_size)
         image_array = np.reshape(image_array,
                                  (-1, image_height, image_width))
-
-        if isinstance(n_frames, int):
-            image_array = image_array[:n_frames]
+        # Swap the bytes in place rather than with a converted copy of the
+        # whole recording.
+        if image_array.dtype != NATIVE_F32:
+            image_array = image_array.byteswap(inplace=True).view(NATIVE_F32)
 
         return image_array
 
 
-# Modified from https://stackoverflow.com/questions/9627652/split-multi-page-tiff-with-python
 class TiffImageSeries(CachedImageSeries):
+    """A multi-page TIFF image series.
+
+    The pages are located through a `TiffPageIndex`, so only the first
+    `n_frames` pages are ever scanned or read. When `memmap` is set and the
+    pages are uncompressed and evenly spaced in the file, the image array is a
+    memory-mapped view of the file rather than an in-memory copy.
+    """
+
     def __init__(self,
                  filename: str,
                  image_width: int,
                  image_height: int,
-                 n_frames: Union[int, str] = "all"):
+                 n_frames: Union[int, str] = "all",
+                 memmap: bool = False):
+        self._memmap = memmap
+        self._page_index = None
         super().__init__(filename, image_width, image_height, n_frames)
 
+    @property
+    def page_index(self) -> TiffPageIndex:
+        return self._page_index
+
     def _load_image_series(self,
                            filename: str,
                            image_width: int,
                            image_height: int,
                            n_frames: Union[int, str]) -> np.ndarray:
-        image = PIL.Image.open(filename)
-        image.seek(0)
-        current_ptr = image.tell()
+        self._page_index = TiffPageIndex(
+                filename,
+                max_pages=n_frames if isinstance(n_frames, int) else None)
 
-        image_size = (image.tag[0x101][0], image.tag[0x100][0])
+        image_size = self._page_index.pages[0].shape
         assert image_size == (image_height, image_width)
 
-        images = []
+        if self._memmap:
+            image_array = self._page_index.memmap()
+            if image_array is not None:
+                return image_array
+
+        return self._page_index.read_pages()
 
-        while True:
-            try:
-                image.seek(current_ptr)
-                current_ptr = image.tell() + 1
-            except EOFError:
-                break
-            images.append(image.getdata())
 
+class HDF5FrameArray:
+    """A lazily loaded, transposed view of a MATLAB v7.3 (HDF5) variable.
+
+    MATLAB stores arrays in column-major order, so the HDF5 dataset holds the
+    variable with its axes reversed. The `transpose_axes` are given relative to
+    the MATLAB variable, as they would be for `scipy.io.loadmat`, and the first
+    of the transposed axes is the frame axis. Frames are read from the file in
+    chunk-aligned blocks along the frame axis, and the most recent block is
+    kept so that consecutive frames do not go back to the file.
+    """
+
+    DEFAULT_BLOCK_FRAMES = 64
+
+    def __init__(self,
+                 dataset: h5py.Dataset,
+                 transpose_axes: List,
+                 n_frames: Union[int, str] = "all"):
+        ndim = len(dataset.shape)
+        if transpose_axes is None:
+            transpose_axes = list(range(ndim))
+        self._dataset = dataset
+        self._axes = [ndim - 1 - axis for axis in transpose_axes]
+        self._frame_axis = self._axes[0]
+        self._frame_axes = [
+            axis - (axis > self._frame_axis) for axis in self._axes[1:]
+        ]
+
+        self._n_frames = dataset.shape[self._frame_axis]
         if isinstance(n_frames, int):
-            images = images[:n_frames]
+            self._n_frames = min(self._n_frames, n_frames)
 
-        image_array = np.stack(images, axis=0)
-        image_array = np.reshape(image_array,
-                                 (-1, image_size[0], image_size[1]))
+        if dataset.chunks is not None:
+            self._block_frames = dataset.chunks[self._frame_axis]
+        else:
+            self._block_frames = HDF5FrameArray.DEFAULT_BLOCK_FRAMES
+        self._block_start = 0
+        self._block = None
 
+    @property
+    def shape(self) -> tuple:
+        return (self._n_frames,) + tuple(self._dataset.shape[axis]
+                                         for axis in self._axes[1:])
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._dataset.dtype
+
+    @property
+    def ndim(self) -> int:
+        return len(self._axes)
+
+    def __len__(self) -> int:
+        return self._n_frames
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        image_array = self[:]
+        return image_array if dtype is None else image_array.astype(dtype)
+
+    def __getitem__(self, index) -> np.ndarray:
+        if isinstance(index, tuple):
+            frames = self[index[0]]
+            if isinstance(index[0], (int, np.integer)):
+                return frames[index[1:]]
+            return frames[(slice(None),) + index[1:]]
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._n_frames)
+            if step != 1:
+                return self[np.arange(start, stop, step)]
+            return self._read_frames(start, max(start, stop))
+
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += self._n_frames
+            if index < 0 or index >= self._n_frames:
+                raise IndexError(f"Frame index {index} is out of range")
+            if (self._block is None
+                    or index < self._block_start
+                    or index >= self._block_start + len(self._block)):
+                self._block_start = index - index % self._block_frames
+                self._block = self._read_frames(
+                        self._block_start,
+                        min(self._block_start + self._block_frames,
+                            self._n_frames))
+            return self._block[index - self._block_start]
+
+        # A sequence of frame indices. The frames are read in sorted order so
+        # that each block is read from the file at most once.
+        indices = np.arange(self._n_frames)[np.asarray(index)]
+        image_array = np.empty((len(indices),) + self.shape[1:],
+                               dtype=self.dtype)
+        for i in np.argsort(indices, kind="stable"):
+            image_array[i] = self[int(indices[i])]
         return image_array
 
+    def _read_frames(self, start: int, stop: int) -> np.ndarray:
+        selection = [slice(None)] * len(self._axes)
+        selection[self._frame_axis] = slice(start, stop)
+        frames = self._dataset[tuple(selection)]
+        frames = np.moveaxis(frames, self._frame_axis, 0)
+        return np.transpose(frames, axes=[0] + [axis + 1 for axis in
+                                                self._frame_axes])
+
 
 class MatImageSeries(CachedImageSeries):
+    """An image series stored as a variable of a MATLAB .mat file.
+
+    Files saved in the MATLAB v7.3 format are read through h5py. For such
+    files, setting `memmap` exposes the frames lazily through an
+    `HDF5FrameArray` instead of loading and transposing the whole variable,
+    and the file stays open until the series is closed.
+    """
+
     def __init__(self,
                  filename: str,
                  image_width: int,
                  image_height: int,
                  property: str,
                  transpose_axes: List,
-                 n_frames: Union[int, str] = "all"):
+                 n_frames: Union[int, str] = "all",
+                 memmap: bool = False):
         self._property = property
         self._transpose_axes = transpose_axes
+        self._memmap = memmap
+        self._h5_file = None
         super().__init__(filename, image_width, image_height, n_frames)
 
     def _load_image_series(self,
@@ -165,7 +433,21 @@ class MatImageSeries(CachedImageSeries):
                            image_width: int,
                            image_height: int,
                            n_frames: Union[int, str]) -> np.ndarray:
-        image_array = scipy.io.loadmat(filename)[self._property]
+        try:
+            image_array = scipy.io.loadmat(
+                    filename, variable_names=[self._property])[self._property]
+        except NotImplementedError:
+            if not self._memmap:
+                with h5py.File(filename, "r") as f:
+                    return HDF5FrameArray(f[self._property],
+                                          self._transpose_axes,
+                                          n_frames)[:]
+
+            self._h5_file = h5py.File(filename, "r")
+            return HDF5FrameArray(self._h5_file[self._property],
+                                  self._transpose_axes,
+                                  n_frames)
+
         image_array = np.transpose(image_array, axes=self._transpose_axes)
 
         if isinstance(n_frames, int):
@@ -173,14 +455,171 @@ class MatImageSeries(CachedImageSeries):
 
         return image_array
 
+    def close(self):
+        if self._h5_file is not None:
+            self._h5_file.close()
+            self._h5_file = None
+
+
+class NpyImageSeries(CachedImageSeries):
+    """An image series stored as a NumPy .npy file with shape
+    (frames, height, width), such as the recordings of a `RecordingCache`.
+    """
+
+    def __init__(self,
+                 filename: str,
+                 image_width: int,
+                 image_height: int,
+                 n_frames: Union[int, str] = "all",
+                 memmap: bool = False):
+        self._memmap = memmap
+        super().__init__(filename, image_width, image_height, n_frames)
+
+    def _load_image_series(self,
+                           filename: str,
+                           image_width: int,
+                           image_height: int,
+                           n_frames: Union[int, str]) -> np.ndarray:
+        image_array = np.load(filename, mmap_mode="r" if self._memmap else None)
+        assert image_array.shape[1:] == (image_height, image_width)
+
+        if isinstance(n_frames, int):
+            image_array = image_array[:n_frames]
+
+        return image_array
+
+
+class LowRankImageSeries(ImageSeries):
+    """An image series stored in the low-rank form of a `LowRankRecording`
+    (`.npz`). Frames are reconstructed from the components as they are
+    accessed, and the low-rank form is available to analyses that can use it
+    directly.
+    """
+
+    def __init__(self,
+                 filename: str,
+                 image_width: int,
+                 image_height: int,
+                 n_frames: Union[int, str] = "all"):
+        super().__init__(filename)
+        low_rank = LowRankRecording.load(filename)
+        assert low_rank.frame_shape == (image_height, image_width)
+
+        if isinstance(n_frames, int):
+            low_rank = low_rank.frames(slice(0, n_frames))
+        self._low_rank = low_rank
+
+    @property
+    def n_frames(self) -> int:
+        return self._low_rank.n_frames
+
+    @property
+    def low_rank(self) -> LowRankRecording:
+        return self._low_rank
+
+    def get_frame(self, frame_index: int) -> np.ndarray:
+        return self._low_rank.reconstruct([frame_index])[0]
+
+    def get_frames(self, frames: Union[slice, Sequence[int]]) -> np.ndarray:
+        return self._low_rank.reconstruct(_as_slice(frames, self.n_frames))
+
+
+class BinnedImageSeries(ImageSeries):
+    """An image series whose frames are the frames of another series averaged
+    over non-overlapping `spatial_bin` x `spatial_bin` blocks of pixels.
+
+    Frames are binned as they are read, chunk by chunk (see `bin_frames`), so
+    the source series is never held in memory at its full resolution. The
+    height and width of the source frames must be multiples of `spatial_bin`.
+    """
+
+    def __init__(self, image_series: ImageSeries, spatial_bin: int):
+        super().__init__(image_series.filename)
+        self._image_series = image_series
+        self._spatial_bin = spatial_bin
+
+        height, width = image_series.get_frame(0).shape[:2]
+        if height % spatial_bin != 0 or width % spatial_bin != 0:
+            raise ValueError(f"The {width}x{height} frames of "
+                             f"'{image_series.filename}' cannot be binned in "
+                             f"{spatial_bin}x{spatial_bin} blocks")
+
+    @property
+    def n_frames(self) -> int:
+        return self._image_series.n_frames
+
+    @property
+    def image_series(self) -> ImageSeries:
+        return self._image_series
+
+    @property
+    def spatial_bin(self) -> int:
+        return self._spatial_bin
+
+    def close(self):
+        self._image_series.close()
+
+    def get_frame(self, frame_index: int) -> np.ndarray:
+        frame = self._image_series.get_frame(frame_index)
+        return bin_frames(frame[np.newaxis], self._spatial_bin)[0]
+
+    def get_frames(self, frames: Union[slice, Sequence[int]]) -> np.ndarray:
+        return bin_frames(self._image_series.get_frames(frames),
+                          self._spatial_bin)
+
+    def iter_chunks(self,
+                    chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                    prefetch: int = 1) -> Iterator[np.ndarray]:
+        # Bin the chunks of the source series, which keeps its prefetching.
+        for chunk in self._image_series.iter_chunks(chunk_frames, prefetch):
+            yield bin_frames(chunk, self._spatial_bin)
+
 
 class VideoSeries(UncachedImageSeries):
-    def __init__(self, filename: str):
+    """A video read frame by frame through OpenCV.
+
+    The position of the decoder is tracked so that reading the next frame does
+    not seek, and short forward gaps (up to `MAX_GRAB_FRAMES`) are skipped by
+    grabbing frames instead of seeking to the nearest keyframe. Decoded frames
+    are kept in a least recently used cache of at most `cache_size_mb`
+    megabytes, so going back and forth over the same frames does not decode
+    them again. The returned frames are read-only.
+
+    If a keyframe index was built for the video (see `build_keyframe_index`),
+    its frame count is used instead of the one reported by the container, and
+    random accesses seek to the nearest preceding keyframe and decode forward
+    from there. Setting `build_index` builds the index if it does not exist.
+    """
+
+    MAX_GRAB_FRAMES = 32
+    DEFAULT_CACHE_SIZE_MB = 256
+
+    def __init__(self,
+                 filename: str,
+                 cache_size_mb: float = DEFAULT_CACHE_SIZE_MB,
+                 build_index: bool = False):
         super().__init__(filename)
         self._video_capture = cv2.VideoCapture(filename)
         self._n_frames = self._video_capture.get(cv2.CAP_PROP_FRAME_COUNT)
         self._fps = self._video_capture.get(cv2.CAP_PROP_FPS)
 
+        index = load_keyframe_index(filename)
+        if index is None and build_index:
+            index = build_keyframe_index(filename)
+        self._keyframes = None
+        if index is not None:
+            self._n_frames = index["n_frames"]
+            if index["keyframes"] is not None:
+                self._keyframes = np.array(index["keyframes"])
+
+        # The index of the frame that the next call to read() will return, or
+        # None if it is unknown.
+        self._position = 0
+
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = 0
+        self._max_cache_size = int(cache_size_mb * 1024 * 1024)
+
     @property
     def n_frames(self) -> int:
         return self._n_frames
@@ -189,17 +628,123 @@ class VideoSeries(UncachedImageSeries):
     def fps(self) -> float:
         return self._fps
 
+    def close(self):
+        self._video_capture.release()
+
     def get_frame(self, frame_index: int) -> np.ndarray:
         if frame_index < 0 or frame_index >= self._n_frames:
             raise ValueError(f"Frame index {frame_index} is out of range")
 
-        self._video_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        if frame_index in self._cache:
+            self._cache.move_to_end(frame_index)
+            return self._cache[frame_index]
+
+        frame = self._decode_frame(frame_index)
+        self._cache_frame(frame_index, frame)
+        return frame
+
+    def get_frames(self, frames: Union[slice, Sequence[int]]) -> np.ndarray:
+        """Get the frames at the given indices (or in the given slice). The
+        frames are decoded in a single pass in sorted order, so that the
+        decoder only moves forward between seeks.
+        """
+        frame_indices = self._frame_indices(frames)
+        frames_array = None
+        previous_index, previous_frame = None, None
+
+        for i in np.argsort(frame_indices, kind="stable"):
+            frame_index = int(frame_indices[i])
+            if frame_index != previous_index:
+                previous_index = frame_index
+                previous_frame = self.get_frame(frame_index)
+            if frames_array is None:
+                frames_array = np.empty(
+                        (len(frame_indices),) + previous_frame.shape,
+                        dtype=previous_frame.dtype)
+            frames_array[i] = previous_frame
+
+        if frames_array is None:
+            return super().get_frames(frames)
+        return frames_array
+
+    def _decode_frame(self, frame_index: int) -> np.ndarray:
+        gap = (frame_index - self._position if self._position is not None
+               else -1)
+
+        if self._keyframes is not None:
+            keyframe = int(self._keyframes[
+                    np.searchsorted(self._keyframes, frame_index, "right") - 1])
+            if gap < 0 or frame_index - keyframe < gap:
+                # The nearest preceding keyframe lies after the current
+                # position, so decoding from it reads fewer frames.
+                self._video_capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                gap = frame_index - keyframe
+            self._grab_frames(gap, frame_index)
+        elif 0 <= gap <= VideoSeries.MAX_GRAB_FRAMES:
+            self._grab_frames(gap, frame_index)
+        else:
+            self._video_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
         success, frame = self._video_capture.read()
 
         if not success:
+            self._position = None
             raise RuntimeError(f"Unable to load frame index {frame_index}")
+
+        self._position = frame_index + 1
+        frame.flags.writeable = False
         return frame
 
+    def _grab_frames(self, n_frames: int, frame_index: int):
+        for _ in range(n_frames):
+            if not self._video_capture.grab():
+                self._position = None
+                raise RuntimeError(f"Unable to load frame index {frame_index}")
+
+    def _cache_frame(self, frame_index: int, frame: np.ndarray):
+        if frame.nbytes > self._max_cache_size:
+            return
+
+        self._cache[frame_index] = frame
+        self._cache_size += frame.nbytes
+        while self._cache_size > self._max_cache_size:
+            _, evicted_frame = self._cache.popitem(last=False)
+            self._cache_size -= evicted_frame.nbytes
+
+
+def _as_slice(frames: Union[slice, Sequence[int]],
+              n_frames: int) -> Union[slice, np.ndarray]:
+    # Ranges that lie within the series select the same frames as the
+    # equivalent slice, which avoids fancy indexing.
+    if isinstance(frames, slice):
+        return frames
+    if (isinstance(frames, range) and frames.step > 0
+            and 0 <= frames.start and frames.stop <= n_frames):
+        return slice(frames.start, max(frames.start, frames.stop), frames.step)
+    return np.asarray(frames, dtype=np.int64)
+
+
+def bin_frames(frames: np.ndarray, spatial_bin: int) -> np.ndarray:
+    """Average (frames, height, width, ...) frames over non-overlapping
+    `spatial_bin` x `spatial_bin` blocks of pixels.
+
+    The frames are reshaped into blocks, which is a view of the frames when
+    they are contiguous, and averaged in a single reduction. Floating point
+    frames keep their precision, and other frames are averaged as 32-bit
+    floats.
+    """
+    if spatial_bin == 1:
+        return frames
+
+    n_frames, height, width = frames.shape[:3]
+    blocks = np.reshape(frames, (n_frames,
+                                 height // spatial_bin, spatial_bin,
+                                 width // spatial_bin, spatial_bin) +
+                        frames.shape[3:])
+    dtype = frames.dtype if np.issubdtype(frames.dtype, np.floating) else \
+            np.dtype(np.float32)
+    return blocks.mean(axis=(2, 4), dtype=dtype.newbyteorder("="))
+
 
 class ImageSeriesCreator:
     @staticmethod
@@ -207,29 +752,112 @@ class ImageSeriesCreator:
                                    image_width: int,
                                    image_height: int,
                                    n_frames: Union[int, str],
-                                   **kwargs) -> CachedImageSeries:
+                                   memmap: bool = False,
+                                   cache_dir: str = None,
+                                   cache_size_gb: float = DEFAULT_CACHE_SIZE_GB,
+                                   spatial_bin: int = 1,
+                                   **kwargs) -> ImageSeries:
+        """Open an image series of (image_height, image_width) frames. If
+        `spatial_bin` is greater than 1, the frames are binned in
+        `spatial_bin` x `spatial_bin` blocks as they are read (see
+        `BinnedImageSeries`), and with a `cache_dir`, both the original and the
+        binned recordings are cached.
+        """
+        if filename.endswith(".npz"):
+            # Low-rank recordings are already compact, so they are not cached.
+            image_series = LowRankImageSeries(filename,
+                                              image_width,
+                                              image_height,
+                                              n_frames)
+            if spatial_bin > 1:
+                return BinnedImageSeries(image_series, spatial_bin)
+            return image_series
+
+        if cache_dir is not None:
+            return ImageSeriesCreator._create_recording_cache_image_series(
+                    filename, image_width, image_height, n_frames, cache_dir,
+                    cache_size_gb, spatial_bin, **kwargs)
+
+        if spatial_bin > 1:
+            return BinnedImageSeries(
+                    ImageSeriesCreator.create_cached_image_series(
+                            filename, image_width, image_height, n_frames,
+                            memmap=memmap, **kwargs),
+                    spatial_bin)
+
         if filename.endswith(".tif") or filename.endswith(".tiff"):
             return TiffImageSeries(filename,
                                    image_width,
                                    image_height,
-                                   n_frames)
+                                   n_frames,
+                                   memmap=memmap)
         elif filename.endswith(".raw"):
             return RawImageSeries(filename,
                                   image_width,
                                   image_height,
-                                  n_frames)
+                                  n_frames,
+                                  memmap=memmap)
         elif filename.endswith(".mat"):
             return MatImageSeries(filename=filename,
                                   image_width=image_width,
                                   image_height=image_height,
                                   n_frames=n_frames,
+                                  memmap=memmap,
                                   **kwargs)
+        elif filename.endswith(".npy"):
+            return NpyImageSeries(filename,
+                                  image_width,
+                                  image_height,
+                                  n_frames,
+                                  memmap=memmap)
         else:
             raise ValueError(f"Unsupported image filename '{filename}'")
 
     @staticmethod
-    def create_uncached_image_series(filename: str) -> UncachedImageSeries:
+    def _create_recording_cache_image_series(filename: str,
+                                             image_width: int,
+                                             image_height: int,
+                                             n_frames: Union[int, str],
+                                             cache_dir: str,
+                                             cache_size_gb: float,
+                                             spatial_bin: int = 1,
+                                             **kwargs) -> CachedImageSeries:
+        # Only .mat files are interpreted using the extra arguments.
+        parameters = dict(kwargs) if filename.endswith(".mat") else {}
+        parameters.update(image_width=image_width, image_height=image_height)
+        if spatial_bin > 1:
+            parameters.update(spatial_bin=spatial_bin)
+
+        cache = RecordingCache(cache_dir, cache_size_gb)
+        key = cache.key(filename, **parameters)
+        cached_filename = cache.lookup(key)
+
+        if cached_filename is None:
+            if spatial_bin > 1:
+                # Bin the cached original recording, which is cached first if
+                # needed.
+                image_series = BinnedImageSeries(
+                        ImageSeriesCreator._create_recording_cache_image_series(
+                                filename, image_width, image_height, "all",
+                                cache_dir, cache_size_gb, **kwargs),
+                        spatial_bin)
+            else:
+                image_series = ImageSeriesCreator.create_cached_image_series(
+                        filename, image_width, image_height, "all", memmap=True,
+                        **kwargs)
+            with image_series:
+                cached_filename = cache.store(key, image_series, parameters)
+
+        return NpyImageSeries(cached_filename,
+                              image_width // spatial_bin,
+                              image_height // spatial_bin,
+                              n_frames,
+                              memmap=True)
+
+    @staticmethod
+    def create_uncached_image_series(filename: str,
+                                     **kwargs) -> UncachedImageSeries:
         if filename.endswith(".avi"):
-            return VideoSeries(filename)
+            return VideoSeries(filename, **kwargs)
         else:
             raise ValueError(f"Unsupported image filename '{filename}'")
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+
+DEFAULT_RANK = 200
+DEFAULT_OVERSAMPLES = 10
+DEFAULT_POWER_ITERATIONS = 1
+LOW_RANK_CHUNK_FRAMES = 1024
+
+
+class LowRankRecording:
+    """A recording compressed into its pixel means and a truncated singular
+    value decomposition of its centered frames.
+
+    The (frames, pixels) recording X is approximated by
+
+        X = 1 mean^T + U diag(S) V^T
+
+    where U has shape (frames, rank), S has shape (rank,) and V has shape
+    (pixels, rank). A recording of tens of thousands of frames of 256x256
+    pixels is held in a few hundred components, frames are reconstructed on
+    demand, and projections and pixel correlations are computed from the
+    components without reconstructing the frames.
+
+    On disk, the components are saved as a `.npz` file, with U and V stored as
+    32-bit floats.
+    """
+
+    def __init__(self,
+                 mean: np.ndarray,
+                 u: np.ndarray,
+                 s: np.ndarray,
+                 v: np.ndarray,
+                 frame_shape: Tuple[int, ...]):
+        self._mean = np.asarray(mean, dtype=np.float64)
+        self._u = np.asarray(u, dtype=np.float32)
+        self._s = np.asarray(s, dtype=np.float64)
+        self._v = np.asarray(v, dtype=np.float32)
+        self._frame_shape = tuple(int(size) for size in frame_shape)
+        assert self._u.shape[1] == len(self._s) == self._v.shape[1]
+        assert self._v.shape[0] == len(self._mean) == \
+                int(np.prod(self._frame_shape))
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._mean
+
+    @property
+    def u(self) -> np.ndarray:
+        return self._u
+
+    @property
+    def s(self) -> np.ndarray:
+        return self._s
+
+    @property
+    def v(self) -> np.ndarray:
+        return self._v
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        return self._frame_shape
+
+    @property
+    def n_frames(self) -> int:
+        return len(self._u)
+
+    @property
+    def rank(self) -> int:
+        return len(self._s)
+
+    def frames(self, frames: Union[slice, Sequence[int]]) -> LowRankRecording:
+        """Get the low-rank recording of a subset of the frames."""
+        return LowRankRecording(self._mean, self._u[frames], self._s, self._v,
+                                self._frame_shape)
+
+    def reconstruct(self, frames: Union[slice, Sequence[int]]) -> np.ndarray:
+        """Reconstruct the frames at the given indices (or in the given slice)
+        as a (frames, height, width) array of 32-bit floats.
+        """
+        u = np.atleast_2d(self._u[frames])
+        pixels = (u * self._s.astype(np.float32)) @ self._v.T + \
+                self._mean.astype(np.float32)
+        return np.reshape(pixels, (len(u),) + self._frame_shape)
+
+    def project(self,
+                matrix,
+                frames: Union[slice, Sequence[int]] = slice(None)) -> np.ndarray:
+        """Get the product of a (rows, pixels) matrix, dense or sparse, with
+        each frame, as a (rows, frames) array. This equals projecting the
+        reconstructed frames, but costs O(rows * rank) per frame instead of
+        O(pixels) per row and frame.
+        """
+        projected_mean = matrix @ self._mean
+        projected_v = np.asarray(matrix @ self._v.astype(np.float64))
+        return projected_mean[:, np.newaxis] + \
+                (projected_v * self._s) @ self._u[frames].T
+
+    def seed_correlations(self, seed_indices: Sequence[int]) -> np.ndarray:
+        """Get the correlation of each seed pixel with every pixel, as a
+        (seeds, pixels) array, as given by `seed_correlation_maps` on the
+        reconstructed frames. Only (rank, rank) and (seeds, pixels) products
+        are computed.
+        """
+        seed_indices = np.asarray(seed_indices)
+        u = self._u.astype(np.float64)
+        u = u - u.mean(axis=0)
+        # The covariance of the pixels (up to a constant) is W G W^T, where
+        # W = V S and G is the (rank, rank) Gram matrix of the centered U.
+        weighted_v = self._v.astype(np.float64) * self._s
+        gram = u.T @ u
+        cross_products = weighted_v[seed_indices] @ gram @ weighted_v.T
+        variances = np.einsum("ij,jk,ik->i", weighted_v, gram, weighted_v)
+
+        norms = np.sqrt(np.maximum(variances, 0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = cross_products / np.outer(norms[seed_indices], norms)
+        return np.clip(correlation, -1, 1)
+
+    def timecourse_correlations(self, timecourse: np.ndarray) -> np.ndarray:
+        """Get the correlation of each (frames,) timecourse of a (timecourses,
+        frames) array with every pixel, as a (timecourses, pixels) array, as
+        given by `region_correlation_maps` on the reconstructed frames.
+        """
+        timecourse = np.asarray(timecourse, dtype=np.float64)
+        timecourse = timecourse - timecourse.mean(axis=1, keepdims=True)
+        u = self._u.astype(np.float64)
+        u = u - u.mean(axis=0)
+        weighted_v = self._v.astype(np.float64) * self._s
+        cross_products = (timecourse @ u) @ weighted_v.T
+        variances = np.einsum("ij,jk,ik->i", weighted_v, u.T @ u, weighted_v)
+
+        norms = np.sqrt(np.maximum(variances, 0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = cross_products / np.outer(
+                    np.linalg.norm(timecourse, axis=1), norms)
+        return np.clip(correlation, -1, 1)
+
+    def save(self, filename: str):
+        np.savez(filename,
+                 mean=self._mean,
+                 u=self._u,
+                 s=self._s,
+                 v=self._v,
+                 frame_shape=np.asarray(self._frame_shape))
+
+    @staticmethod
+    def load(filename: str) -> LowRankRecording:
+        with np.load(filename) as data:
+            return LowRankRecording(data["mean"], data["u"], data["s"],
+                                    data["v"], tuple(data["frame_shape"]))
+
+    @staticmethod
+    def compute(image_series,
+                rank: int = DEFAULT_RANK,
+                oversamples: int = DEFAULT_OVERSAMPLES,
+                power_iterations: int = DEFAULT_POWER_ITERATIONS,
+                chunk_frames: int = LOW_RANK_CHUNK_FRAMES,
+                seed: int = None) -> LowRankRecording:
+        """Compress an image series with a randomized truncated SVD (Halko et
+        al., 2011) of its centered frames.
+
+        The series is read in chunks of `chunk_frames` frames, in
+        2 + 2 * `power_iterations` passes, and only (frames, rank +
+        `oversamples`) and (rank + `oversamples`, pixels) matrices are held in
+        memory. The frames are centered on the pixel means within the
+        products, so the centered series is never formed. More power
+        iterations give more accurate components for slowly decaying spectra.
+        """
+        n_frames = int(image_series.n_frames)
+        frame_shape = image_series.get_frame(0).shape
+        n_pixels = int(np.prod(frame_shape))
+        n_components = min(rank + oversamples, n_frames, n_pixels)
+        random_state = np.random.default_rng(seed)
+
+        # Sample the range of the frames, and get the pixel means on the way.
+        test_matrix = random_state.standard_normal((n_pixels, n_components))
+        sample = np.empty((n_frames, n_components))
+        pixel_sums = np.zeros((n_pixels,))
+        start = 0
+        for chunk in image_series.iter_chunks(chunk_frames):
+            chunk = np.reshape(chunk, (len(chunk), -1)).astype(np.float64)
+            sample[start:start + len(chunk)] = chunk @ test_matrix
+            pixel_sums += chunk.sum(axis=0)
+            start += len(chunk)
+        mean = pixel_sums / n_frames
+        sample -= mean @ test_matrix
+
+        for _ in range(power_iterations):
+            basis = _orthonormalize(sample)
+            pixel_basis = _orthonormalize(
+                    _project_frames(image_series, basis, mean, chunk_frames).T)
+            sample = _sample_frames(image_series, pixel_basis, mean,
+                                    chunk_frames)
+
+        basis = _orthonormalize(sample)
+        projected = _project_frames(image_series, basis, mean, chunk_frames)
+        u, s, vt = np.linalg.svd(projected, full_matrices=False)
+        rank = min(rank, len(s))
+        return LowRankRecording(mean,
+                                basis @ u[:, :rank],
+                                s[:rank],
+                                vt[:rank].T,
+                                frame_shape)
+
+
+def _orthonormalize(matrix: np.ndarray) -> np.ndarray:
+    q, _ = np.linalg.qr(matrix)
+    return q
+
+
+def _sample_frames(image_series,
+                   pixel_basis: np.ndarray,
+                   mean: np.ndarray,
+                   chunk_frames: int) -> np.ndarray:
+    # (X - 1 mean^T) pixel_basis, with shape (frames, components).
+    sample = np.empty((int(image_series.n_frames), pixel_basis.shape[1]))
+    start = 0
+    for chunk in image_series.iter_chunks(chunk_frames):
+        chunk = np.reshape(chunk, (len(chunk), -1)).astype(np.float64)
+        sample[start:start + len(chunk)] = chunk @ pixel_basis
+        start += len(chunk)
+    return sample - mean @ pixel_basis
+
+
+def _project_frames(image_series,
+                    basis: np.ndarray,
+                    mean: np.ndarray,
+                    chunk_frames: int) -> np.ndarray:
+    # basis^T (X - 1 mean^T), with shape (components, pixels).
+    projected = np.zeros((basis.shape[1], len(mean)))
+    start = 0
+    for chunk in image_series.iter_chunks(chunk_frames):
+        chunk = np.reshape(chunk, (len(chunk), -1)).astype(np.float64)
+        projected += basis[start:start + len(chunk)].T @ chunk
+        start += len(chunk)
+    return projected - np.outer(basis.sum(axis=0), mean)
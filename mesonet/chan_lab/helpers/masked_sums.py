@@ -0,0 +1,155 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# numpy sums floating point values pairwise: a sum is split in halves (at
+# multiples of PAIRWISE_UNROLL) down to blocks of at most PAIRWISE_BLOCK_SIZE
+# values, and each block is summed in PAIRWISE_UNROLL interleaved partial sums.
+PAIRWISE_BLOCK_SIZE = 128
+PAIRWISE_UNROLL = 8
+# Number of partial sums (additions times frames) held at a time.
+MAX_PARTIAL_SUMS = 1 << 23
+
+
+class MaskedSums:
+    """The sums of the pixels of each region mask, equal bit for bit to the
+    sums of the masked images, `(image * masks).sum(axis=(1, 2))`, on the
+    dense (regions, height, width) masks.
+
+    As numpy sums floating point values pairwise, the rounding of the sum of a
+    masked image depends on where in the image each masked pixel is. Adding
+    the zeros outside of a mask leaves a partial sum unchanged, so the sum of
+    a masked image is the same sequence of additions with the zeros left out.
+    That sequence is built once for the masks, as levels of independent
+    additions, and then carried out on the masked pixels of all of the frames
+    of a chunk at once. Integer images are summed exactly, as 64-bit integers.
+    """
+
+    def __init__(self,
+                 pixels: np.ndarray,
+                 offsets: np.ndarray,
+                 n_pixels: int):
+        """Create the sums of the masks given by their sorted flat `pixels`,
+        split by the `offsets` of the regions, in images of `n_pixels`
+        pixels.
+        """
+        self._pixels = np.asarray(pixels, dtype=np.int64)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._n_pixels = n_pixels
+
+        self._heights = [0] * len(self._pixels)
+        self._lefts = []
+        self._rights = []
+        roots = [self._region_sum(start, stop)
+                 for start, stop in zip(self._offsets[:-1],
+                                        self._offsets[1:])]
+        self._roots = np.array([-1 if root is None else root
+                                for root in roots], dtype=np.int64)
+        self._levels = self._group_levels()
+        del self._heights, self._lefts, self._rights
+
+    @property
+    def n_regions(self) -> int:
+        return len(self._offsets) - 1
+
+    def sums(self, images: np.ndarray) -> np.ndarray:
+        """Get the sum of each region mask in each of the (frames, pixels)
+        images, as a (regions, frames) array with the dtype numpy gives the
+        sums of the masked images.
+        """
+        masked_dtype = np.result_type(images.dtype, np.uint8)
+        sum_dtype = np.add.reduce(np.zeros((1,), dtype=masked_dtype)).dtype
+        # Half precision values are summed in single precision.
+        partial_dtype = np.dtype(np.float32) if sum_dtype == np.float16 \
+                else sum_dtype
+
+        n_frames = len(images)
+        sums = np.zeros((self.n_regions, n_frames), dtype=sum_dtype)
+        present = self._roots >= 0
+        n_partial_sums = len(self._pixels) + sum(len(level[0])
+                                                 for level in self._levels)
+        block_frames = max(1, MAX_PARTIAL_SUMS // max(1, n_partial_sums))
+        for start in range(0, n_frames, block_frames):
+            block = images[start:start + block_frames]
+            partial_sums = np.empty((n_partial_sums, len(block)),
+                                    dtype=partial_dtype)
+            partial_sums[:len(self._pixels)] = block[:, self._pixels].T
+            for destinations, lefts, rights in self._levels:
+                partial_sums[destinations] = \
+                        partial_sums[lefts] + partial_sums[rights]
+            # numpy adds the pairwise sum to a zero, which turns -0 into 0.
+            sums[present, start:start + len(block)] = \
+                    partial_sums[self._roots[present]] + partial_dtype.type(0)
+        return sums
+
+    def _add(self, left: Optional[int], right: Optional[int]) -> Optional[int]:
+        # The partial sum of two partial sums, where None is an empty sum.
+        if left is None:
+            return right
+        if right is None:
+            return left
+        self._lefts.append(left)
+        self._rights.append(right)
+        self._heights.append(max(self._heights[left],
+                                 self._heights[right]) + 1)
+        return len(self._heights) - 1
+
+    def _region_sum(self, start: int, stop: int) -> Optional[int]:
+        # The partial sums are numbered after the masked pixels, which are
+        # numbered by their index in the pixels of all of the regions.
+        positions = self._pixels[start:stop]
+
+        def pairwise_sum(first: int, last: int, offset: int, n: int):
+            # The sum of the masked pixels positions[first:last], which lie in
+            # the pixels [offset, offset + n) of the image.
+            if first == last:
+                return None
+
+            if n < PAIRWISE_UNROLL:
+                total = None
+                for i in range(first, last):
+                    total = self._add(total, start + i)
+                return total
+
+            if n <= PAIRWISE_BLOCK_SIZE:
+                unrolled_stop = offset + n - n % PAIRWISE_UNROLL
+                lanes: List[Optional[int]] = [None] * PAIRWISE_UNROLL
+                i = first
+                while i < last and positions[i] < unrolled_stop:
+                    lane = (positions[i] - offset) % PAIRWISE_UNROLL
+                    lanes[lane] = self._add(lanes[lane], start + i)
+                    i += 1
+                total = self._add(
+                        self._add(self._add(lanes[0], lanes[1]),
+                                  self._add(lanes[2], lanes[3])),
+                        self._add(self._add(lanes[4], lanes[5]),
+                                  self._add(lanes[6], lanes[7])))
+                for i in range(i, last):
+                    total = self._add(total, start + i)
+                return total
+
+            half = n // 2
+            half -= half % PAIRWISE_UNROLL
+            middle = first + int(np.searchsorted(positions[first:last],
+                                                 offset + half))
+            return self._add(pairwise_sum(first, middle, offset, half),
+                             pairwise_sum(middle, last, offset + half,
+                                          n - half))
+
+        return pairwise_sum(0, len(positions), 0, self._n_pixels)
+
+    def _group_levels(self) -> List[Tuple[np.ndarray, np.ndarray,
+                                          np.ndarray]]:
+        # Group the additions by their height above the masked pixels, so that
+        # the additions of each level only depend on earlier levels.
+        n_pixels = len(self._pixels)
+        heights = np.array(self._heights[n_pixels:], dtype=np.int64)
+        lefts = np.array(self._lefts, dtype=np.int64)
+        rights = np.array(self._rights, dtype=np.int64)
+        levels = []
+        for height in range(1, int(heights.max(initial=0)) + 1):
+            additions = np.flatnonzero(heights == height)
+            levels.append((additions + n_pixels,
+                           lefts[additions],
+                           rights[additions]))
+        return levels
@@ -0,0 +1,64 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+
+def align_matrix(matrix: np.ndarray, indices: Sequence[int]) -> np.ndarray:
+    """Select the rows and columns of a square matrix in the given order. An
+    index of -1 (a region missing from the matrix) gives a NaN row and column.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    present = indices >= 0
+    aligned = np.full((len(indices), len(indices)), np.nan)
+    aligned[np.ix_(present, present)] = \
+            np.asarray(matrix)[np.ix_(indices[present], indices[present])]
+    return aligned
+
+
+def compare_matrices(
+    matrices: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """Compare every pair of a (matrices, regions, regions) stack of aligned
+    correlation matrices.
+
+    Returns the (pairs, 2) indices of the minuend and subtrahend of each pair
+    (in the order of a nested loop over the matrices), the (pairs, regions,
+    regions) differences, and the statistics of the off-diagonal entries of
+    each pair: the root mean square difference ("rmse"), the Pearson
+    correlation of the two matrices ("pearson") and the largest absolute
+    difference ("max_abs_difference"). All of the pairs are computed at once,
+    and entries that are NaN in either matrix of a pair are left out of its
+    statistics (which are NaN if no entries are left).
+    """
+    matrices = np.asarray(matrices, dtype=np.float64)
+    n_matrices, n_regions = matrices.shape[:2]
+    minuends, subtrahends = np.triu_indices(n_matrices, k=1)
+    differences = matrices[minuends] - matrices[subtrahends]
+
+    rows, columns = np.nonzero(~np.eye(n_regions, dtype=bool))
+    x = matrices[minuends][:, rows, columns]
+    y = matrices[subtrahends][:, rows, columns]
+    valid = np.isfinite(x) & np.isfinite(y)
+    counts = valid.sum(axis=1)
+    x = np.where(valid, x, 0)
+    y = np.where(valid, y, 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rmse = np.sqrt(((x - y) ** 2).sum(axis=1) / counts)
+        max_abs_difference = np.where(counts > 0,
+                                      np.abs(x - y).max(axis=1, initial=0),
+                                      np.nan)
+        x_centered = np.where(valid,
+                              x - (x.sum(axis=1) / counts)[:, np.newaxis], 0)
+        y_centered = np.where(valid,
+                              y - (y.sum(axis=1) / counts)[:, np.newaxis], 0)
+        pearson = (x_centered * y_centered).sum(axis=1) / np.sqrt(
+                (x_centered ** 2).sum(axis=1) * (y_centered ** 2).sum(axis=1))
+
+    pairs = np.stack([minuends, subtrahends], axis=1)
+    statistics = {
+        "rmse": rmse,
+        "pearson": np.clip(pearson, -1, 1),
+        "max_abs_difference": max_abs_difference,
+    }
+    return pairs, differences, statistics
@@ -11,6 +11,7 @@ import scipy
 from mesonet.chan_lab.activity_analyzer import MasksManager
 from mesonet.chan_lab.helpers.event_frames import EventFrames
 from mesonet.chan_lab.helpers.image_series import ImageSeriesCreator
+from mesonet.region_labels import NO_REGION
 
 
 @dataclasses.dataclass(frozen=True)
@@ -40,7 +41,7 @@ class ImagePlotterArgs(PlotterArgs):
 
 @dataclasses.dataclass(frozen=True)
 class VideoPlotterArgs(PlotterArgs):
-    pass
+    kwargs: Dict[str, Any] = dataclasses.field(default_factory=dict)
 
 
 class SeriesPlotter:
@@ -152,11 +153,12 @@ class ImagePlotter(SeriesPlotter):
 
         self._mask = None
         if args.region_points:
+            spatial_bin = args.kwargs.get("spatial_bin", 1)
             self._mask = MasksManager(args.region_points,
-                                      args.image_width,
-                                      args.image_height)
-            self._mask = self._mask.masks
-            self._mask = np.logical_or.reduce(self._mask, axis=0)
+                                      args.image_width // spatial_bin,
+                                      args.image_height // spatial_bin,
+                                      cache_dir=args.kwargs.get("cache_dir"))
+            self._mask = self._mask.label_image != NO_REGION
             self._mask = np.ma.masked_where(self._mask == 0, self._mask)
 
     @property
@@ -171,12 +173,8 @@ class ImagePlotter(SeriesPlotter):
         left_index = frame_index - left * every
         right_index = frame_index + right * every
 
-        frames = [
-            self._image_series.get_frame(i)
-            for i in range(left_index, right_index + 1, every)
-        ]
-        frames = np.array(frames)
-        return frames
+        return self._image_series.get_frames(
+                range(left_index, right_index + 1, every))
 
     def update(self, frame_index: int, figure: Figure, axes: Axes,
                started: bool):
@@ -203,7 +201,8 @@ class VideoPlotter(SeriesPlotter):
     def __init__(self, args: VideoPlotterArgs):
         super().__init__(args.filename, args.event_frames, args.title)
         self._image_series = \
-                ImageSeriesCreator.create_uncached_image_series(args.filename)
+                ImageSeriesCreator.create_uncached_image_series(args.filename,
+                                                                **args.kwargs)
         self._axes_image = None
 
     @property
@@ -218,12 +217,8 @@ class VideoPlotter(SeriesPlotter):
         left_index = frame_index - left * every
         right_index = frame_index + right * every
 
-        frames = [
-            self._image_series.get_frame(i)
-            for i in range(left_index, right_index + 1, every)
-        ]
-        frames = np.array(frames)
-        return frames
+        return self._image_series.get_frames(
+                range(left_index, right_index + 1, every))
 
     def update(self, frame_index: int, figure: Figure, axes: Axes,
                started: bool):
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+CACHE_CHUNK_FRAMES = 1024
+DEFAULT_CACHE_SIZE_GB = 50.0
+# Temporary files of entries being stored that have not been modified for this
+# many seconds are left over from killed processes, and are removed.
+STALE_PARTIAL_SECONDS = 24 * 60 * 60
+
+
+class RecordingCache:
+    """A directory of converted recordings shared across analyses.
+
+    Each recording is stored once as a native-endian `.npy` file (which can be
+    opened as a memory-mapped array), together with a small JSON file holding
+    the metadata of the source. Entries are keyed by the source path, size and
+    modification time, and by the parameters used to interpret the source, so
+    a changed source file is converted again. When the total size of the cache
+    exceeds `cache_size_gb`, the least recently used entries are evicted.
+    The temporary files of entries being stored count towards the size of the
+    cache, and those left over by killed processes are removed once they are
+    `STALE_PARTIAL_SECONDS` old.
+    """
+
+    def __init__(self,
+                 cache_dir: str,
+                 cache_size_gb: float = DEFAULT_CACHE_SIZE_GB):
+        self._cache_dir = cache_dir
+        self._max_cache_size = int(cache_size_gb * 1024 ** 3)
+
+        if not os.path.exists(self._cache_dir):
+            os.makedirs(self._cache_dir)
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir
+
+    def key(self, filename: str, **parameters) -> str:
+        stat = os.stat(filename)
+        source = {
+            "filename": os.path.abspath(filename),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "parameters": parameters,
+        }
+        return hashlib.sha1(json.dumps(source, sort_keys=True,
+                                       default=str).encode()).hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Get the filename of the cached array for the key, or None if the
+        recording has not been cached.
+        """
+        array_filename = self._array_filename(key)
+        if not os.path.exists(array_filename):
+            return None
+
+        # Mark the entry as recently used.
+        os.utime(array_filename)
+        return array_filename
+
+    def store(self,
+              key: str,
+              image_series,
+              metadata: Dict[str, Any] = None) -> str:
+        """Convert an image series into a cache entry, reading it in chunks of
+        `CACHE_CHUNK_FRAMES` frames, and get the filename of the cached array.
+
+        The array and its metadata are written to temporary files with unique
+        names and then moved into place, so several processes can store the
+        same recording at once. If the entry is already complete, it is kept
+        and its filename is returned.
+        """
+        array_filename = self.lookup(key)
+        if array_filename is not None:
+            return array_filename
+
+        n_frames = int(image_series.n_frames)
+        first_chunk = image_series.get_frames(
+                slice(0, min(CACHE_CHUNK_FRAMES, n_frames)))
+        dtype = first_chunk.dtype.newbyteorder("=")
+
+        partial_filename = self._partial_filename(key)
+        partial_metadata_filename = self._partial_filename(key)
+        try:
+            array = np.lib.format.open_memmap(partial_filename,
+                                              mode="w+",
+                                              dtype=dtype,
+                                              shape=(n_frames,) +
+                                              first_chunk.shape[1:])
+            array[:len(first_chunk)] = first_chunk
+            for start in range(len(first_chunk), n_frames,
+                               CACHE_CHUNK_FRAMES):
+                stop = min(start + CACHE_CHUNK_FRAMES, n_frames)
+                array[start:stop] = image_series.get_frames(slice(start, stop))
+            array.flush()
+            del array
+
+            metadata = dict(metadata or {})
+            metadata.update({
+                "source": image_series.filename,
+                "shape": [n_frames] + list(first_chunk.shape[1:]),
+                "dtype": dtype.str,
+            })
+            # The metadata is in place before the array, so a cached array
+            # always has its metadata.
+            with open(partial_metadata_filename, "w") as f:
+                json.dump(metadata, f, default=str)
+            os.replace(partial_metadata_filename,
+                       self._metadata_filename(key))
+
+            array_filename = self.lookup(key)
+            if array_filename is None:
+                array_filename = self._array_filename(key)
+                os.replace(partial_filename, array_filename)
+        finally:
+            for filename in (partial_filename, partial_metadata_filename):
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+        self._evict(keep=key)
+        return array_filename
+
+    def _evict(self, keep: str):
+        entries = []
+        partial_size = 0
+        now = time.time()
+        for name in os.listdir(self._cache_dir):
+            if not name.endswith((".npy", ".partial")):
+                continue
+            filename = os.path.join(self._cache_dir, name)
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                # Evicted, or moved into place, by another process.
+                continue
+
+            if name.endswith(".partial"):
+                if now - stat.st_mtime > STALE_PARTIAL_SECONDS:
+                    self._remove(filename)
+                else:
+                    partial_size += stat.st_size
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-len(".npy")]))
+
+        cache_size = partial_size + sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if cache_size <= self._max_cache_size:
+                break
+            if key == keep:
+                continue
+            # An array that is in use cannot be removed on some systems (e.g.
+            # while it is memory-mapped on Windows), so its entry is kept.
+            if not self._remove(self._array_filename(key)):
+                continue
+            self._remove(self._metadata_filename(key))
+            cache_size -= size
+
+    @staticmethod
+    def _remove(filename: str) -> bool:
+        # Remove a file, and get whether it no longer exists.
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            # Removed by another process.
+            pass
+        except OSError:
+            return False
+        return True
+
+    def _partial_filename(self, key: str) -> str:
+        # A unique file in the cache directory, so that it can be moved into
+        # place atomically.
+        fd, filename = tempfile.mkstemp(suffix=".partial",
+                                        prefix=f"{key}.",
+                                        dir=self._cache_dir)
+        os.close(fd)
+        return filename
+
+    def _array_filename(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f"{key}.npy")
+
+    def _metadata_filename(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f"{key}.json")
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Sequence, Union
+
+import h5py
+import numpy as np
+
+from mesonet.region_labels import RegionLabels
+
+# The name of the results file in the save directory of a session.
+RESULTS_FILENAME = "results.h5"
+# Number of frames in each chunk of a timecourse dataset. Each chunk holds the
+# frames of a single region, so that time ranges and subsets of regions are
+# read without reading the rest of the timecourse.
+RESULTS_CHUNK_FRAMES = 4096
+COMPRESSION = "gzip"
+COMPRESSION_LEVEL = 4
+
+
+class ResultsStore:
+    """The results of one session, in a single chunked and compressed HDF5
+    file.
+
+    The file holds:
+    - `timecourses/<name>`: (regions, frames) timecourses, chunked by region
+      and by `RESULTS_CHUNK_FRAMES` frames.
+    - `correlations/<name>`: (regions, regions) correlation matrices.
+    - `region_labels`: the label image of the segmentation, with the label
+      table as an attribute.
+    - `masks`: the sorted flat pixel indices of every region mask
+      (`masks/pixels`), split by the `masks/offsets` of the regions.
+    - the configuration of the session, as a JSON attribute of the file.
+
+    Opening a store only reads the metadata of the file, and the readers only
+    read the requested parts of the datasets, so many sessions can be opened at
+    once and compared. Stores are context managers that close the file.
+    """
+
+    def __init__(self, filename: str, mode: str = "r"):
+        self._filename = filename
+        self._file = h5py.File(filename, mode)
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    def __enter__(self) -> ResultsStore:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def timecourse_names(self) -> List[str]:
+        return list(self._file.get("timecourses", {}).keys())
+
+    def correlation_names(self) -> List[str]:
+        return list(self._file.get("correlations", {}).keys())
+
+    def write_timecourse(self, timecourse: np.ndarray,
+                         name: str = "timecourse"):
+        timecourse = np.asarray(timecourse)
+        chunks = (1, max(1, min(RESULTS_CHUNK_FRAMES, timecourse.shape[1])))
+        self._write_dataset(f"timecourses/{name}", timecourse, chunks=chunks)
+
+    def timecourse(self,
+                   name: str = "timecourse",
+                   regions: Sequence[int] = None,
+                   frames: slice = slice(None)) -> np.ndarray:
+        """Read the timecourse of the given regions (all of the regions by
+        default) over the given frames, as a (regions, frames) array.
+        """
+        dataset = self._file[f"timecourses/{name}"]
+        if regions is None:
+            return dataset[:, frames]
+        return _read_rows(dataset, regions, frames)
+
+    def write_correlation(self, correlation: np.ndarray,
+                          name: str = "corrmat"):
+        self._write_dataset(f"correlations/{name}", np.asarray(correlation),
+                            chunks=True)
+
+    def correlation(self,
+                    name: str = "corrmat",
+                    regions: Sequence[int] = None) -> np.ndarray:
+        """Read the correlation matrix between the given regions (all of the
+        regions by default).
+        """
+        dataset = self._file[f"correlations/{name}"]
+        if regions is None:
+            return dataset[()]
+        return _read_rows(dataset, regions)[:, np.asarray(regions)]
+
+    def write_region_labels(self, region_labels: RegionLabels):
+        self._write_dataset("region_labels", region_labels.image, chunks=True)
+        self._file["region_labels"].attrs["table"] = json.dumps(
+                {str(region): label
+                 for region, label in region_labels.table.items()})
+
+    def region_labels(self) -> RegionLabels:
+        dataset = self._file["region_labels"]
+        table = json.loads(dataset.attrs.get("table", "{}"))
+        return RegionLabels(dataset[()],
+                            {int(region): label
+                             for region, label in table.items()})
+
+    def write_masks(self,
+                    region_pixels: Sequence[np.ndarray],
+                    image_width: int,
+                    image_height: int):
+        """Write the flat pixel indices of each region mask, in region order."""
+        counts = [len(pixels) for pixels in region_pixels]
+        pixels = np.concatenate([np.asarray(pixels, dtype=np.int64)
+                                 for pixels in region_pixels] +
+                                [np.zeros((0,), dtype=np.int64)])
+        self._write_dataset("masks/pixels", pixels, chunks=True)
+        self._write_dataset("masks/offsets",
+                            np.concatenate([[0], np.cumsum(counts)]))
+        self._file["masks"].attrs["image_width"] = image_width
+        self._file["masks"].attrs["image_height"] = image_height
+
+    def mask_pixels(self, region: int) -> np.ndarray:
+        """Read the sorted flat pixel indices of the mask of a region."""
+        offsets = self._file["masks/offsets"]
+        start, stop = offsets[region:region + 2]
+        return self._file["masks/pixels"][start:stop]
+
+    def write_config(self, config: Union[Dict[str, Any], Any]):
+        """Write the configuration of the session, as a dictionary or as the
+        namespace given to the analysis.
+        """
+        if not isinstance(config, dict):
+            config = vars(config)
+        self._file.attrs["config"] = json.dumps(config, default=str)
+
+    def config(self) -> Dict[str, Any]:
+        return json.loads(self._file.attrs.get("config", "{}"))
+
+    def _write_dataset(self, name: str, data: np.ndarray, chunks=None):
+        if name in self._file:
+            del self._file[name]
+        compression = {}
+        if chunks is not None and data.size > 0:
+            compression = dict(compression=COMPRESSION,
+                               compression_opts=COMPRESSION_LEVEL,
+                               shuffle=True)
+        self._file.create_dataset(name,
+                                  data=data,
+                                  chunks=chunks if data.size > 0 else None,
+                                  **compression)
+
+
+def read_correlations(filenames: Sequence[str],
+                      name: str = "corrmat",
+                      regions: Sequence[int] = None) -> np.ndarray:
+    """Read the correlation matrix `name` of each session results file, as a
+    (sessions, regions, regions) array. Only the given regions are read.
+    """
+    correlations = []
+    for filename in filenames:
+        with ResultsStore(filename) as store:
+            correlations.append(store.correlation(name, regions))
+    return np.stack(correlations)
+
+
+def _read_rows(dataset: h5py.Dataset,
+               rows: Sequence[int],
+               columns: slice = slice(None)) -> np.ndarray:
+    # HDF5 selections must be increasing and unique, so read the sorted unique
+    # rows and put them back in the requested order.
+    rows = np.asarray(rows, dtype=np.int64)
+    unique_rows, inverse = np.unique(rows, return_inverse=True)
+    return dataset[unique_rows.tolist(), columns][inverse]
@@ -0,0 +1,180 @@
+import os
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from mesonet.chan_lab.helpers.image_series import ImageSeries
+from mesonet.chan_lab.helpers.image_series import LowRankImageSeries
+
+SEED_MAP_CHUNK_FRAMES = 1024
+CORRELATION_TILE_PIXELS = 2048
+
+
+def pixel_means(image_series: ImageSeries,
+                chunk_frames: int = SEED_MAP_CHUNK_FRAMES) -> np.ndarray:
+    """Get the mean of every pixel over the frames of the series, flattened."""
+    pixel_sums = None
+    for chunk in image_series.iter_chunks(chunk_frames):
+        chunk_sums = np.reshape(chunk, (len(chunk), -1)).sum(
+                axis=0, dtype=np.float64)
+        pixel_sums = chunk_sums if pixel_sums is None else \
+                pixel_sums + chunk_sums
+    return pixel_sums / int(image_series.n_frames)
+
+
+def seed_correlation_maps(
+    image_series: ImageSeries,
+    seed_indices: Sequence[int],
+    chunk_frames: int = SEED_MAP_CHUNK_FRAMES,
+) -> np.ndarray:
+    """Get the correlation of each seed pixel with every pixel of the series.
+
+    The seed indices are indices into the flattened frames, and the result has
+    shape (seeds, pixels). Only the rows of the pixel correlation matrix that
+    belong to the seeds are computed: the series is read in two passes of
+    `chunk_frames` frames, the first for the pixel means and the second for the
+    centered cross-products with the seeds, so the frames are never all held
+    in memory. For a low-rank series, the correlations are computed from the
+    components instead, without reading any frames.
+    """
+    if isinstance(image_series, LowRankImageSeries):
+        return image_series.low_rank.seed_correlations(seed_indices)
+
+    seed_indices = np.asarray(seed_indices)
+    means = pixel_means(image_series, chunk_frames)
+    sums_of_squares = np.zeros_like(means)
+    cross_products = np.zeros((len(seed_indices), len(means)))
+
+    for chunk in image_series.iter_chunks(chunk_frames):
+        centered = np.reshape(chunk, (len(chunk), -1)) - means
+        sums_of_squares += np.einsum("ij,ij->j", centered, centered)
+        cross_products += centered[:, seed_indices].T @ centered
+
+    norms = np.sqrt(sums_of_squares)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = cross_products / np.outer(norms[seed_indices], norms)
+    return np.clip(correlation, -1, 1)
+
+
+def region_correlation_maps(
+    image_series: ImageSeries,
+    timecourse: np.ndarray,
+    chunk_frames: int = SEED_MAP_CHUNK_FRAMES,
+) -> np.ndarray:
+    """Get the correlation of each region timecourse with every pixel of the
+    series.
+
+    The timecourse has shape (regions, frames), e.g. from `extract_timecourse`,
+    and the result has shape (regions, pixels). The timecourses are z-scored
+    (to zero mean and unit norm) once, and the series is read in a single pass
+    of `chunk_frames` frames, each chunk adding one (regions, frames) @
+    (frames, pixels) product. Since the timecourses have zero mean, the pixels
+    need not be centered for the product; their norms are accumulated from the
+    pixels shifted by the means of the first chunk, so that large means do not
+    cost precision. For a low-rank series, the correlations are computed from
+    the components instead, without reading any frames.
+    """
+    if isinstance(image_series, LowRankImageSeries):
+        return image_series.low_rank.timecourse_correlations(timecourse)
+
+    timecourse = np.asarray(timecourse, dtype=np.float64)
+    centered_timecourse = timecourse - timecourse.mean(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized_timecourse = centered_timecourse / np.linalg.norm(
+                centered_timecourse, axis=1, keepdims=True)
+
+    shift = None
+    shifted_sums = None
+    shifted_sums_of_squares = None
+    cross_products = None
+    start = 0
+    for chunk in image_series.iter_chunks(chunk_frames):
+        pixels = np.reshape(chunk, (len(chunk), -1)).astype(np.float64)
+        if shift is None:
+            shift = pixels.mean(axis=0)
+            shifted_sums = np.zeros_like(shift)
+            shifted_sums_of_squares = np.zeros_like(shift)
+            cross_products = np.zeros((len(timecourse), len(shift)))
+        cross_products += \
+                normalized_timecourse[:, start:start + len(chunk)] @ pixels
+        pixels -= shift
+        shifted_sums += pixels.sum(axis=0)
+        shifted_sums_of_squares += np.einsum("ij,ij->j", pixels, pixels)
+        start += len(chunk)
+
+    sums_of_squares = shifted_sums_of_squares - shifted_sums ** 2 / start
+    norms = np.sqrt(np.maximum(sums_of_squares, 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = cross_products / norms
+    # The cross-products with constant pixels are only zero up to rounding, as
+    # the pixels are not centered, so their correlations are set explicitly.
+    correlation[:, norms == 0] = np.nan
+    return np.clip(correlation, -1, 1)
+
+
+def write_pixel_correlation_matrix(
+    image_series: ImageSeries,
+    filename: str,
+    chunk_frames: int = SEED_MAP_CHUNK_FRAMES,
+    tile_pixels: int = CORRELATION_TILE_PIXELS,
+) -> np.ndarray:
+    """Write the full (pixels, pixels) correlation matrix of the series to a
+    .npy file, and return it as a read-only memory-mapped array.
+
+    The pixel timecourses are centered and scaled to unit norm once, into a
+    temporary memory-mapped file next to the output, and the matrix is then
+    computed in tiles of `tile_pixels` pixels, each written straight to the
+    output file. Only two tiles worth of pixel timecourses are held in memory
+    at a time.
+    """
+    n_frames = int(image_series.n_frames)
+    means = pixel_means(image_series, chunk_frames)
+    n_pixels = len(means)
+
+    normalized_filename = f"{filename}.normalized.npy"
+    normalized = np.lib.format.open_memmap(normalized_filename,
+                                           mode="w+",
+                                           dtype=np.float64,
+                                           shape=(n_pixels, n_frames))
+    try:
+        sums_of_squares = np.zeros_like(means)
+        start = 0
+        for chunk in image_series.iter_chunks(chunk_frames):
+            centered = np.reshape(chunk, (len(chunk), -1)) - means
+            sums_of_squares += np.einsum("ij,ij->j", centered, centered)
+            normalized[:, start:start + len(chunk)] = centered.T
+            start += len(chunk)
+
+        norms = np.sqrt(sums_of_squares)
+        for row_start, row_stop in _tiles(n_pixels, tile_pixels):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                normalized[row_start:row_stop] /= \
+                        norms[row_start:row_stop, np.newaxis]
+
+        correlation = np.lib.format.open_memmap(filename,
+                                                mode="w+",
+                                                dtype=np.float64,
+                                                shape=(n_pixels, n_pixels))
+        for row_start, row_stop in _tiles(n_pixels, tile_pixels):
+            rows = np.asarray(normalized[row_start:row_stop])
+            for column_start, column_stop in _tiles(n_pixels, tile_pixels):
+                if column_start < row_start:
+                    continue
+                columns = np.asarray(normalized[column_start:column_stop])
+                tile = np.clip(rows @ columns.T, -1, 1)
+                correlation[row_start:row_stop,
+                            column_start:column_stop] = tile
+                correlation[column_start:column_stop, row_start:row_stop] = \
+                        tile.T
+        correlation.flush()
+        del correlation
+    finally:
+        del normalized
+        os.remove(normalized_filename)
+
+    return np.load(filename, mmap_mode="r")
+
+
+def _tiles(n: int, tile_size: int) -> Sequence[Tuple[int, int]]:
+    return [(start, min(start + tile_size, n))
+            for start in range(0, n, tile_size)]
@@ -0,0 +1,42 @@
+from typing import Tuple
+
+import numpy as np
+import scipy.signal
+
+
+def region_spectra(timecourse: np.ndarray,
+                   fps: float,
+                   method: str = "power",
+                   window: str = "boxcar",
+                   nperseg: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute the spectra of all region timecourses in one batched call.
+
+    The timecourse has shape (regions, frames). The method is one of:
+    - "fft": the (complex) real FFT of each windowed timecourse.
+    - "power": the squared magnitude of the real FFT of each windowed
+      timecourse.
+    - "welch": the power spectral density of each timecourse estimated with
+      Welch's method, using segments of `nperseg` frames (256 by default).
+    The window is any window accepted by `scipy.signal.get_window`.
+
+    Returns the frequencies (in Hz, derived from the frame rate) and the
+    spectra, with shape (regions, frequencies).
+    """
+    timecourse = np.asarray(timecourse, dtype=np.float64)
+    n_frames = timecourse.shape[-1]
+
+    if method == "welch":
+        return scipy.signal.welch(timecourse,
+                                  fs=fps,
+                                  window=window,
+                                  nperseg=min(nperseg or 256, n_frames),
+                                  axis=-1)
+    elif method in ("fft", "power"):
+        frequencies = np.fft.rfftfreq(n_frames, d=1.0 / fps)
+        windowed = timecourse * scipy.signal.get_window(window, n_frames)
+        spectra = np.fft.rfft(windowed, axis=-1)
+        if method == "power":
+            spectra = np.abs(spectra) ** 2
+        return frequencies, spectra
+    else:
+        raise ValueError(f"Unrecognized spectrum method: {method}")
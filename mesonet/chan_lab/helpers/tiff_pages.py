@@ -0,0 +1,299 @@
+import contextlib
+import dataclasses
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+import PIL.Image
+
+TAG_IMAGE_WIDTH = 256
+TAG_IMAGE_LENGTH = 257
+TAG_BITS_PER_SAMPLE = 258
+TAG_COMPRESSION = 259
+TAG_STRIP_OFFSETS = 273
+TAG_SAMPLES_PER_PIXEL = 277
+TAG_STRIP_BYTE_COUNTS = 279
+TAG_PLANAR_CONFIGURATION = 284
+TAG_SAMPLE_FORMAT = 339
+
+COMPRESSION_NONE = 1
+
+# TIFF field types that hold integer values: type -> (struct format, size).
+INTEGER_FIELD_TYPES = {
+    1: ("B", 1),
+    3: ("H", 2),
+    4: ("I", 4),
+    6: ("b", 1),
+    8: ("h", 2),
+    9: ("i", 4),
+    16: ("Q", 8),
+    17: ("q", 8),
+    18: ("Q", 8),
+}
+
+SAMPLE_FORMAT_KINDS = {1: "u", 2: "i", 3: "f"}
+
+
+@dataclasses.dataclass(frozen=True)
+class TiffPage:
+    width: int
+    height: int
+    samples_per_pixel: int
+    # None if the samples cannot be read as a NumPy type (e.g. 1-bit samples),
+    # in which case the page is decoded by PIL.
+    dtype: Optional[np.dtype]
+    compression: int
+    planar_configuration: int
+    strip_offsets: Tuple[int, ...]
+    strip_byte_counts: Tuple[int, ...]
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        if self.samples_per_pixel == 1:
+            return (self.height, self.width)
+        return (self.height, self.width, self.samples_per_pixel)
+
+    @property
+    def n_bytes(self) -> int:
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    @property
+    def data_offset(self) -> Optional[int]:
+        """The file offset of the page data if the page is uncompressed,
+        stored in contiguous strips and has a NumPy type, otherwise None.
+        """
+        if self.dtype is None:
+            return None
+        if self.compression != COMPRESSION_NONE or not self.strip_offsets:
+            return None
+        if self.samples_per_pixel > 1 and self.planar_configuration != 1:
+            return None
+        if sum(self.strip_byte_counts) < self.n_bytes:
+            return None
+
+        expected_offset = self.strip_offsets[0]
+        for offset, byte_count in zip(self.strip_offsets,
+                                      self.strip_byte_counts):
+            if offset != expected_offset:
+                return None
+            expected_offset += byte_count
+        return self.strip_offsets[0]
+
+
+class TiffPageIndex:
+    """An index of the pages of a (multi-page) TIFF file.
+
+    The image file directories are scanned once when the index is created, so
+    any page or range of pages can afterwards be read directly from its strips
+    without decoding the preceding pages. Pages that are compressed, tiled or
+    whose samples are not whole bytes are decoded by PIL instead.
+    """
+
+    def __init__(self, filename: str, max_pages: Optional[int] = None):
+        self._filename = filename
+        self._pages = self._scan_pages(filename, max_pages)
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def pages(self) -> List[TiffPage]:
+        return self._pages
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def memmap(self, start: int = 0, stop: Optional[int] = None
+               ) -> Optional[np.ndarray]:
+        """Get a read-only memory-mapped view of the pages in [start, stop).
+
+        This is only possible if every page in the range is uncompressed,
+        stored contiguously, has the same shape and type, and the pages are
+        evenly spaced in the file. Otherwise, None is returned.
+        """
+        pages = self._pages[start:stop]
+        if len(pages) == 0:
+            return None
+
+        first_page = pages[0]
+        offsets = [page.data_offset for page in pages]
+        if any(offset is None for offset in offsets):
+            return None
+        if any(page.shape != first_page.shape or page.dtype != first_page.dtype
+               for page in pages):
+            return None
+
+        page_stride = offsets[1] - offsets[0] if len(pages) > 1 else 0
+        if any(offsets[i + 1] - offsets[i] != page_stride
+               for i in range(len(offsets) - 1)):
+            return None
+        if len(pages) > 1 and page_stride < first_page.n_bytes:
+            return None
+
+        n_bytes = page_stride * (len(pages) - 1) + first_page.n_bytes
+        data = np.memmap(self._filename,
+                         dtype=np.uint8,
+                         mode="r",
+                         offset=offsets[0],
+                         shape=(n_bytes,))
+
+        item_strides = [first_page.dtype.itemsize]
+        for size in first_page.shape[:0:-1]:
+            item_strides.insert(0, item_strides[0] * size)
+
+        return np.ndarray(shape=(len(pages),) + first_page.shape,
+                          dtype=first_page.dtype,
+                          buffer=data,
+                          strides=(page_stride,) + tuple(item_strides))
+
+    def read_page(self, page_index: int) -> np.ndarray:
+        return self.read_pages(page_index, page_index + 1)[0]
+
+    def read_pages(self, start: int = 0, stop: Optional[int] = None
+                   ) -> np.ndarray:
+        page_indices = range(len(self._pages))[start:stop]
+        if len(page_indices) == 0:
+            raise IndexError(f"No pages in the range [{start}, {stop})")
+
+        shape = self._pages[page_indices[0]].shape
+        # Allocated at the first page, as the type of pages decoded by PIL is
+        # only known once they are decoded.
+        pages_array = None
+
+        # Compressed pages are decoded by PIL from a single image, opened at
+        # the first such page. PIL keeps the offsets of the pages it has
+        # passed, so seeking to the next page only reads one more directory,
+        # whereas reopening the image for each page would walk the directory
+        # chain from the start every time.
+        with open(self._filename, "rb") as f, \
+                contextlib.ExitStack() as stack:
+            image = None
+            for i, page_index in enumerate(page_indices):
+                page = self._pages[page_index]
+                if page.shape != shape:
+                    raise ValueError(
+                            f"Page {page_index} of '{self._filename}' has "
+                            f"shape {page.shape}, expected {shape}")
+
+                page_data = None
+                if page.data_offset is None:
+                    if image is None:
+                        image = stack.enter_context(
+                                PIL.Image.open(self._filename))
+                    image.seek(page_index)
+                    page_data = np.asarray(image)
+
+                if pages_array is None:
+                    dtype = page.dtype if page_data is None else \
+                            page_data.dtype
+                    pages_array = np.empty((len(page_indices),) + shape,
+                                           dtype=dtype)
+
+                if page_data is None:
+                    f.seek(page.data_offset)
+                    f.readinto(memoryview(pages_array[i]).cast("B"))
+                else:
+                    pages_array[i] = page_data
+
+        return pages_array
+
+    @staticmethod
+    def _scan_pages(filename: str, max_pages: Optional[int]) -> List[TiffPage]:
+        pages = []
+
+        with open(filename, "rb") as f:
+            header = f.read(16)
+            if header[:2] == b"II":
+                byte_order = "<"
+            elif header[:2] == b"MM":
+                byte_order = ">"
+            else:
+                raise ValueError(f"'{filename}' is not a TIFF file")
+
+            version = struct.unpack(byte_order + "H", header[2:4])[0]
+            if version == 42:
+                big_tiff = False
+                ifd_offset = struct.unpack(byte_order + "I", header[4:8])[0]
+            elif version == 43:
+                big_tiff = True
+                ifd_offset = struct.unpack(byte_order + "Q", header[8:16])[0]
+            else:
+                raise ValueError(f"'{filename}' is not a TIFF file")
+
+            count_format, count_size = ("Q", 8) if big_tiff else ("H", 2)
+            entry_size = 20 if big_tiff else 12
+            offset_format, offset_size = ("Q", 8) if big_tiff else ("I", 4)
+
+            while ifd_offset != 0:
+                if max_pages is not None and len(pages) >= max_pages:
+                    break
+
+                f.seek(ifd_offset)
+                n_entries = struct.unpack(byte_order + count_format,
+                                          f.read(count_size))[0]
+                entries = f.read(n_entries * entry_size)
+                next_offset = struct.unpack(byte_order + offset_format,
+                                            f.read(offset_size))[0]
+
+                tags = {}
+                for i in range(n_entries):
+                    entry = entries[i * entry_size:(i + 1) * entry_size]
+                    tag, field_type = struct.unpack(byte_order + "HH",
+                                                    entry[:4])
+                    if field_type not in INTEGER_FIELD_TYPES:
+                        continue
+                    tags[tag] = TiffPageIndex._read_values(
+                            f, byte_order, big_tiff, field_type, entry)
+
+                pages.append(TiffPageIndex._page_from_tags(byte_order, tags))
+                ifd_offset = next_offset
+
+        return pages
+
+    @staticmethod
+    def _read_values(f, byte_order: str, big_tiff: bool, field_type: int,
+                     entry: bytes) -> Tuple[int, ...]:
+        value_format, value_size = INTEGER_FIELD_TYPES[field_type]
+        if big_tiff:
+            count = struct.unpack(byte_order + "Q", entry[4:12])[0]
+            inline = entry[12:20]
+        else:
+            count = struct.unpack(byte_order + "I", entry[4:8])[0]
+            inline = entry[8:12]
+
+        n_bytes = count * value_size
+        if n_bytes <= len(inline):
+            data = inline[:n_bytes]
+        else:
+            data_offset = struct.unpack(
+                    byte_order + ("Q" if big_tiff else "I"), inline)[0]
+            position = f.tell()
+            f.seek(data_offset)
+            data = f.read(n_bytes)
+            f.seek(position)
+
+        return struct.unpack(f"{byte_order}{count}{value_format}", data)
+
+    @staticmethod
+    def _page_from_tags(byte_order: str, tags) -> TiffPage:
+        bits_per_sample = tags.get(TAG_BITS_PER_SAMPLE, (1,))[0]
+        sample_format = tags.get(TAG_SAMPLE_FORMAT, (1,))[0]
+        dtype = None
+        if sample_format in SAMPLE_FORMAT_KINDS and bits_per_sample % 8 == 0:
+            try:
+                dtype = np.dtype(
+                        f"{byte_order}{SAMPLE_FORMAT_KINDS[sample_format]}"
+                        f"{bits_per_sample // 8}")
+            except TypeError:
+                pass
+        return TiffPage(
+                width=tags[TAG_IMAGE_WIDTH][0],
+                height=tags[TAG_IMAGE_LENGTH][0],
+                samples_per_pixel=tags.get(TAG_SAMPLES_PER_PIXEL, (1,))[0],
+                dtype=dtype,
+                compression=tags.get(TAG_COMPRESSION, (COMPRESSION_NONE,))[0],
+                planar_configuration=tags.get(TAG_PLANAR_CONFIGURATION,
+                                              (1,))[0],
+                strip_offsets=tags.get(TAG_STRIP_OFFSETS, ()),
+                strip_byte_counts=tags.get(TAG_STRIP_BYTE_COUNTS, ()))
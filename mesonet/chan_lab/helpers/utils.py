@@ -1,23 +1,38 @@
 import argparse
+import concurrent.futures
+import multiprocessing
 import yaml
 
 import numpy as np
-from typing import Tuple
+from typing import Any, Dict, Tuple
 import scipy
 
 
-def config_to_namespace(config: str) -> argparse.Namespace:
+def load_config(config: str) -> Dict[str, Any]:
     with open(config, "r") as f:
-        config_dict = yaml.safe_load(f)
-    return argparse.Namespace(**config_dict)
+        return yaml.safe_load(f)
+
+
+def config_to_namespace(config: str) -> argparse.Namespace:
+    return argparse.Namespace(**load_config(config))
 
 
 # A translation to Python of the MATLAB code function, reorderMAT, available in
 # https://sites.google.com/site/bctnet/home?authuser=0.
+#
+# Each of the h iterations proposes swapping two rows (and the same two
+# columns) of the matrix and keeps the swap if it lowers the cost. Only the
+# change in cost from the two swapped rows and columns is computed, in O(n),
+# and accepted swaps are applied in place to a single working copy of the
+# matrix. Several restarts, each from its own random stream, can be run across
+# a process pool; the ordering with the lowest cost is returned.
 def reorder_matrix(
     matrix: np.array,
     h: int = 10000,
-    cost: str = "line"
+    cost: str = "line",
+    seed: int = None,
+    restarts: int = 1,
+    workers: int = 1,
 ) -> Tuple[np.array, np.array]:
     assert len(matrix.shape) == 2
     assert matrix.shape[0] == matrix.shape[1]
@@ -35,24 +50,80 @@ def reorder_matrix(
 
     cost = scipy.linalg.toeplitz(profile, profile)
 
-    low_matrix_cost = np.sum(cost * matrix)
-
-    starting_matrix = matrix
-    start_a = np.array([i for i in range(n)])
-
-    for _ in range(h):
-        a = np.array([i for i in range(n)])
-        r = np.random.permutation(n)
-        a[r[0]] = r[1]
-        a[r[1]] = r[0]
-        new_matrix_cost = np.sum(matrix[a, :][:, a] * cost)
-        if (new_matrix_cost < low_matrix_cost):
-            matrix = matrix[a, :][:, a]
-            r0, r1 = start_a[r[0]], start_a[r[1]]
-            start_a[r[0]], start_a[r[1]] = r1, r0
-            low_matrix_cost = new_matrix_cost
+    seeds = np.random.SeedSequence(seed).spawn(restarts)
+    # Worker processes (e.g. those of the batch analyzer) cannot start
+    # processes of their own.
+    if workers > 1 and restarts > 1 and \
+            not multiprocessing.current_process().daemon:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(_reorder_matrix_restart,
+                                        [matrix] * restarts,
+                                        [cost] * restarts,
+                                        [h] * restarts,
+                                        seeds,
+                                        range(restarts)))
+    else:
+        results = [_reorder_matrix_restart(matrix, cost, h, restart_seed, i)
+                   for i, restart_seed in enumerate(seeds)]
+    start_a, _ = min(results, key=lambda result: result[1])
 
     matrix_reordered = \
-        starting_matrix[start_a, :][:, start_a] + diag[start_a, :][:, start_a]
+        matrix[start_a, :][:, start_a] + diag[start_a, :][:, start_a]
 
     return matrix_reordered, start_a
+
+
+def _reorder_matrix_restart(
+    matrix: np.array,
+    cost: np.array,
+    h: int,
+    seed: np.random.SeedSequence,
+    restart: int,
+) -> Tuple[np.array, float]:
+    n = matrix.shape[0]
+    rng = np.random.default_rng(seed)
+
+    # The first restart starts from the original order, as reorderMAT does,
+    # and the others from a random order.
+    start_a = np.arange(n) if restart == 0 else rng.permutation(n)
+    matrix = matrix[start_a, :][:, start_a]
+    low_matrix_cost = np.sum(matrix * cost)
+    if n < 2:
+        return start_a, low_matrix_cost
+
+    # Draw all of the (distinct) pairs of rows to swap up front.
+    r0s = rng.integers(n, size=h)
+    r1s = rng.integers(n - 1, size=h)
+    r1s += (r1s >= r0s)
+
+    for r0, r1 in zip(r0s.tolist(), r1s.tolist()):
+        delta = _swap_cost_delta(matrix, cost, r0, r1)
+        if delta < 0:
+            swapped = [r0, r1]
+            matrix[swapped, :] = matrix[[r1, r0], :]
+            matrix[:, swapped] = matrix[:, [r1, r0]]
+            start_a[swapped] = start_a[[r1, r0]]
+            low_matrix_cost += delta
+
+    return start_a, low_matrix_cost
+
+
+def _swap_cost_delta(
+    matrix: np.array,
+    cost: np.array,
+    r0: int,
+    r1: int,
+) -> float:
+    """Get the change in cost from swapping rows and columns r0 and r1 of the
+    matrix. The cost matrix must be a symmetric Toeplitz matrix, as built by
+    `reorder_matrix`, and the diagonal of the matrix must be zero.
+    """
+    # Only the entries in rows or columns r0 and r1 move. Swapping them is the
+    # same as keeping them in place and swapping rows and columns r0 and r1 of
+    # the cost matrix, whose change along a row is the same as along a column.
+    cost_change = cost[r1] - cost[r0]
+    delta = cost_change @ (matrix[r0] - matrix[r1] +
+                           matrix[:, r0] - matrix[:, r1])
+    # Remove the entries in both the rows and the columns, which were counted
+    # with the wrong change (they only swap with each other).
+    return delta + 2 * cost_change[r0] * (matrix[r0, r1] + matrix[r1, r0])
@@ -0,0 +1,71 @@
+import json
+import os
+from typing import Any, Dict, Optional
+
+import cv2
+
+INDEX_SUFFIX = ".index.json"
+
+
+def index_filename(video_filename: str) -> str:
+    return video_filename + INDEX_SUFFIX
+
+
+def build_keyframe_index(video_filename: str) -> Dict[str, Any]:
+    """Record the true number of frames and the keyframe positions of a video
+    in a sidecar file next to the video, and return the recorded index.
+
+    The video packets are grabbed without being decoded where the OpenCV
+    FFmpeg backend allows it. If the backend cannot report keyframes, only the
+    frame count is recorded and the keyframes are left as None.
+    """
+    has_key_frame = getattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME", None)
+    if has_key_frame is not None:
+        video_capture = cv2.VideoCapture(video_filename,
+                                         cv2.CAP_FFMPEG,
+                                         [cv2.CAP_PROP_FORMAT, -1])
+    else:
+        video_capture = cv2.VideoCapture(video_filename)
+    if not video_capture.isOpened():
+        raise RuntimeError(f"Unable to open video '{video_filename}'")
+
+    n_frames = 0
+    keyframes = [] if has_key_frame is not None else None
+    while video_capture.grab():
+        if keyframes is not None and video_capture.get(has_key_frame):
+            keyframes.append(n_frames)
+        n_frames += 1
+    video_capture.release()
+
+    if keyframes is not None and (len(keyframes) == 0 or keyframes[0] != 0):
+        # The backend did not report keyframes for this container.
+        keyframes = None
+
+    stat = os.stat(video_filename)
+    index = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "n_frames": n_frames,
+        "keyframes": keyframes,
+    }
+    with open(index_filename(video_filename), "w") as f:
+        json.dump(index, f)
+
+    return index
+
+
+def load_keyframe_index(video_filename: str) -> Optional[Dict[str, Any]]:
+    """Load the sidecar index of a video. None is returned if there is no index
+    or if the video has changed since the index was built.
+    """
+    filename = index_filename(video_filename)
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, "r") as f:
+        index = json.load(f)
+
+    stat = os.stat(video_filename)
+    if index["size"] != stat.st_size or index["mtime"] != stat.st_mtime:
+        return None
+    return index
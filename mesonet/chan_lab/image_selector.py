@@ -18,7 +18,9 @@ def save_images(args: argparse.Namespace):
         os.makedirs(args.save_dir)
 
     image_series = ImageSeriesCreator.create_cached_image_series(
-            args.image_file, args.image_width, args.image_height, "all")
+            args.image_file, args.image_width, args.image_height, "all",
+            memmap=getattr(args, "memmap", False),
+            cache_dir=getattr(args, "cache_dir", None))
 
     for image_to_save in args.images_to_save:
         image_array = image_series.get_frame(image_to_save)
@@ -40,6 +42,8 @@ def save_images(args: argparse.Namespace):
 
         image.save(os.path.join(args.save_dir, f"{image_to_save}.png"))
 
+    image_series.close()
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -8,6 +8,8 @@ import matplotlib.image as mpimg
 import pickle
 
 from mesonet.chan_lab.helpers.utils import config_to_namespace
+from mesonet.region_labels import NO_REGION
+from mesonet.region_labels import RegionLabels
 
 REGION_POINTS_WIDTH = 512
 REGION_POINTS_HEIGHT = 512
@@ -26,8 +28,7 @@ class InteractiveImageManager:
         self.height_scale = REGION_POINTS_HEIGHT / image_height
         self.save_file = save_file
 
-        with open(region_points_file, "rb") as f:
-            self.region_points = pickle.load(f)
+        self.region_labels = RegionLabels.load(region_points_file)
 
     def mouse_movement(self, event):
         x, y = event.xdata, event.ydata
@@ -37,13 +38,10 @@ class InteractiveImageManager:
             self.was_clicked = True
             self.custom_region[point_expanded] = self.custom_region_label
 
-        if point_expanded in self.region_points:
-            current_region = self.region_points[point_expanded]
-        else:
-            current_region = -1
+        current_region = self.region_labels.region_at(*point_expanded)
 
         # if current_region != self.previous_region:
-        if current_region >= 0:
+        if current_region != NO_REGION:
             print(f"In region {current_region}")
         else:
             print(f"Not in a region")
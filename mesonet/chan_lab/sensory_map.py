@@ -4,7 +4,6 @@ sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
 
 import argparse
 import os
-from typing import Dict, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -12,6 +11,7 @@ import numpy as np
 from mesonet.chan_lab.activity_analyzer import MasksManager
 from mesonet.chan_lab.helpers.image_series import ImageSeriesCreator
 from mesonet.chan_lab.helpers.utils import config_to_namespace
+from mesonet.region_labels import NO_REGION
 
 # MESOSCALE_FILE = "/Users/christian/Documents/summer2023/matlab/my_data/isoflurane1_mouse6_eye-r/imMean.mat"
 # REGION_POINTS_FILE = "/Users/christian/Documents/summer2023/MesoNet/mesonet_outputs/isoflurane1_mouse6_eye-r_atlas_brain/dlc_output/region_points.pkl"
@@ -71,50 +71,42 @@ from mesonet.chan_lab.helpers.utils import config_to_namespace
 # SCOPE = 1.5
 
 
-def coms_from_region_points(
-    region_points: Dict[Tuple[int, int], int]
-) -> np.ndarray:
-    n_regions = max(region_points.values()) + 1
-    coms = np.zeros((n_regions, 2))
-    points_list = [[] for _ in range(n_regions)]
-
-    for point, region in region_points.items():
-        points_list[region].append(point)
-
-    for i, points in enumerate(points_list):
-        points_array = np.array(points)
-        coms[i, :] = np.average(points_array, axis=0)
-
-    return coms
-
-
 def main(args: argparse.Namespace):
     if not os.path.exists(args.save_dir):
         os.makedirs(args.save_dir)
 
-    image_series = ImageSeriesCreator.create_cached_image_series(
-            args.mesoscale_file, 256, 256, "all", property="imMean",
-            transpose_axes=(2, 0, 1))
-    masks_manager = MasksManager(args.region_points_file, 256, 256)
+    masks_manager = MasksManager(args.region_points_file, 256, 256,
+                                 cache_dir=getattr(args, "cache_dir", None))
 
     start_frame_index = args.event_frame  # Get the first frame after the event.
     end_frame_index = int(args.fps * args.scope)
-    event_array = image_series.image_array[start_frame_index:end_frame_index]
+    with ImageSeriesCreator.create_cached_image_series(
+            args.mesoscale_file, 256, 256, "all",
+            memmap=getattr(args, "memmap", False),
+            cache_dir=getattr(args, "cache_dir", None), property="imMean",
+            transpose_axes=(2, 0, 1)) as image_series:
+        event_array = image_series.get_frames(
+                slice(start_frame_index, end_frame_index))
 
     event_array_max = np.max(event_array, axis=0)
     max_y, max_x = np.unravel_index(np.argmax(event_array_max),
                                     event_array_max.shape)
 
-    roi_mask = masks_manager.masks.copy()
-    roi_mask = np.logical_or.reduce(roi_mask, axis=0)
+    roi_mask = masks_manager.label_image != NO_REGION
     roi_mask = np.ma.masked_where(roi_mask == 0, roi_mask)
 
-    roi_maxes = event_array_max * masks_manager.masks
-    roi_maxes = [np.unravel_index(np.argmax(roi_max), roi_max.shape)
-                 for roi_max in roi_maxes]
-    roi_maxes = np.array(roi_maxes)
-
-    coms = coms_from_region_points(masks_manager.region_points)
+    # The (y, x) pixel with the largest value in each region, or (0, 0) for
+    # empty regions.
+    roi_maxes = np.zeros((masks_manager.n_regions, 2), dtype=int)
+    flat_event_array_max = event_array_max.ravel()
+    for i in range(masks_manager.n_regions):
+        pixels = masks_manager.region_pixels(i)
+        if len(pixels) > 0:
+            roi_maxes[i] = np.unravel_index(
+                    pixels[np.argmax(flat_event_array_max[pixels])],
+                    event_array_max.shape)
+
+    coms = masks_manager.region_labels.centers_of_mass()
 
     plt.imshow(event_array_max)
     plt.colorbar()
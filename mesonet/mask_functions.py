@@ -18,11 +18,11 @@ import imageio
 import imutils
 import scipy
 import pylab
-import pickle
 from PIL import Image
 import pandas as pd
 from tensorflow.keras import backend as k
 from polylabel import polylabel
+from mesonet.region_labels import NO_REGION, RegionLabels
 
 # Set background colour as black to fix issue with more than one background region being identified.
 Background = [0, 0, 0]
@@ -529,7 +529,8 @@ def applyMask(
             cnts_orig = []
 
             regions = []  # NOTE: Added by Christian.
-            region_points = {}  # NOTE: Added by Christian.
+            region_labels = None  # NOTE: Added by Christian.
+            region_table = {}  # NOTE: Added by Christian.
 
             # Find contours in original aligned atlas
             if atlas_to_brain_align and not original_label:
@@ -595,13 +596,12 @@ def applyMask(
 
                     # NOTE: Added by Christian. Associate all non-zero pixels in
                     #  the current region to the current label.
-                    region_points.update(
-                        {
-                            (x, y): label_to_use
-                            for y, x  # In the array, we have (y, x); in coordinates, we want (x, y).
-                            in zip(*np.where(regions[num_label] > 0))
-                        }
-                    )
+                    if region_labels is None:
+                        region_labels = np.full(
+                            regions[num_label].shape[:2], NO_REGION, dtype=np.int16
+                        )
+                    region_labels[regions[num_label] > 0] = label_to_use
+                    region_table[label_to_use] = int(labels_from_region[num_label])
 
                     (text_width, text_height) = cv2.getTextSize(
                         str(label_to_use), cv2.FONT_HERSHEY_SIMPLEX, 0.4, thickness=1
@@ -654,10 +654,12 @@ def applyMask(
                     )
                 orig_list.sort()
 
-            # NOTE: Added by Christian.
-            with open(f"region_points_{i}.pkl", "wb") as f:
-                print(f"Saving region points {i}")
-                pickle.dump(region_points, f)
+            # NOTE: Added by Christian. The region labels are always saved, with
+            #  no regions if none were labelled, so that every image has them.
+            if region_labels is None:
+                region_labels = np.full(img.shape[:2], NO_REGION, dtype=np.int16)
+            print(f"Saving region labels {i}")
+            RegionLabels(region_labels, region_table).save(f"region_labels_{i}.npy")
 
             orig_list_labels_sorted_left = sorted(
                 orig_list_labels_left, key=lambda t: t[0], reverse=True
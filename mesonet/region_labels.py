@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import json
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# The value of the pixels that are not in any region.
+NO_REGION = -1
+# The shape of the images segmented by MesoNet, in which the region points are
+# given.
+REGION_POINTS_SHAPE = (512, 512)
+
+
+class RegionLabels:
+    """The regions of a MesoNet segmentation as a label image.
+
+    Each pixel of the (height, width) image holds the number of the region it
+    belongs to, or `NO_REGION`. The optional label table maps each region
+    number to the atlas label of the region.
+
+    On disk, the image is saved as a `.npy` file and the label table as a
+    `.json` file with the same name. This replaces the region points pickle
+    files, which hold a `{(x, y): region}` dictionary with one entry per pixel;
+    those files are converted when loaded.
+    """
+
+    def __init__(self, image: np.ndarray, table: Dict[int, int] = None):
+        self._image = np.asarray(image, dtype=np.int16)
+        self._table = dict(table or {})
+
+    @property
+    def image(self) -> np.ndarray:
+        return self._image
+
+    @property
+    def table(self) -> Dict[int, int]:
+        return self._table
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._image.shape
+
+    @property
+    def n_regions(self) -> int:
+        return int(self._image.max()) + 1
+
+    def regions(self) -> List[int]:
+        """Get the (sorted) regions that have at least one point."""
+        return np.unique(self._image[self._image != NO_REGION]).tolist()
+
+    def region_at(self, x: int, y: int) -> int:
+        """Get the region of a point, or `NO_REGION` if the point is not in a
+        region or is outside of the image.
+        """
+        height, width = self.shape
+        if 0 <= x < width and 0 <= y < height:
+            return int(self._image[y, x])
+        return NO_REGION
+
+    def points(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get the x coordinates, y coordinates and regions of all of the
+        points in a region.
+        """
+        ys, xs = np.nonzero(self._image != NO_REGION)
+        return xs, ys, self._image[ys, xs]
+
+    def centers_of_mass(self) -> np.ndarray:
+        """Get the (x, y) center of mass of each region, with shape (regions,
+        2). The centers of mass of empty regions are NaN.
+        """
+        xs, ys, regions = self.points()
+        counts = np.bincount(regions, minlength=self.n_regions)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.stack([
+                np.bincount(regions, weights=xs, minlength=self.n_regions),
+                np.bincount(regions, weights=ys, minlength=self.n_regions),
+            ], axis=1) / counts[:, np.newaxis]
+
+    def to_dict(self) -> Dict[Tuple[int, int], int]:
+        """Get the regions in the `{(x, y): region}` region points format."""
+        xs, ys, regions = self.points()
+        return dict(zip(zip(xs.tolist(), ys.tolist()), regions.tolist()))
+
+    def save(self, filename: str):
+        np.save(filename, self._image)
+        with open(table_filename(filename), "w") as f:
+            json.dump({str(region): label
+                       for region, label in self._table.items()}, f)
+
+    @staticmethod
+    def from_dict(
+        region_points: Dict[Tuple[int, int], int],
+        shape: Tuple[int, int] = REGION_POINTS_SHAPE,
+    ) -> RegionLabels:
+        """Convert a `{(x, y): region}` dictionary into a label image. Points
+        outside of the image are dropped.
+        """
+        image = np.full(shape, NO_REGION, dtype=np.int16)
+        if region_points:
+            points = np.array(list(region_points.keys()), dtype=np.int64)
+            regions = np.fromiter(region_points.values(),
+                                  dtype=np.int16,
+                                  count=len(region_points))
+            xs, ys = points[:, 0], points[:, 1]
+            inside = ((xs >= 0) & (xs < shape[1]) &
+                      (ys >= 0) & (ys < shape[0]))
+            image[ys[inside], xs[inside]] = regions[inside]
+        return RegionLabels(image)
+
+    @staticmethod
+    def load(filename: str) -> RegionLabels:
+        """Load a label image (`.npy`), or convert a region points pickle file
+        (`.pkl`).
+        """
+        if filename.endswith(".npy"):
+            table = _load_table(table_filename(filename))
+            return RegionLabels(np.load(filename), table)
+        elif filename.endswith(".pkl"):
+            with open(filename, "rb") as f:
+                return RegionLabels.from_dict(pickle.load(f))
+        else:
+            raise ValueError(f"Unrecognized region labels file {filename}")
+
+
+def table_filename(filename: str) -> str:
+    """Get the filename of the label table saved with a label image."""
+    return os.path.splitext(filename)[0] + ".json"
+
+
+def _load_table(filename: str) -> Optional[Dict[int, int]]:
+    if not os.path.exists(filename):
+        return None
+    with open(filename, "r") as f:
+        return {int(region): label for region, label in json.load(f).items()}
@@ -0,0 +1,143 @@
+import argparse
+import csv
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+import yaml
+
+from mesonet.chan_lab import batch_analyzer
+from mesonet.region_labels import RegionLabels
+
+IMAGE_SIZE = 32
+N_FRAMES = 64
+
+
+class ExitOnUnpickle:
+    """An argument that kills the worker process which unpickles it."""
+
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+def write_config(filename, config):
+    with open(filename, "w") as f:
+        yaml.safe_dump(config, f)
+
+
+def fft_session(tmp_path, name):
+    random_state = np.random.default_rng(0)
+    image_file = str(tmp_path / "frames.npy")
+    np.save(image_file, random_state.random((N_FRAMES, IMAGE_SIZE,
+                                             IMAGE_SIZE)).astype(np.float32))
+    region_points_file = str(tmp_path / "region_labels.npy")
+    RegionLabels(random_state.integers(-1, 4, size=(512, 512))).save(
+            region_points_file)
+    return {
+        "name": name,
+        "function": "fft",
+        "save_dir": str(tmp_path / name),
+        "image_file": image_file,
+        "region_points_file": region_points_file,
+        "image_width": IMAGE_SIZE,
+        "image_height": IMAGE_SIZE,
+        "n_frames": "all",
+        "mat_property": None,
+        "mat_transpose_axes": None,
+        "fps": 30.0,
+    }
+
+
+def test_collect_sessions(tmp_path):
+    write_config(str(tmp_path / "base.yaml"),
+                 {"function": "activity", "image_width": 128, "fps": 30.0})
+    write_config(str(tmp_path / "mouse_1.yaml"),
+                 {"function": "fft", "save_dir": str(tmp_path / "out_1")})
+    args = argparse.Namespace(
+            configs=[str(tmp_path / "mouse_*.yaml")],
+            base_config=str(tmp_path / "base.yaml"),
+            sessions=[
+                {"save_dir": str(tmp_path / "out_2")},
+                {"name": "fft_2", "function": "fft", "fps": 10.0,
+                 "save_dir": str(tmp_path / "out_3")},
+            ])
+
+    sessions = batch_analyzer.collect_sessions(args)
+    assert [session["name"] for session in sessions] == ["mouse_1", "out_2",
+                                                         "fft_2"]
+    # Config files are not merged with the base config.
+    assert "image_width" not in sessions[0]
+    assert sessions[1] == {"name": "out_2", "function": "activity",
+                           "image_width": 128, "fps": 30.0,
+                           "save_dir": str(tmp_path / "out_2")}
+    assert sessions[2]["function"] == "fft"
+    assert sessions[2]["fps"] == 10.0
+    assert sessions[2]["image_width"] == 128
+
+
+def test_collect_duplicate_sessions(tmp_path):
+    args = argparse.Namespace(sessions=[
+        {"function": "fft", "save_dir": str(tmp_path / "a" / "out")},
+        {"function": "fft", "save_dir": str(tmp_path / "b" / "out")},
+    ])
+    with pytest.raises(ValueError, match="out"):
+        batch_analyzer.collect_sessions(args)
+
+
+def test_is_current(tmp_path):
+    image_file = str(tmp_path / "frames.npy")
+    np.save(image_file, np.zeros((1, 1)))
+    session = {"name": "session", "function": "fft",
+               "save_dir": str(tmp_path / "out"), "image_file": image_file}
+    assert not batch_analyzer.is_current(session)
+
+    os.makedirs(session["save_dir"])
+    np.save(os.path.join(session["save_dir"], "spectra.npy"), np.zeros(1))
+    with open(os.path.join(session["save_dir"],
+                           batch_analyzer.STAMP_FILENAME), "w") as f:
+        json.dump(session, f)
+    past_time = time.time() - 60
+    os.utime(image_file, (past_time, past_time))
+    assert batch_analyzer.is_current(session)
+
+    # The session is run again if its arguments change...
+    assert not batch_analyzer.is_current(dict(session, fps=10.0))
+    # ...or if an input file is modified after the outputs were written.
+    future_time = time.time() + 60
+    os.utime(image_file, (future_time, future_time))
+    assert not batch_analyzer.is_current(session)
+
+
+def test_failing_session(tmp_path):
+    good_session = fft_session(tmp_path, "good")
+    bad_session = dict(fft_session(tmp_path, "bad"),
+                       image_file=str(tmp_path / "missing.npy"))
+    summary_file = str(tmp_path / "summary.csv")
+    args = argparse.Namespace(sessions=[bad_session, good_session],
+                              workers=2,
+                              summary_file=summary_file)
+
+    with pytest.raises(SystemExit):
+        batch_analyzer.main(args)
+
+    with open(summary_file, newline="") as f:
+        statuses = {row["session"]: row["status"]
+                    for row in csv.DictReader(f)}
+    assert statuses == {"bad": "failed", "good": "done"}
+    assert os.path.exists(os.path.join(good_session["save_dir"],
+                                       "spectra.npy"))
+    assert batch_analyzer.is_current(good_session)
+    with open(os.path.join(bad_session["save_dir"], "fft.log")) as f:
+        assert "missing.npy" in f.read()
+
+
+def test_session_process_exits(tmp_path):
+    session = {"name": "session", "function": "fft",
+               "save_dir": str(tmp_path / "out"), "crash": ExitOnUnpickle()}
+
+    result = batch_analyzer.run_session_in_process(session)
+    assert result["status"] == "failed"
+    with open(result["log_file"]) as f:
+        assert "exited unexpectedly" in f.read()
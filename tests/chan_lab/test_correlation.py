@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from mesonet.chan_lab.helpers.correlation import CorrelationAccumulator
+
+N_VARIABLES = 6
+N_SAMPLES = 1000
+# Uneven chunk boundaries, including an empty chunk.
+CHUNK_STARTS = [0, 1, 250, 250, 617, 999]
+
+
+def timecourses():
+    random_state = np.random.default_rng(0)
+    data = random_state.normal(size=(N_VARIABLES, N_SAMPLES))
+    data[1] += 2 * data[0] + 1000
+    # A constant timecourse, whose correlations are NaN.
+    data[4] = 3.0
+    return data
+
+
+def expected_correlation(data):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.corrcoef(data)
+
+
+def chunks(data):
+    stops = CHUNK_STARTS[1:] + [data.shape[1]]
+    return [data[:, start:stop] for start, stop in zip(CHUNK_STARTS, stops)]
+
+
+def test_update():
+    data = timecourses()
+    accumulator = CorrelationAccumulator(N_VARIABLES)
+    for chunk in chunks(data):
+        accumulator.update(chunk)
+
+    assert accumulator.count == N_SAMPLES
+    np.testing.assert_allclose(accumulator.mean, data.mean(axis=1))
+    np.testing.assert_allclose(accumulator.covariance(), np.cov(data),
+                               atol=1e-10)
+    correlation = accumulator.correlation()
+    assert np.isnan(correlation[4]).all() and np.isnan(correlation[:, 4]).all()
+    np.testing.assert_allclose(correlation, expected_correlation(data),
+                               atol=1e-12)
+
+
+@pytest.mark.parametrize("n_workers", [2, 4])
+def test_merge(tmp_path, n_workers):
+    data = timecourses()
+    accumulators = [CorrelationAccumulator(N_VARIABLES)
+                    for _ in range(n_workers)]
+    for i, chunk in enumerate(chunks(data)):
+        accumulators[i % n_workers].update(chunk)
+
+    # Each accumulator is saved and loaded, as it would be by a worker.
+    merged = CorrelationAccumulator(N_VARIABLES)
+    for accumulator in accumulators:
+        filename = str(tmp_path / "accumulator.npz")
+        accumulator.save(filename)
+        merged.merge(CorrelationAccumulator.load(filename))
+
+    assert merged.count == N_SAMPLES
+    np.testing.assert_allclose(merged.correlation(),
+                               expected_correlation(data),
+                               atol=1e-12)
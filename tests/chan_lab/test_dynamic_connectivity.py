@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from mesonet.chan_lab.helpers.dynamic_connectivity import sliding_window_correlations
+from mesonet.chan_lab.helpers.dynamic_connectivity import window_starts
+
+N_REGIONS = 5
+N_FRAMES = 500
+
+
+def timecourse():
+    random_state = np.random.default_rng(0)
+    data = random_state.normal(size=(N_REGIONS, N_FRAMES)).cumsum(axis=1)
+    data[0] += 1e4
+    # A constant timecourse, whose correlations are NaN.
+    data[3] = 7.0
+    return data
+
+
+@pytest.mark.parametrize("window_frames, step_frames",
+                         [(50, 10), (50, 50), (30, 70), (N_FRAMES, 1)])
+def test_sliding_window_correlations(tmp_path, window_frames, step_frames):
+    data = timecourse()
+    filename = str(tmp_path / "dynamic_corrmat.npy")
+    correlations = sliding_window_correlations(data, window_frames,
+                                               step_frames, filename)
+
+    starts = window_starts(N_FRAMES, window_frames, step_frames)
+    assert correlations.shape == (len(starts), N_REGIONS, N_REGIONS)
+    assert correlations.dtype == np.float32
+    assert not correlations.flags.writeable
+    # Only full windows are included.
+    assert starts[-1] + window_frames <= N_FRAMES < \
+            starts[-1] + step_frames + window_frames
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.stack([np.corrcoef(data[:, start:start + window_frames])
+                             for start in starts])
+    np.testing.assert_allclose(correlations, expected, atol=1e-5)
+    assert np.isnan(correlations[:, 3]).all()
+    np.testing.assert_array_equal(np.load(filename), correlations)
+
+
+def test_invalid_window():
+    with pytest.raises(ValueError):
+        window_starts(N_FRAMES, 1, 1)
+    with pytest.raises(ValueError):
+        window_starts(N_FRAMES, 10, 0)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from mesonet.chan_lab.activity_analyzer import MasksManager
+from mesonet.chan_lab.activity_analyzer import extract_timecourse
+from mesonet.chan_lab.helpers.image_series import NpyImageSeries
+from mesonet.region_labels import RegionLabels
+
+N_FRAMES = 200
+
+
+def masks_manager(image_size):
+    random_state = np.random.default_rng(0)
+    image = random_state.integers(-1, 6, size=(512, 512)).astype(np.int16)
+    # Region 6 has no pixels.
+    image[image == 5] = 7
+    return MasksManager(RegionLabels(image), image_size, image_size)
+
+
+def per_mask_timecourse(frames, masks_manager):
+    """The timecourse as computed before the sparse projection, one frame and
+    one dense mask plane at a time.
+    """
+    masks = masks_manager.masks
+    data = np.zeros((len(masks), len(frames)))
+    for i, image in enumerate(frames):
+        masked_image = image * masks
+        numerator = masked_image.sum(axis=(1, 2))
+        denominator = masks.sum(axis=(1, 2))
+        data[:, i] = np.divide(numerator,
+                               denominator,
+                               out=np.zeros((len(masks),)),
+                               where=(denominator != 0))
+    return data
+
+
+@pytest.mark.parametrize("dtype", [">f4", "<f4", "<f8", "<f2", "<u2"])
+@pytest.mark.parametrize("image_size", [64, 128])
+@pytest.mark.parametrize("chunk_frames, workers", [(64, 1), (17, 3)])
+def test_extract_timecourse(tmp_path, dtype, image_size, chunk_frames,
+                            workers):
+    random_state = np.random.default_rng(1)
+    # Half precision sums of larger values would overflow.
+    scale = 1 if dtype == "<f2" else 4000
+    frames = (random_state.random((N_FRAMES, image_size, image_size)) *
+              scale).astype(dtype)
+    filename = str(tmp_path / "frames.npy")
+    np.save(filename, frames)
+    image_series = NpyImageSeries(filename, image_size, image_size,
+                                  memmap=True)
+
+    manager = masks_manager(image_size)
+    timecourse = extract_timecourse(image_series, manager,
+                                    chunk_frames=chunk_frames,
+                                    workers=workers)
+
+    expected = per_mask_timecourse(frames, manager)
+    assert timecourse.shape == expected.shape
+    assert np.array_equal(timecourse, expected)
+    np.testing.assert_array_equal(timecourse[6], 0)
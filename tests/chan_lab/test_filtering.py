@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pytest
+
+from mesonet.chan_lab.helpers.filtering import bandpass_timecourse
+from mesonet.chan_lab.helpers.filtering import write_bandpassed_series
+from mesonet.chan_lab.helpers.image_series import NpyImageSeries
+
+FPS = 30.0
+N_FRAMES = 600
+IMAGE_HEIGHT = 6
+IMAGE_WIDTH = 7
+
+
+def sine(frequency):
+    return np.sin(2 * np.pi * frequency * np.arange(N_FRAMES) / FPS)
+
+
+@pytest.mark.parametrize("low, high, passed, stopped", [
+    (0.5, 2.0, 1.0, 8.0),
+    (None, 2.0, 1.0, 8.0),
+    (4.0, None, 8.0, 1.0),
+])
+def test_bandpass_timecourse(low, high, passed, stopped):
+    timecourse = np.stack([sine(passed), sine(stopped)])
+    # Filters with a low cutoff also remove a constant offset.
+    offset = 5.0 if low else 0.0
+    filtered = bandpass_timecourse(timecourse + offset, FPS, low, high)
+
+    assert filtered.shape == timecourse.shape
+    # Away from the ends, the passed frequency is kept with no phase shift,
+    # and the stopped frequency is removed.
+    middle = slice(N_FRAMES // 4, 3 * N_FRAMES // 4)
+    np.testing.assert_allclose(filtered[0, middle], timecourse[0, middle],
+                               atol=0.05)
+    np.testing.assert_allclose(filtered[1, middle], 0, atol=0.05)
+
+
+def test_bandpass_no_cutoffs():
+    with pytest.raises(ValueError):
+        bandpass_timecourse(np.zeros((1, N_FRAMES)), FPS, None, None)
+
+
+@pytest.mark.parametrize("chunk_frames, block_pixels, workers",
+                         [(1024, 1024, 1), (77, 5, 3)])
+def test_write_bandpassed_series(tmp_path, chunk_frames, block_pixels,
+                                 workers):
+    random_state = np.random.default_rng(0)
+    frames = random_state.normal(size=(N_FRAMES, IMAGE_HEIGHT, IMAGE_WIDTH))
+    frames = (frames + 10 * sine(1.0)[:, np.newaxis, np.newaxis] +
+              100).astype(">f4")
+    frames_filename = str(tmp_path / "frames.npy")
+    np.save(frames_filename, frames)
+    image_series = NpyImageSeries(frames_filename, IMAGE_WIDTH, IMAGE_HEIGHT,
+                                  memmap=True)
+
+    filename = str(tmp_path / "bandpassed.npy")
+    filtered_series = write_bandpassed_series(image_series, filename, FPS,
+                                              0.5, 2.0,
+                                              chunk_frames=chunk_frames,
+                                              block_pixels=block_pixels,
+                                              workers=workers)
+
+    assert sorted(os.listdir(str(tmp_path))) == ["bandpassed.npy",
+                                                 "frames.npy"]
+    filtered = filtered_series.image_array
+    assert filtered.shape == frames.shape
+    assert filtered.dtype == np.float32
+
+    pixels = np.reshape(frames, (N_FRAMES, -1)).T
+    expected = bandpass_timecourse(pixels, FPS, 0.5, 2.0)
+    np.testing.assert_allclose(np.reshape(filtered, (N_FRAMES, -1)).T,
+                               expected, atol=1e-4)
+
+    # Filtering commutes with averaging the pixels of a region.
+    np.testing.assert_allclose(
+            filtered[:, :3, :4].mean(axis=(1, 2)),
+            bandpass_timecourse(frames[:, :3, :4].mean(axis=(1, 2)), FPS,
+                                0.5, 2.0),
+            atol=1e-4)
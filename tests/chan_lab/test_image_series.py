@@ -0,0 +1,52 @@
+import h5py
+import numpy as np
+import pytest
+
+from mesonet.chan_lab.helpers.image_series import ImageSeriesCreator
+from mesonet.chan_lab.helpers.image_series import RawImageSeries
+
+
+def write_v73_mat(filename, name, value):
+    """Write a variable to a MATLAB v7.3 (HDF5) file, in column-major order."""
+    with h5py.File(filename, "w", userblock_size=512) as f:
+        f[name] = np.transpose(value)
+    header = b"MATLAB 7.3 MAT-file".ljust(116, b" ")
+    header += b"\0" * 8 + b"\x00\x02" + b"IM"
+    with open(filename, "r+b") as f:
+        f.write(header)
+
+
+@pytest.mark.parametrize("memmap", [False, True])
+def test_mat_image_series_closes_file(tmp_path, memmap):
+    filename = str(tmp_path / "frames.mat")
+    frames = np.arange(10 * 6 * 8, dtype=np.float32).reshape((10, 6, 8))
+    write_v73_mat(filename, "frames", np.transpose(frames, (1, 2, 0)))
+
+    with ImageSeriesCreator.create_cached_image_series(
+            filename, 8, 6, "all",
+            memmap=memmap,
+            property="frames",
+            transpose_axes=(2, 0, 1)) as image_series:
+        np.testing.assert_array_equal(image_series.get_frames(slice(2, 5)),
+                                      frames[2:5])
+
+    # The file is no longer open, so it can be written again.
+    write_v73_mat(filename, "frames", np.zeros((6, 8, 1)))
+
+
+@pytest.mark.parametrize("memmap", [False, True])
+def test_raw_image_series_native_floats(tmp_path, memmap):
+    filename = str(tmp_path / "frames.raw")
+    frames = np.arange(10 * 6 * 8, dtype=np.float32).reshape((10, 6, 8))
+    frames.astype(">f4").tofile(filename)
+
+    image_series = RawImageSeries(filename, 8, 6, "all", memmap=memmap)
+    for array in (image_series.get_frame(3),
+                  image_series.get_frames(slice(2, 5)),
+                  image_series.get_frames([7, 1])):
+        assert array.dtype == np.dtype(np.float32)
+    np.testing.assert_array_equal(image_series.get_frame(3), frames[3])
+    np.testing.assert_array_equal(image_series.get_frames(slice(2, 5)),
+                                  frames[2:5])
+    np.testing.assert_array_equal(image_series.get_frames([7, 1]),
+                                  frames[[7, 1]])
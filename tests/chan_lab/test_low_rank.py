@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import scipy.sparse
+
+from mesonet.chan_lab.helpers.image_series import NpyImageSeries
+from mesonet.chan_lab.helpers.low_rank import LowRankRecording
+
+N_FRAMES = 600
+IMAGE_HEIGHT = 12
+IMAGE_WIDTH = 10
+RANK = 6
+
+
+def write_frames(filename, noise=0.0):
+    random_state = np.random.default_rng(0)
+    components = random_state.standard_normal((N_FRAMES, RANK)) * \
+            np.linspace(10, 1, RANK)
+    pixels = components @ random_state.standard_normal(
+            (RANK, IMAGE_HEIGHT * IMAGE_WIDTH)) + 50
+    pixels += noise * random_state.standard_normal(pixels.shape)
+    frames = np.reshape(pixels, (N_FRAMES, IMAGE_HEIGHT, IMAGE_WIDTH))
+    np.save(filename, frames.astype(np.float32))
+    return NpyImageSeries(filename, IMAGE_WIDTH, IMAGE_HEIGHT, memmap=True)
+
+
+def pixel_correlations(timecourses, pixels):
+    # The correlation of each timecourse with each pixel timecourse.
+    n = len(timecourses)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.corrcoef(np.concatenate([timecourses, pixels]))[:n, n:]
+
+
+@pytest.mark.parametrize("chunk_frames", [1024, 77])
+def test_compute_exact_rank(tmp_path, chunk_frames):
+    image_series = write_frames(str(tmp_path / "frames.npy"))
+    frames = image_series.image_array
+
+    recording = LowRankRecording.compute(image_series, rank=RANK,
+                                         chunk_frames=chunk_frames, seed=1)
+    assert recording.rank == RANK
+    assert recording.n_frames == N_FRAMES
+    assert recording.frame_shape == (IMAGE_HEIGHT, IMAGE_WIDTH)
+    np.testing.assert_allclose(recording.mean,
+                               np.reshape(frames, (N_FRAMES, -1)).mean(axis=0),
+                               rtol=1e-6)
+    np.testing.assert_allclose(recording.reconstruct(slice(None)), frames,
+                               atol=1e-3)
+    np.testing.assert_allclose(recording.reconstruct([5, 2]),
+                               frames[[5, 2]], atol=1e-3)
+
+
+def test_compute_singular_values(tmp_path):
+    image_series = write_frames(str(tmp_path / "frames.npy"), noise=0.5)
+    pixels = np.reshape(image_series.image_array, (N_FRAMES, -1))
+    expected = np.linalg.svd(pixels - pixels.mean(axis=0),
+                             compute_uv=False)[:RANK - 2]
+
+    recording = LowRankRecording.compute(image_series, rank=RANK - 2,
+                                         power_iterations=2, seed=0)
+    np.testing.assert_allclose(recording.s, expected, rtol=1e-3)
+
+
+def test_components(tmp_path):
+    image_series = write_frames(str(tmp_path / "frames.npy"), noise=0.5)
+    recording = LowRankRecording.compute(image_series, rank=RANK, seed=0)
+    filename = str(tmp_path / "low_rank.npz")
+    recording.save(filename)
+    recording = LowRankRecording.load(filename)
+
+    reconstructed = np.reshape(recording.reconstruct(slice(None)),
+                               (N_FRAMES, -1)).astype(np.float64)
+    random_state = np.random.default_rng(2)
+    matrix = scipy.sparse.random(4, reconstructed.shape[1], density=0.2,
+                                 format="csr", random_state=random_state)
+    np.testing.assert_allclose(recording.project(matrix),
+                               matrix @ reconstructed.T, rtol=1e-4, atol=1e-3)
+    np.testing.assert_allclose(recording.project(matrix, slice(10, 20)),
+                               matrix @ reconstructed[10:20].T,
+                               rtol=1e-4, atol=1e-3)
+    np.testing.assert_allclose(
+            recording.frames(slice(10, 20)).reconstruct(slice(None)),
+            recording.reconstruct(slice(10, 20)))
+
+    seeds = [0, 17, 119]
+    np.testing.assert_allclose(
+            recording.seed_correlations(seeds),
+            pixel_correlations(reconstructed[:, seeds].T, reconstructed.T),
+            atol=1e-4)
+
+    timecourses = random_state.standard_normal((3, N_FRAMES))
+    timecourses[2] = reconstructed[:, 5]
+    np.testing.assert_allclose(
+            recording.timecourse_correlations(timecourses),
+            pixel_correlations(timecourses, reconstructed.T),
+            atol=1e-4)
@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+
+import numpy as np
+
+from mesonet.chan_lab.activity_analyzer import MasksManager
+from mesonet.region_labels import RegionLabels
+
+
+def write_region_labels(filename, table=None):
+    image = np.full((512, 512), -1, dtype=np.int16)
+    image[:256, :256] = 0
+    image[256:, 100:400] = 1
+    image[10:20, 300:500] = 2
+    RegionLabels(image, table).save(filename)
+
+
+def masks(region_points_file, cache_dir, image_size=128):
+    masks_manager = MasksManager(region_points_file, image_size, image_size,
+                                 cache_dir=cache_dir)
+    return masks_manager.masks
+
+
+def test_cached_masks(tmp_path):
+    region_points_file = str(tmp_path / "region_labels.npy")
+    write_region_labels(region_points_file, {0: 10, 1: 11, 2: 12})
+    cache_dir = str(tmp_path / "cache")
+
+    expected = masks(region_points_file, None)
+    np.testing.assert_array_equal(masks(region_points_file, cache_dir),
+                                  expected)
+    assert len(os.listdir(cache_dir)) == 1
+    cached = MasksManager(region_points_file, 128, 128, cache_dir=cache_dir)
+    np.testing.assert_array_equal(cached.masks, expected)
+    assert cached.region_labels.table == {0: 10, 1: 11, 2: 12}
+
+    # Each image size has its own masks.
+    np.testing.assert_array_equal(masks(region_points_file, cache_dir, 64),
+                                  masks(region_points_file, None, 64))
+    assert len(os.listdir(cache_dir)) == 2
+
+    # A changed label table is not read from the cache.
+    write_region_labels(region_points_file, {0: 20, 1: 21, 2: 22})
+    cached = MasksManager(region_points_file, 128, 128, cache_dir=cache_dir)
+    assert cached.region_labels.table == {0: 20, 1: 21, 2: 22}
+
+
+def test_concurrent_cached_masks(tmp_path):
+    region_points_file = str(tmp_path / "region_labels.npy")
+    write_region_labels(region_points_file)
+    cache_dir = str(tmp_path / "cache")
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(4) as pool:
+        results = pool.starmap(masks, [(region_points_file, cache_dir)] * 8)
+
+    expected = masks(region_points_file, None)
+    for result in results:
+        np.testing.assert_array_equal(result, expected)
+    assert [name.endswith(".npz") for name in os.listdir(cache_dir)] == [True]
@@ -0,0 +1,63 @@
+import itertools
+
+import numpy as np
+
+from mesonet.chan_lab.helpers.matrix_comparison import align_matrix
+from mesonet.chan_lab.helpers.matrix_comparison import compare_matrices
+
+N_REGIONS = 6
+
+
+def correlation_matrices():
+    random_state = np.random.default_rng(0)
+    matrices = [np.corrcoef(random_state.normal(size=(N_REGIONS, 40)))
+                for _ in range(3)]
+    # A session missing regions 1 and 4, whose rows and columns are NaN.
+    matrices.append(align_matrix(matrices[0][:4, :4] * 0.9,
+                                 [0, -1, 2, 3, -1, 1]))
+    # A session with no regions at all.
+    matrices.append(np.full((N_REGIONS, N_REGIONS), np.nan))
+    return np.stack(matrices)
+
+
+def expected_statistics(x, y):
+    off_diagonal = ~np.eye(N_REGIONS, dtype=bool)
+    x, y = x[off_diagonal], y[off_diagonal]
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    if len(x) == 0:
+        return np.nan, np.nan, np.nan
+    return (np.sqrt(np.mean((x - y) ** 2)),
+            np.corrcoef(x, y)[0, 1],
+            np.max(np.abs(x - y)))
+
+
+def test_align_matrix():
+    matrix = np.arange(16.0).reshape((4, 4))
+    aligned = align_matrix(matrix, [2, -1, 0])
+    np.testing.assert_array_equal(aligned, [[10, np.nan, 8],
+                                            [np.nan, np.nan, np.nan],
+                                            [2, np.nan, 0]])
+
+
+def test_compare_matrices():
+    matrices = correlation_matrices()
+    pairs, differences, statistics = compare_matrices(matrices)
+
+    expected_pairs = list(itertools.combinations(range(len(matrices)), 2))
+    np.testing.assert_array_equal(pairs, expected_pairs)
+    for i, (minuend, subtrahend) in enumerate(expected_pairs):
+        np.testing.assert_array_equal(
+                differences[i], matrices[minuend] - matrices[subtrahend])
+        rmse, pearson, max_abs_difference = expected_statistics(
+                matrices[minuend], matrices[subtrahend])
+        np.testing.assert_allclose(statistics["rmse"][i], rmse)
+        np.testing.assert_allclose(statistics["pearson"][i], pearson)
+        np.testing.assert_allclose(statistics["max_abs_difference"][i],
+                                   max_abs_difference)
+
+    # The pairs with the empty session have no statistics.
+    with_empty = pairs[:, 1] == len(matrices) - 1
+    for values in statistics.values():
+        assert np.isnan(values[with_empty]).all()
+        assert np.isfinite(values[~with_empty]).all()
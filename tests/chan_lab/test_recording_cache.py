@@ -0,0 +1,107 @@
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from mesonet.chan_lab.helpers.recording_cache import STALE_PARTIAL_SECONDS
+from mesonet.chan_lab.helpers.recording_cache import RecordingCache
+
+
+class FrameSeries:
+    def __init__(self, frames, filename="frames.raw"):
+        self._frames = frames
+        self.filename = filename
+
+    @property
+    def n_frames(self):
+        return len(self._frames)
+
+    def get_frames(self, frames):
+        return self._frames[frames]
+
+
+def frames():
+    return np.arange(3000 * 4 * 5, dtype=">u2").reshape((3000, 4, 5))
+
+
+def store(cache_dir):
+    cache = RecordingCache(cache_dir)
+    return cache.store("key", FrameSeries(frames()))
+
+
+def test_store(tmp_path):
+    cache = RecordingCache(str(tmp_path))
+    assert cache.lookup("key") is None
+
+    array_filename = cache.store("key", FrameSeries(frames()),
+                                 metadata={"width": 5})
+    assert cache.lookup("key") == array_filename
+    array = np.load(array_filename)
+    np.testing.assert_array_equal(array, frames())
+    assert array.dtype == np.dtype("=u2")
+
+    with open(os.path.join(str(tmp_path), "key.json")) as f:
+        metadata = json.load(f)
+    assert metadata["width"] == 5
+    assert metadata["shape"] == [3000, 4, 5]
+    assert sorted(os.listdir(str(tmp_path))) == ["key.json", "key.npy"]
+
+
+def test_store_existing_entry(tmp_path):
+    cache = RecordingCache(str(tmp_path))
+    array_filename = cache.store("key", FrameSeries(frames()))
+    modified_frames = frames() + 1
+    assert cache.store("key", FrameSeries(modified_frames)) == array_filename
+    np.testing.assert_array_equal(np.load(array_filename), frames())
+
+
+def test_concurrent_store(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(4) as pool:
+        array_filenames = pool.map(store, [str(tmp_path)] * 8)
+
+    assert len(set(array_filenames)) == 1
+    np.testing.assert_array_equal(np.load(array_filenames[0]), frames())
+    assert sorted(os.listdir(str(tmp_path))) == ["key.json", "key.npy"]
+
+
+def test_evict_partial_files(tmp_path):
+    cache_dir = str(tmp_path)
+    stale_filename = os.path.join(cache_dir, "other.stale.partial")
+    fresh_filename = os.path.join(cache_dir, "other.fresh.partial")
+    for filename in (stale_filename, fresh_filename):
+        with open(filename, "wb") as f:
+            f.write(b"\0" * 1024)
+    stale_time = time.time() - STALE_PARTIAL_SECONDS - 60
+    os.utime(stale_filename, (stale_time, stale_time))
+
+    cache = RecordingCache(cache_dir)
+    cache.store("key", FrameSeries(frames()))
+    assert sorted(os.listdir(cache_dir)) == ["key.json", "key.npy",
+                                             "other.fresh.partial"]
+
+
+def test_evict_entry_in_use(tmp_path, monkeypatch):
+    # Room for two entries, so that storing a third one evicts the oldest.
+    cache = RecordingCache(str(tmp_path),
+                           cache_size_gb=frames().nbytes * 2.5 / 1024 ** 3)
+    cache.store("in_use", FrameSeries(frames()))
+    cache.store("unused", FrameSeries(frames()))
+    for age, key in ((120, "in_use"), (60, "unused")):
+        past_time = time.time() - age
+        os.utime(os.path.join(str(tmp_path), f"{key}.npy"),
+                 (past_time, past_time))
+
+    remove = os.remove
+
+    def remove_unless_in_use(filename):
+        if os.path.basename(filename) == "in_use.npy":
+            raise PermissionError(filename)
+        remove(filename)
+
+    monkeypatch.setattr(os, "remove", remove_unless_in_use)
+    cache.store("key", FrameSeries(frames()))
+    assert sorted(os.listdir(str(tmp_path))) == ["in_use.json", "in_use.npy",
+                                                 "key.json", "key.npy"]
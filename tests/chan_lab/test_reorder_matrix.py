@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import scipy.linalg
+import scipy.stats
+
+from mesonet.chan_lab.helpers.utils import _swap_cost_delta
+from mesonet.chan_lab.helpers.utils import reorder_matrix
+
+N = 12
+
+
+def correlation_matrix():
+    random_state = np.random.default_rng(0)
+    return np.corrcoef(random_state.normal(size=(N, 50)))
+
+
+def line_cost(n):
+    profile = scipy.stats.norm.pdf(range(n), 0, n / 2)[::-1]
+    return scipy.linalg.toeplitz(profile, profile)
+
+
+def total_cost(matrix, cost):
+    return np.sum((matrix - np.diag(np.diag(matrix))) * cost)
+
+
+@pytest.mark.parametrize("symmetric", [True, False])
+def test_swap_cost_delta(symmetric):
+    random_state = np.random.default_rng(1)
+    matrix = random_state.normal(size=(N, N))
+    if symmetric:
+        matrix = matrix + matrix.T
+    np.fill_diagonal(matrix, 0)
+    cost = line_cost(N)
+
+    for r0 in range(N):
+        for r1 in range(N):
+            if r0 == r1:
+                continue
+            order = np.arange(N)
+            order[[r0, r1]] = [r1, r0]
+            swapped = matrix[order, :][:, order]
+            expected = np.sum(swapped * cost) - np.sum(matrix * cost)
+            np.testing.assert_allclose(
+                    _swap_cost_delta(matrix, cost, r0, r1), expected,
+                    atol=1e-12)
+
+
+def test_reorder_matrix():
+    matrix = correlation_matrix()
+    reordered, order = reorder_matrix(matrix, h=2000, seed=3)
+
+    assert sorted(order.tolist()) == list(range(N))
+    np.testing.assert_array_equal(reordered, matrix[order, :][:, order])
+    assert total_cost(reordered, line_cost(N)) <= \
+            total_cost(matrix, line_cost(N))
+
+
+def test_reorder_matrix_workers():
+    matrix = correlation_matrix()
+    results = [reorder_matrix(matrix, h=2000, seed=3, restarts=4,
+                              workers=workers)
+               for workers in (1, 2)]
+
+    np.testing.assert_array_equal(results[0][1], results[1][1])
+    np.testing.assert_array_equal(results[0][0], results[1][0])
+    # The same seed always gives the same ordering.
+    np.testing.assert_array_equal(
+            reorder_matrix(matrix, h=2000, seed=3, restarts=4)[1],
+            results[0][1])
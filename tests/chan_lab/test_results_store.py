@@ -0,0 +1,82 @@
+import argparse
+
+import numpy as np
+import pytest
+
+from mesonet.chan_lab.helpers.results_store import ResultsStore
+from mesonet.chan_lab.helpers.results_store import read_correlations
+from mesonet.region_labels import NO_REGION
+from mesonet.region_labels import RegionLabels
+
+N_REGIONS = 7
+N_FRAMES = 5000
+
+
+def write_store(filename):
+    random_state = np.random.default_rng(0)
+    timecourse = random_state.normal(size=(N_REGIONS, N_FRAMES))
+    correlation = np.corrcoef(timecourse)
+    correlation[2] = correlation[:, 2] = np.nan
+    region_pixels = [np.sort(random_state.choice(64, size=size,
+                                                 replace=False))
+                     for size in (3, 0, 10, 1, 5, 8, 2)]
+    image = np.full((8, 8), NO_REGION)
+    image[2:4, 1:5] = 3
+    region_labels = RegionLabels(image, {3: 42})
+
+    with ResultsStore(filename, "w") as store:
+        store.write_timecourse(timecourse)
+        store.write_correlation(correlation)
+        store.write_region_labels(region_labels)
+        store.write_masks(region_pixels, 8, 8)
+        store.write_config(argparse.Namespace(function="activity", fps=30.0))
+    return timecourse, correlation, region_pixels, region_labels
+
+
+@pytest.mark.parametrize("regions", [None, [4], [5, 1, 3], [2, 6, 2, 0]])
+@pytest.mark.parametrize("frames", [slice(None), slice(4000, 4500),
+                                    slice(10, 4200, 7)])
+def test_timecourse(tmp_path, regions, frames):
+    filename = str(tmp_path / "results.h5")
+    timecourse, _, _, _ = write_store(filename)
+
+    with ResultsStore(filename) as store:
+        assert store.timecourse_names() == ["timecourse"]
+        expected = timecourse if regions is None else timecourse[regions]
+        np.testing.assert_array_equal(
+                store.timecourse(regions=regions, frames=frames),
+                expected[:, frames])
+
+
+@pytest.mark.parametrize("regions", [None, [4], [5, 1, 3], [2, 6, 2, 0]])
+def test_correlation(tmp_path, regions):
+    filename = str(tmp_path / "results.h5")
+    _, correlation, _, _ = write_store(filename)
+
+    expected = correlation if regions is None else \
+            correlation[np.ix_(regions, regions)]
+    with ResultsStore(filename) as store:
+        assert store.correlation_names() == ["corrmat"]
+        np.testing.assert_array_equal(store.correlation(regions=regions),
+                                      expected)
+    np.testing.assert_array_equal(
+            read_correlations([filename] * 3, regions=regions),
+            np.stack([expected] * 3))
+
+
+def test_metadata(tmp_path):
+    filename = str(tmp_path / "results.h5")
+    _, _, region_pixels, region_labels = write_store(filename)
+
+    with ResultsStore(filename) as store:
+        for region, pixels in enumerate(region_pixels):
+            np.testing.assert_array_equal(store.mask_pixels(region), pixels)
+        np.testing.assert_array_equal(store.region_labels().image,
+                                      region_labels.image)
+        assert store.region_labels().table == {3: 42}
+        assert store.config() == {"function": "activity", "fps": 30.0}
+
+    # Writing a dataset again replaces it.
+    with ResultsStore(filename, "a") as store:
+        store.write_timecourse(np.zeros((2, 3)))
+        np.testing.assert_array_equal(store.timecourse(), np.zeros((2, 3)))
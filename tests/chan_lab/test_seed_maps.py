@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from mesonet.chan_lab.helpers.image_series import NpyImageSeries
+from mesonet.chan_lab.helpers.seed_maps import region_correlation_maps
+
+N_FRAMES = 500
+IMAGE_HEIGHT = 8
+IMAGE_WIDTH = 9
+
+
+@pytest.mark.parametrize("chunk_frames", [1024, 64, 1])
+def test_region_correlation_maps(tmp_path, chunk_frames):
+    random_state = np.random.default_rng(0)
+    frames = random_state.normal(size=(N_FRAMES, IMAGE_HEIGHT, IMAGE_WIDTH))
+    # Large means must not cost precision.
+    frames = (frames.cumsum(axis=0) + 1e4).astype(np.float32)
+    # A constant pixel, whose correlations are NaN.
+    frames[:, 2, 3] = 1e4
+    filename = str(tmp_path / "frames.npy")
+    np.save(filename, frames)
+    image_series = NpyImageSeries(filename, IMAGE_WIDTH, IMAGE_HEIGHT,
+                                  memmap=True)
+
+    pixels = np.reshape(frames, (N_FRAMES, -1)).T.astype(np.float64)
+    timecourse = random_state.normal(size=(4, N_FRAMES)).cumsum(axis=1)
+    timecourse[1] = pixels[10] * 2 + 3
+    # A constant timecourse, whose correlations are NaN.
+    timecourse[3] = 5.0
+
+    maps = region_correlation_maps(image_series, timecourse,
+                                   chunk_frames=chunk_frames)
+    assert maps.shape == (4, IMAGE_HEIGHT * IMAGE_WIDTH)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.corrcoef(np.concatenate([timecourse, pixels]))[:4, 4:]
+    np.testing.assert_allclose(maps, expected, atol=1e-6)
+    np.testing.assert_allclose(maps[1, 10], 1.0)
+    assert np.isnan(maps[3]).all()
+    assert np.isnan(maps[:, 2 * IMAGE_WIDTH + 3]).all()
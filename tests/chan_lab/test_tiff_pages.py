@@ -0,0 +1,77 @@
+import numpy as np
+import PIL.Image
+
+from mesonet.chan_lab.helpers.image_series import TiffImageSeries
+from mesonet.chan_lab.helpers.tiff_pages import TiffPageIndex
+
+N_PAGES = 300
+
+
+def write_compressed_tiff(filename, n_pages=N_PAGES):
+    random_state = np.random.default_rng(0)
+    pages = random_state.integers(0, 60000, size=(n_pages, 32, 48),
+                                  dtype=np.uint16)
+    images = [PIL.Image.fromarray(page) for page in pages]
+    images[0].save(filename, save_all=True, append_images=images[1:],
+                   compression="tiff_deflate")
+    return pages
+
+
+def test_read_compressed_pages(tmp_path):
+    filename = str(tmp_path / "compressed.tif")
+    pages = write_compressed_tiff(filename)
+
+    page_index = TiffPageIndex(filename)
+    assert len(page_index) == N_PAGES
+    assert page_index.memmap() is None
+
+    np.testing.assert_array_equal(page_index.read_pages(), pages)
+    np.testing.assert_array_equal(page_index.read_pages(250, 280),
+                                  pages[250:280])
+    np.testing.assert_array_equal(page_index.read_page(N_PAGES - 1),
+                                  pages[-1])
+
+
+def write_uncompressed_tiff(filename, n_pages=N_PAGES):
+    random_state = np.random.default_rng(1)
+    pages = random_state.integers(0, 60000, size=(n_pages, 32, 48),
+                                  dtype=np.uint16)
+    images = [PIL.Image.fromarray(page) for page in pages]
+    images[0].save(filename, save_all=True, append_images=images[1:])
+    return pages
+
+
+def test_memmap_uncompressed_pages(tmp_path):
+    filename = str(tmp_path / "uncompressed.tif")
+    pages = write_uncompressed_tiff(filename)
+
+    image_series = TiffImageSeries(filename, 48, 32, n_frames=20, memmap=True)
+    # Only the first n_frames pages are scanned, and they are a single view of
+    # the file.
+    assert len(image_series.page_index) == 20
+    assert isinstance(image_series.image_array.base, np.memmap)
+    np.testing.assert_array_equal(image_series.image_array, pages[:20])
+    np.testing.assert_array_equal(image_series.page_index.read_pages(5, 15),
+                                  pages[5:15])
+
+
+def test_read_uncompressed_pages(tmp_path):
+    filename = str(tmp_path / "uncompressed.tif")
+    pages = write_uncompressed_tiff(filename)
+
+    image_series = TiffImageSeries(filename, 48, 32, n_frames=20)
+    assert len(image_series.page_index) == 20
+    assert image_series.image_array.flags.owndata
+    np.testing.assert_array_equal(image_series.image_array, pages[:20])
+
+
+def test_read_one_bit_pages(tmp_path):
+    filename = str(tmp_path / "one_bit.tif")
+    random_state = np.random.default_rng(2)
+    pages = random_state.random((5, 32, 48)) < 0.5
+    images = [PIL.Image.fromarray(page) for page in pages]
+    images[0].save(filename, save_all=True, append_images=images[1:])
+
+    page_index = TiffPageIndex(filename)
+    assert page_index.memmap() is None
+    np.testing.assert_array_equal(page_index.read_pages(), pages)